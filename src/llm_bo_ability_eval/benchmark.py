@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark of the harness itself, against a local mock endpoint.
+
+Each scenario runs `main.run_experiment` in a fresh subprocess against
+mock_llm_server.py (started as a separate process, so its CPU time is not
+counted) and reports:
+- problems_per_sec: problems finished per wall-clock second
+- cpu_ms_per_request: harness CPU time (user + system) per problem
+- peak_rss_mb: peak resident memory of the harness process
+- load_sec: ProblemSetLoader time
+- journal_ms_per_record: time per fsync'd journal append
+- yaml_export_sec: time to write the per-problem and all_results YAML files
+
+Scenarios cover concurrency levels, problem counts (24, 100 and a synthetic
+10k set built from the 100-problem files) and response sizes; each is repeated
+and the median of every metric is kept. Results can be saved as a baseline and
+later runs compared against it; a metric that is worse than the baseline by more
+than the tolerance (and by more than its noise floor) fails the run (exit code 1).
+Only medians of at least MIN_REPEAT runs are compared or saved as a baseline, and
+metrics near timer resolution (journal appends, YAML export of small sets) have
+floors that keep them out of the gate; compare on a machine like the baseline's.
+
+Usage:
+    python benchmark.py                          # quick suite, compare with benchmark_baseline.json
+    python benchmark.py --suite full -o results.json
+    python benchmark.py --save-baseline          # record the current numbers as the baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+DEFAULT_BASELINE = Path(__file__).parent / 'benchmark_baseline.json'
+MOCK_SERVER = Path(__file__).parent / 'mock_llm_server.py'
+SYNTHETIC_SOURCE = 'problem_set/100problems'
+
+# (problems, concurrency, output_tokens); problems is 24, 100 or 10000 (synthetic)
+SUITES = {
+    'quick': [
+        (24, 1, 200),
+        (24, 8, 200),
+        (100, 32, 200),
+        (100, 32, 4000),
+    ],
+    'full': [
+        (24, 1, 200),
+        (24, 8, 200),
+        (100, 1, 200),
+        (100, 32, 200),
+        (100, 32, 4000),
+        (100, 32, 15000),
+        (10000, 64, 200),
+        (10000, 128, 200),
+    ],
+}
+
+# Metric -> (direction in which it gets worse, smallest absolute change that counts). The floors are well above
+# run-to-run noise of a 1-CPU machine: sub-millisecond journal appends and sub-second YAML exports vary by 2-3x
+REGRESSION_METRICS = {
+    'problems_per_sec': ('lower', 0.0),
+    'cpu_ms_per_request': ('higher', 5.0),
+    'peak_rss_mb': ('higher', 25.0),
+    'journal_ms_per_record': ('higher', 2.0),
+    'yaml_export_sec': ('higher', 1.0),
+}
+MIN_REPEAT = 3
+DEFAULT_TOLERANCE = 0.5
+
+
+def scenario_name(problems: int, concurrency: int, output_tokens: int) -> str:
+    return f"p{problems}_c{concurrency}_t{output_tokens}"
+
+
+def build_synthetic_set(source_dir: str, target_dir: Path, count: int) -> Path:
+    """Problem set of `count` problems made by cycling the files of `source_dir`."""
+    source = Path(source_dir)
+    sources = sorted(source.glob('*problem_*.md'))
+    target_dir.mkdir(parents=True, exist_ok=True)
+    for intro in source.glob('*introduction.md'):
+        shutil.copy(intro, target_dir / intro.name)
+    for i in range(count):
+        shutil.copy(sources[i % len(sources)], target_dir / f"synthetic_problem_{i + 1:05d}.md")
+    return target_dir
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_server(output_tokens: int) -> tuple:
+    """Start mock_llm_server.py in a subprocess; returns (process, base_url)."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, str(MOCK_SERVER), '--port', str(port), '--output-tokens', str(output_tokens),
+         '--answer', 'I recommend Candidate {candidate}.', '--seed', '0'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("mock_llm_server.py did not start")
+
+
+def run_scenario(scenario: dict) -> dict:
+    """
+    Run one scenario in this process and measure it (called in the benchmark subprocess).
+
+    Args:
+        scenario: problems_dir, experiment, problems, concurrency, output_tokens, base_url
+
+    Returns:
+        dict: the scenario's metrics
+    """
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    import main
+    import result_writer
+    from problem_loader import ProblemSetLoader
+
+    timings = {'load_sec': 0.0, 'journal_sec': 0.0, 'journal_records': 0, 'yaml_export_sec': 0.0}
+
+    def timed(func, key, counter=None):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings[key] += time.perf_counter() - start
+                if counter:
+                    timings[counter] += 1
+        return wrapper
+
+    ProblemSetLoader.load_problem_files = timed(ProblemSetLoader.load_problem_files, 'load_sec')
+    result_writer.ResultJournal.append = timed(result_writer.ResultJournal.append, 'journal_sec', 'journal_records')
+    main.export_yaml = timed(main.export_yaml, 'yaml_export_sec')
+
+    llm_config = {
+        'model': 'qwen-mock',
+        'base_url': scenario['base_url'] + '/v1',
+        'api_key': 'mock',
+        'temperature': 0.7,
+        'max_tokens': scenario['output_tokens'],
+        'cache_seed': None,
+        'max_concurrency': scenario['concurrency'],
+    }
+    output_root = tempfile.mkdtemp(prefix='bo_bench_')
+    cpu_start = time.process_time()
+    try:
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                summary = asyncio.run(main.run_experiment(
+                    'mock', llm_config, scenario['experiment'], scenario['problems_dir'], output_root,
+                    max_files=scenario['problems'], concurrency=scenario['concurrency']
+                ))
+            finally:
+                sys.stdout = stdout
+    finally:
+        shutil.rmtree(output_root, ignore_errors=True)
+    cpu_time = time.process_time() - cpu_start
+
+    tested = max(summary['tested'], 1)
+    return {
+        'problems': summary['tested'],
+        'failed': summary['failed'],
+        'concurrency': scenario['concurrency'],
+        'output_tokens': scenario['output_tokens'],
+        'wall_sec': round(summary['wall_time'], 3),
+        'problems_per_sec': round(summary['tested'] / summary['wall_time'], 2) if summary['wall_time'] else None,
+        'cpu_ms_per_request': round(cpu_time * 1000 / tested, 3),
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1),
+        'load_sec': round(timings['load_sec'], 4),
+        'journal_ms_per_record': round(timings['journal_sec'] * 1000 / max(timings['journal_records'], 1), 4),
+        'yaml_export_sec': round(timings['yaml_export_sec'], 4),
+    }
+
+
+def _median_metrics(runs: List[dict]) -> dict:
+    """Per-metric median of repeated runs of one scenario."""
+    return {key: statistics.median(run[key] for run in runs) if isinstance(runs[0][key], (int, float)) else runs[0][key]
+            for key in runs[0]}
+
+
+def run_suite(cases: List[tuple], work_dir: Path, repeat: int = 3, log=print) -> Dict[str, dict]:
+    """Run every (problems, concurrency, output_tokens) case `repeat` times, each in its own subprocess."""
+    problem_sets = {24: ('problem_set/24problems', '24'), 100: ('problem_set/100problems', '100')}
+    results = {}
+    for output_tokens in sorted({case[2] for case in cases}):
+        server, base_url = start_mock_server(output_tokens)
+        try:
+            for problems, concurrency, tokens in cases:
+                if tokens != output_tokens:
+                    continue
+                if problems not in problem_sets:
+                    log(f"Building synthetic {problems}-problem set...")
+                    problem_sets[problems] = (str(build_synthetic_set(SYNTHETIC_SOURCE, work_dir / f"synthetic_{problems}",
+                                                                      problems)), '100')
+                problems_dir, experiment = problem_sets[problems]
+                scenario = {'problems_dir': problems_dir, 'experiment': experiment, 'problems': problems,
+                            'concurrency': concurrency, 'output_tokens': output_tokens, 'base_url': base_url}
+                name = scenario_name(problems, concurrency, output_tokens)
+                log(f"Running {name} ({repeat}x)...")
+                runs = []
+                for _ in range(repeat):
+                    completed = subprocess.run([sys.executable, __file__, '--run-scenario', json.dumps(scenario)],
+                                               capture_output=True, text=True, check=True)
+                    runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+                results[name] = _median_metrics(runs)
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Messages for every metric worse than the baseline by more than `tolerance` (a fraction) and its noise floor."""
+    regressions = []
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        for metric, (worse, floor) in REGRESSION_METRICS.items():
+            old, new = baseline[name].get(metric), metrics.get(metric)
+            if not old or new is None or abs(new - old) <= floor:
+                continue
+            change = (new - old) / old
+            if (worse == 'higher' and change > tolerance) or (worse == 'lower' and -change > tolerance):
+                regressions.append(f"{name} {metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def print_table(results: Dict[str, dict]):
+    columns = ['problems_per_sec', 'cpu_ms_per_request', 'peak_rss_mb', 'load_sec',
+               'journal_ms_per_record', 'yaml_export_sec']
+    print(f"{'scenario':<22}" + ''.join(f"{column:>24}" for column in columns))
+    for name, metrics in results.items():
+        print(f"{name:<22}" + ''.join(f"{str(metrics.get(column)):>24}" for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark harness throughput against a local mock endpoint')
+    parser.add_argument('--suite', choices=sorted(SUITES), default='quick', help='Scenario set to run (default: quick)')
+    parser.add_argument('-o', '--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the new baseline')
+    parser.add_argument('--repeat', type=int, default=MIN_REPEAT, help=f'Runs per scenario; the median is reported (default: {MIN_REPEAT}, the minimum for --save-baseline and the regression check)')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help=f'Allowed slowdown before a metric counts as a regression (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--run-scenario', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        print(json.dumps(run_scenario(json.loads(args.run_scenario))))
+        return
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    if args.save_baseline and args.repeat < MIN_REPEAT:
+        parser.error(f"--save-baseline needs --repeat {MIN_REPEAT} or more")
+
+    with tempfile.TemporaryDirectory(prefix='bo_bench_sets_') as work_dir:
+        results = run_suite(SUITES[args.suite], Path(work_dir), args.repeat)
+    print_table(results)
+
+    report = {
+        'suite': args.suite,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'repeat': args.repeat,
+        'scenarios': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to: {args.output}")
+
+    if args.save_baseline:
+        baseline_report = report
+        if Path(args.baseline).exists():
+            # Keep scenarios of other suites already in the baseline
+            with open(args.baseline) as f:
+                baseline_report = json.load(f)
+            baseline_report.update({k: v for k, v in report.items() if k != 'scenarios'})
+            baseline_report['scenarios'].update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline_report, f, indent=2)
+        print(f"Baseline written to: {args.baseline}")
+        return
+
+    if not Path(args.baseline).exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+    if args.repeat < MIN_REPEAT:
+        print(f"\nNot compared with {args.baseline}: medians of fewer than {MIN_REPEAT} runs are too noisy")
+        return
+    with open(args.baseline) as f:
+        baseline_report = json.load(f)
+    if (baseline_report.get('cpus'), baseline_report.get('machine')) != (report['cpus'], report['machine']):
+        print(f"\nWarning: the baseline was recorded on {baseline_report.get('cpus')} CPUs ({baseline_report.get('machine')}), "
+              f"this machine has {report['cpus']} ({report['machine']}); numbers may not be comparable")
+    baseline = baseline_report['scenarios']
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regressions against {args.baseline}:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
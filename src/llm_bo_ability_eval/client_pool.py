@@ -0,0 +1,94 @@
+import asyncio
+import importlib.util
+import threading
+import weakref
+from typing import Any, Dict, Tuple
+
+import openai
+import anthropic
+from openai import OpenAI, AsyncOpenAI
+from anthropic import Anthropic, AsyncAnthropic
+
+try:
+    import httpx
+except ImportError:  # newer SDK releases ship httpx as httpx2
+    import httpx2 as httpx
+
+# LLM calls are long and bursty: keep plenty of idle connections around between problems
+POOL_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=120)
+# HTTP/2 needs the optional `h2` package (pip install h2)
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+
+class ClientPool:
+    def __init__(self):
+        """
+        Process-wide registry of SDK clients keyed by provider, base_url and API key.
+
+        Every client wraps a keep-alive connection pool (HTTP/2 where available), so
+        all LLMTester instances and query helpers for one endpoint reuse the same
+        TCP+TLS connections. Async clients are also keyed by the running event loop,
+        because their connections cannot move between loops; async clients requested
+        outside a running loop are not shared. Gemini manages its own transport and is
+        not pooled here.
+        """
+        self.hits = 0
+        self.misses = 0
+        self._clients: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: Tuple, factory, use_async: bool = False):
+        loop = None
+        if use_async:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # The client could end up on any loop (e.g. across asyncio.run() calls)
+                with self._lock:
+                    self.misses += 1
+                return factory()
+            key = key + (id(loop),)
+        with self._lock:
+            entry = self._clients.get(key)
+            # Loop ids are reused once a loop is gone, so check it is the same loop
+            if entry is not None and (loop is None or entry[1]() is loop):
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            client = factory()
+            self._clients[key] = (client, weakref.ref(loop) if loop else None)
+            return client
+
+    def openai_client(self, base_url: str, api_key: str, use_async: bool = False):
+        """Shared OpenAI (or AsyncOpenAI) client for an OpenAI-compatible endpoint."""
+        key = ('openai', base_url, api_key, use_async)
+        if use_async:
+            return self._get(key, lambda: AsyncOpenAI(
+                base_url=base_url, api_key=api_key,
+                http_client=openai.DefaultAsyncHttpxClient(limits=POOL_LIMITS, http2=HTTP2_AVAILABLE)
+            ), use_async=True)
+        return self._get(key, lambda: OpenAI(
+            base_url=base_url, api_key=api_key,
+            http_client=openai.DefaultHttpxClient(limits=POOL_LIMITS, http2=HTTP2_AVAILABLE)
+        ))
+
+    def anthropic_client(self, api_key: str, base_url: str = None, use_async: bool = False):
+        """Shared Anthropic (or AsyncAnthropic) client."""
+        key = ('anthropic', base_url, api_key, use_async)
+        if use_async:
+            return self._get(key, lambda: AsyncAnthropic(
+                api_key=api_key, base_url=base_url,
+                http_client=anthropic.DefaultAsyncHttpxClient(limits=POOL_LIMITS, http2=HTTP2_AVAILABLE)
+            ), use_async=True)
+        return self._get(key, lambda: Anthropic(
+            api_key=api_key, base_url=base_url,
+            http_client=anthropic.DefaultHttpxClient(limits=POOL_LIMITS, http2=HTTP2_AVAILABLE)
+        ))
+
+    def stats(self) -> Dict[str, int]:
+        """Pool hits, misses and number of live clients."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'clients': len(self._clients)}
+
+
+client_pool = ClientPool()
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Compiled problem corpus: every problem of a set in one memory-mapped file.
+
+A corpus holds the introduction, the problem texts and a fixed-width index with
+per-problem metadata (number, surrogate type, dimension count, content hash,
+filename and text offsets). It is built once from a problem set directory;
+opening it maps the file and reads only the header, so loading N problems costs
+O(N) regardless of the corpus size, and ID-range / surrogate filters run on the
+index columns without touching the texts. ProblemSetLoader uses the corpus of a
+directory automatically while the directories and introduction files listed in
+its manifest are older than it (a stat per directory, see is_stale); checking
+every problem file for in-place edits is opt-in.
+
+Layout: header (magic, version, count, introduction, index and manifest offsets),
+UTF-8 introduction, filename and content bytes of every problem, index array
+(INDEX_DTYPE), JSON manifest of the source directories and introduction files.
+
+Usage:
+    python corpus.py problem_set/generated_10k                    # build problem_set/generated_10k/problems.corpus
+    python corpus.py problem_set/generated_10k --info --surrogate TPE --ids 50-100
+"""
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+CORPUS_FILE = 'problems.corpus'
+PROBLEM_GLOB = "**/*problem_*.md"
+INTRODUCTION_GLOBS = ("*introduction.md", "**/bo_hpo_llm_test_5_introduction.md")
+# Filename parts of the globs above (`**/` matches at any depth)
+_PROBLEM_NAME = re.compile(fnmatch.translate(PROBLEM_GLOB[len('**/'):]))
+_NESTED_INTRODUCTION_NAME = re.compile(fnmatch.translate(INTRODUCTION_GLOBS[1][len('**/'):]))
+_INTRODUCTION_NAME = re.compile(fnmatch.translate(INTRODUCTION_GLOBS[0]))
+MAGIC = b'BOCORPUS'
+VERSION = 2
+# magic, version, count, introduction offset / length, index offset, manifest offset / length
+HEADER = struct.Struct('<8sIQQQQQQ')
+SURROGATES = ('', 'GP', 'TPE')  # surrogate codes in the index; 0 = not recognized
+INDEX_DTYPE = np.dtype([
+    ('number', '<u4'),        # N of `## QN.` (0 if the header has none)
+    ('surrogate', 'u1'),      # index into SURROGATES
+    ('dims', '<u2'),          # continuous + categorical dimensions
+    ('name_offset', '<u8'),
+    ('name_length', '<u4'),
+    ('offset', '<u8'),
+    ('length', '<u4'),
+    ('hash', 'S16'),          # first 16 hex digits of the content's SHA-256
+])
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+
+def _metadata(content: str) -> Tuple[int, int, int]:
+    """(number, surrogate code, dimension count) of a problem text."""
+    import reference_solver  # imported here: reference_solver loads problem sets through problem_loader
+
+    match = reference_solver.HEADER_PATTERN.search(content)
+    number = int(match.group(1)) if match else 0
+    surrogate = reference_solver.surrogate_type(content)
+    dims = 0
+    try:
+        if surrogate == reference_solver.GP:
+            dims = len(reference_solver.parse_gp_problem(content)['dims'])
+        elif surrogate == reference_solver.TPE:
+            problem = reference_solver.parse_tpe_problem(content)
+            dims = len(problem['categorical']) + len(problem['continuous'])
+    except (ValueError, AttributeError, IndexError, KeyError):
+        pass
+    return number, SURROGATES.index(surrogate or ''), dims
+
+
+def build_corpus(problem_dir: str, output: str = None) -> Path:
+    """
+    Compile a problem set directory into a corpus file.
+
+    Problems keep the order ProblemSetLoader gives them, so result indexes of
+    runs on the directory and on its corpus agree.
+
+    Args:
+        problem_dir: Problem set directory
+        output: Corpus file (defaults to CORPUS_FILE in `problem_dir`)
+
+    Returns:
+        Path: the corpus file
+    """
+    from problem_loader import ProblemSetLoader  # see _metadata
+
+    loader = ProblemSetLoader(problem_dir, use_corpus=False)
+    try:
+        introduction = loader.load_introduction().encode('utf-8')
+    except FileNotFoundError:
+        introduction = b''
+    problem_files = loader.load_problem_files('100')
+    manifest = json.dumps(_manifest(Path(problem_dir))).encode('utf-8')
+
+    path = Path(output) if output else Path(problem_dir) / CORPUS_FILE
+    index = np.zeros(len(problem_files), dtype=INDEX_DTYPE)
+    temporary = path.with_name(path.name + '.tmp')
+    with open(temporary, 'wb') as f:
+        f.write(b'\0' * HEADER.size)
+        f.write(introduction)
+        offset = HEADER.size + len(introduction)
+        for i, problem_file in enumerate(problem_files):
+            name, content = problem_file['filename'].encode('utf-8'), problem_file['content'].encode('utf-8')
+            index[i] = (*_metadata(problem_file['content']), offset, len(name), offset + len(name), len(content),
+                        content_hash(problem_file['content']))
+            f.write(name + content)
+            offset += len(name) + len(content)
+        padding = -offset % INDEX_DTYPE.alignment
+        f.write(b'\0' * padding)
+        index_offset = offset + padding
+        f.write(index.tobytes())
+        manifest_offset = index_offset + index.nbytes
+        f.write(manifest)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(index), HEADER.size, len(introduction), index_offset,
+                            manifest_offset, len(manifest)))
+    os.replace(temporary, path)
+    os.utime(path)  # newer than the directory entry the rename just touched
+    return path
+
+
+class Corpus:
+    def __init__(self, path: str):
+        """Memory-map a corpus file; only the header is read."""
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = struct.unpack_from('<8sI', self._map)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"Not a version {VERSION} problem corpus (rebuild it): {self.path}")
+        _, _, count, intro_offset, intro_length, index_offset, manifest_offset, manifest_length = \
+            HEADER.unpack_from(self._map)
+        self._introduction = (intro_offset, intro_length)
+        self._manifest = (manifest_offset, manifest_length)
+        self.index = np.frombuffer(self._map, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def introduction(self) -> str:
+        offset, length = self._introduction
+        return self._map[offset:offset + length].decode('utf-8')
+
+    def select(self, ids: Tuple[int, int] = None, surrogate: str = None) -> np.ndarray:
+        """
+        Positions of the problems matching all given filters, in corpus order.
+
+        Args:
+            ids: Inclusive (first, last) range of problem numbers
+            surrogate: 'GP' or 'TPE'
+        """
+        mask = np.ones(len(self.index), dtype=bool)
+        if ids is not None:
+            numbers = self.index['number']
+            mask &= (numbers >= ids[0]) & (numbers <= ids[1])
+        if surrogate is not None:
+            mask &= self.index['surrogate'] == SURROGATES.index(surrogate)
+        return np.flatnonzero(mask)
+
+    def manifest(self) -> Dict[str, List[str]]:
+        """Source directories and introduction files of the set, relative to its directory (see _manifest)."""
+        offset, length = self._manifest
+        return json.loads(self._map[offset:offset + length].decode('utf-8'))
+
+    def filename(self, position: int) -> str:
+        entry = self.index[position]
+        name_offset = int(entry['name_offset'])
+        return self._map[name_offset:name_offset + int(entry['name_length'])].decode('utf-8')
+
+    def problem(self, position: int) -> Dict[str, Any]:
+        """Filename, content and index metadata of the problem at `position`."""
+        entry = self.index[position]
+        offset = int(entry['offset'])
+        return {
+            'filename': self.filename(position),
+            'content': self._map[offset:offset + int(entry['length'])].decode('utf-8'),
+            'id': f"Q{entry['number']}" if entry['number'] else None,
+            'surrogate': SURROGATES[entry['surrogate']] or None,
+            'dims': int(entry['dims']),
+            'hash': entry['hash'].decode('ascii'),
+        }
+
+    def close(self):
+        self.index = None  # release the buffer before unmapping
+        try:
+            self._map.close()
+        except BufferError:  # index records are still referenced; the map is released with them
+            pass
+
+
+def parse_id_range(text: str) -> Tuple[int, int]:
+    """Inclusive (first, last) problem number range from 'N' or 'FIRST-LAST'."""
+    first, _, last = text.partition('-')
+    return int(first), int(last or first)
+
+
+def _manifest(problem_dir: Path) -> Dict[str, List[str]]:
+    """Every non-hidden directory under `problem_dir` and every introduction file the loader may read."""
+    directories, introductions = [], []
+    for root, names, files in os.walk(problem_dir):
+        names[:] = sorted(name for name in names if not name.startswith('.'))  # skipped by glob as well
+        relative = Path(root).relative_to(problem_dir)
+        directories.append(relative.as_posix())
+        for name in sorted(files):
+            if _NESTED_INTRODUCTION_NAME.match(name) or (root == str(problem_dir) and _INTRODUCTION_NAME.match(name)):
+                introductions.append((relative / name).as_posix())
+    return {'directories': directories, 'introductions': introductions}
+
+
+def is_stale(corpus: Corpus, problem_dir: Path, full: bool = False) -> bool:
+    """
+    Whether the problem files in `problem_dir` changed after `corpus` was built.
+
+    By default only the directories and introduction files of the corpus manifest
+    are stat'ed: adding, removing or replacing a problem file (generators and most
+    editors write a new file) updates its directory's mtime. A problem file edited
+    in place does not; `full` also stats every problem file to catch that, which
+    costs a stat per problem. A directory without problem files (the corpus shipped
+    on its own) is never stale.
+    """
+    built = corpus.path.stat().st_mtime_ns
+    if full:
+        problems, newest = _scan_sources(problem_dir)
+        if not problems:
+            return False
+        return problems != len(corpus) or max(newest, problem_dir.stat().st_mtime_ns) > built
+
+    manifest = corpus.manifest()
+    for relative in manifest['directories'] + manifest['introductions']:
+        try:
+            changed = (problem_dir / relative).stat().st_mtime_ns > built
+        except FileNotFoundError:
+            changed = True
+        if changed:
+            return _has_problems(problem_dir)
+    return False
+
+
+def _has_problems(directory: Path) -> bool:
+    """Whether any problem file exists under `directory` (stops at the first one)."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir() and _has_problems(entry.path):
+                return True
+            if _PROBLEM_NAME.match(entry.name):
+                return True
+    return False
+
+
+def _scan_sources(directory: Path, top: bool = True) -> Tuple[int, int]:
+    """Number of problem files and newest mtime (ns) of the problem and introduction files under `directory`."""
+    problems, newest = 0, 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):  # skipped by glob as well
+                continue
+            if entry.is_dir():
+                count, mtime = _scan_sources(entry.path, top=False)
+                problems, newest = problems + count, max(newest, mtime)
+            elif _PROBLEM_NAME.match(entry.name):
+                problems += 1
+                newest = max(newest, entry.stat().st_mtime_ns)
+            elif _NESTED_INTRODUCTION_NAME.match(entry.name) or (top and _INTRODUCTION_NAME.match(entry.name)):
+                newest = max(newest, entry.stat().st_mtime_ns)
+    return problems, newest
+
+
+def open_corpus(problem_path: Path, check_stale: bool = False) -> Optional[Corpus]:
+    """
+    Corpus for a problem set path: the path itself if it is a corpus file, else
+    the directory's CORPUS_FILE unless its problem files changed since it was built
+    or it has an older format (None then).
+
+    Args:
+        problem_path: Problem set directory or corpus file
+        check_stale: Also look for problem files edited in place (a stat per problem; see is_stale)
+
+    Raises:
+        ValueError: `problem_path` is not a current corpus, or is older than the problem files beside it
+    """
+    problem_path = Path(problem_path)
+    if problem_path.is_file():
+        corpus = Corpus(problem_path)
+        if is_stale(corpus, problem_path.parent, full=check_stale):
+            corpus.close()
+            raise ValueError(f"{problem_path} is older than the problem files in {problem_path.parent}; "
+                             f"rebuild it with: python corpus.py {problem_path.parent}")
+        return corpus
+    path = problem_path / CORPUS_FILE
+    if not path.is_file():
+        return None
+    try:
+        corpus = Corpus(path)
+    except ValueError:  # built by an older version: read the files until it is rebuilt
+        return None
+    if is_stale(corpus, problem_path, full=check_stale):
+        corpus.close()
+        return None
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or inspect a compiled problem corpus')
+    parser.add_argument('problem_dir', help='Problem set directory (or corpus file with --info)')
+    parser.add_argument('-o', '--output', help=f'Corpus file (default: <problem_dir>/{CORPUS_FILE})')
+    parser.add_argument('--info', action='store_true', help='List the corpus index instead of building it')
+    parser.add_argument('--ids', help='With --info: inclusive problem number range, e.g. 50-100')
+    parser.add_argument('--surrogate', choices=['GP', 'TPE'], help='With --info: only this surrogate type')
+    parser.add_argument('--check-stale', action='store_true',
+                        help='With --info: also stat every problem file for in-place edits')
+    args = parser.parse_args()
+
+    if not args.info:
+        path = build_corpus(args.problem_dir, args.output)
+        corpus = Corpus(path)
+        print(f"Built {path} with {len(corpus)} problems ({path.stat().st_size / 1e6:.1f} MB)")
+        corpus.close()
+        return
+
+    try:
+        corpus = open_corpus(Path(args.output or args.problem_dir), args.check_stale)
+    except ValueError as e:
+        parser.error(str(e))
+    if corpus is None:
+        parser.error(f"No up-to-date corpus in {args.problem_dir}; build it first")
+    ids = parse_id_range(args.ids) if args.ids else None
+    positions = corpus.select(ids, args.surrogate)
+    for position in positions:
+        entry = corpus.index[position]
+        print(f"Q{entry['number']:<6} {SURROGATES[entry['surrogate']] or '-':<4} dims={entry['dims']:<3} "
+              f"{entry['hash'].decode('ascii')}")
+    print(f"{len(positions)} of {len(corpus)} problems")
+    corpus.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Sequential early stopping of a run on model accuracy.
+
+With `main.py --early-stop THRESHOLD` every response is scored as soon as it
+arrives (recommendation extracted as in scoring.py, compared with the reference
+solver's candidate) and a Beta posterior on accuracy (uniform prior) is kept per
+surrogate type. No further problems are issued once the posterior is decisive:
+- the accuracy of some surrogate type is below the threshold with probability
+  >= confidence (the model fails the cutoff), or
+- the accuracy of every surrogate type in the problem set is above it with
+  probability >= confidence (the model passes),
+in both cases counting only surrogates with at least `min_scored` scored responses.
+Unparsed responses count as wrong; failed requests are not scored. Problems that
+were not sent are missing from the journal, so `--resume` completes the run.
+"""
+
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import reference_solver
+import scoring
+
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_MIN_SCORED = 10
+INTERVAL_TOLERANCE = 1e-4
+
+BELOW = 'below'
+ABOVE = 'above'
+
+
+def beta_cdf(x: float, a: int, b: int) -> float:
+    """P(p <= x) for p ~ Beta(a, b) with integer a, b >= 1, i.e. P(Binomial(a + b - 1, x) >= a)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    n = a + b - 1
+    log_x, log_rest, log_n = math.log(x), math.log1p(-x), math.lgamma(n + 1)
+    total = sum(math.exp(log_n - math.lgamma(j + 1) - math.lgamma(n - j + 1) + j * log_x + (n - j) * log_rest)
+                for j in range(a, n + 1))
+    return min(total, 1.0)
+
+
+def beta_quantile(q: float, a: int, b: int) -> float:
+    """Inverse of beta_cdf by bisection."""
+    low, high = 0.0, 1.0
+    while high - low > INTERVAL_TOLERANCE:
+        middle = (low + high) / 2
+        if beta_cdf(middle, a, b) < q:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+class AccuracyMonitor:
+    def __init__(self, threshold: float, confidence: float = DEFAULT_CONFIDENCE,
+                 min_scored: int = DEFAULT_MIN_SCORED):
+        """
+        Running accuracy posterior per surrogate type and the stop decision.
+
+        Args:
+            threshold: Accuracy cutoff in (0, 1)
+            confidence: Posterior probability needed to decide above / below the cutoff
+            min_scored: Scored responses a surrogate type needs before it can be decided
+        """
+        if not 0.0 < threshold < 1.0:
+            raise ValueError(f"Accuracy threshold must be between 0 and 1, got {threshold}")
+        if not 0.5 < confidence < 1.0:
+            raise ValueError(f"Confidence must be between 0.5 and 1, got {confidence}")
+        self.threshold = threshold
+        self.confidence = confidence
+        self.min_scored = min_scored
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.stopped: Optional[str] = None  # BELOW or ABOVE once decisive
+        self._truth: Dict[str, tuple] = {}  # problem file -> (surrogate, candidates, expected index)
+        self._log = print
+
+    def prepare(self, problem_files: List[Dict[str, Any]], introduction: str, problems_dir: str, log=print):
+        """
+        Solve the ground truth of every problem of the run in one batch.
+
+        Args:
+            problem_files: Problem files of the run (filename, content)
+            introduction: Introduction of the problem set
+            problems_dir: Problem set directory (or corpus file beside it), searched for the answer key (GP kernels of the 24-problem set)
+            log: Function used for progress messages
+        """
+        self._log = log
+        problems_dir = Path(problems_dir)
+        answers = scoring.load_answer_keys([problems_dir.parent if problems_dir.is_file() else problems_dir])
+        problems = {problem_file['filename']: scoring.parse_scored_problem(
+                        problem_file['content'], introduction,
+                        answers.get(scoring.problem_set_name(problem_file['filename']), {}))
+                    for problem_file in problem_files}
+        for filename, solved in scoring.solve_parsed(problems).items():
+            problem = problems[filename][0]
+            candidates = [reference_solver.candidate_values(problem, i) for i in range(len(problem['candidates']))]
+            self._truth[filename] = (problem['surrogate'], candidates, solved['recommended'])
+            self.counts.setdefault(problem['surrogate'], {'scored': 0, 'correct': 0})
+        unscored = len(problem_files) - len(self._truth)
+        log(f"Early stop at accuracy {self.threshold:.0%} ({self.confidence:.0%} posterior): "
+            f"{len(self._truth)} problems scorable" + (f", {unscored} without ground truth" if unscored else ""))
+
+    def record(self, problem_file: str, response: Optional[str], decide: bool = True) -> Optional[bool]:
+        """
+        Score one response and update the stop decision (unless `decide` is False, see check()).
+
+        Returns:
+            bool: whether the recommended candidate is correct, or None if the problem has no ground truth
+        """
+        if problem_file not in self._truth:
+            return None
+        surrogate, candidates, expected = self._truth[problem_file]
+        predicted, _ = scoring.extract_recommendation(response or '', candidates)
+        correct = predicted == expected
+        counts = self.counts[surrogate]
+        counts['scored'] += 1
+        counts['correct'] += int(correct)
+        if decide:
+            self.check()
+        return correct
+
+    def probability_below(self, surrogate: str) -> float:
+        """Posterior probability that the accuracy on `surrogate` problems is below the threshold."""
+        counts = self.counts[surrogate]
+        return beta_cdf(self.threshold, counts['correct'] + 1, counts['scored'] - counts['correct'] + 1)
+
+    def decision(self, surrogate: str) -> Optional[str]:
+        """BELOW, ABOVE or None (undecided) for one surrogate type."""
+        if self.counts[surrogate]['scored'] < self.min_scored:
+            return None
+        below = self.probability_below(surrogate)
+        if below >= self.confidence:
+            return BELOW
+        if 1.0 - below >= self.confidence:
+            return ABOVE
+        return None
+
+    def check(self):
+        """Stop the run if the posterior has become decisive."""
+        if self.stopped is not None:
+            return
+        decisions = {surrogate: self.decision(surrogate) for surrogate in self.counts}
+        if BELOW in decisions.values():
+            self.stopped = BELOW
+        elif decisions and all(decision == ABOVE for decision in decisions.values()):
+            self.stopped = ABOVE
+        if self.stopped:
+            stats = ', '.join(f"{surrogate} {counts['correct']}/{counts['scored']} ({decisions[surrogate] or 'undecided'})"
+                              for surrogate, counts in self.counts.items())
+            self._log(f"Early stop: accuracy is {self.stopped} {self.threshold:.0%} "
+                      f"with {self.confidence:.0%} confidence ({stats}); issuing no further problems")
+
+    def summary(self) -> Dict[str, Any]:
+        """Threshold, stop decision and, per surrogate type, counts, accuracy and credible interval."""
+        tail = (1.0 - self.confidence) / 2
+        surrogates = {}
+        for surrogate, counts in self.counts.items():
+            a, b = counts['correct'] + 1, counts['scored'] - counts['correct'] + 1
+            surrogates[surrogate] = {
+                **counts,
+                'accuracy': round(counts['correct'] / counts['scored'], 4) if counts['scored'] else None,
+                'interval': [round(beta_quantile(tail, a, b), 4), round(beta_quantile(1.0 - tail, a, b), 4)],
+                'p_below': round(self.probability_below(surrogate), 4),
+                'decision': self.decision(surrogate),
+            }
+        return {'threshold': self.threshold, 'confidence': self.confidence, 'min_scored': self.min_scored,
+                'stopped': self.stopped, 'surrogates': surrogates}
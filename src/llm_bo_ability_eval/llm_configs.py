@@ -52,6 +52,7 @@ KIMI_LLM_CONFIG = {
     "model": "qwen/qwen3-235b-a22b:free",
     "temperature": 0.7,
     "max_tokens": 15000,
+    "rpm": 20,  # OpenRouter limit for ":free" models
     # "cache_seed": None,
     "base_url": "https://openrouter.ai/api/v1",
     "api_key": os.environ['OPENAI_API_KEY'], # remember to preset api key in environment variable GEMINI_API_KEY
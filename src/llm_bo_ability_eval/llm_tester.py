@@ -1,78 +1,635 @@
-from openai import OpenAI
+import asyncio
+import datetime
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+from openai.types.chat import ChatCompletion
 import google.generativeai as genai
-from anthropic import Anthropic
+from google.generativeai import caching
+
+from client_pool import client_pool
+from pricing import compute_cost, get_price
+from rate_limiter import get_rate_limiter, is_throttle_error
+from response_cache import ResponseCache, cache_enabled, make_cache_key
+from retry_policy import DeadlineExceeded, RequestFailed, RetryPolicy, error_record
+from stream_timer import StreamTimer
+from telemetry import CallResult
+
+ERROR_RESPONSE_PREFIX = "Error generating response:"
+
+
+def is_error_response(response: str) -> bool:
+    """Return True for a missing response or the placeholder text stored by older runs when a request failed."""
+    return not response or response.startswith(ERROR_RESPONSE_PREFIX)
+
+
+class BatchRequestError(Exception):
+    """A request that failed inside a provider batch."""
 
 class LLMTester:
-    def __init__(self, llm_config: dict, system_prompt: str):
-        """Initialize LLM tester with configuration."""
+    # Lifetime of a Gemini context cache holding the shared prompt prefix
+    GEMINI_CACHE_TTL = datetime.timedelta(hours=1)
+    OPENAI_BATCH_FINAL_STATES = ('completed', 'failed', 'expired', 'cancelled')
+
+    def __init__(self, llm_config: dict, system_prompt: str, response_cache: ResponseCache = None,
+                 retry_policy: RetryPolicy = None, stream: bool = False, log=print):
+        """
+        Initialize LLM tester with configuration.
+
+        Args:
+            llm_config: One of the configs in llm_configs.py
+            system_prompt: System prompt sent with every request
+            response_cache: Optional cache consulted before each request
+                (ignored for configs with `"cache_seed": None`)
+            retry_policy: Retry/deadline policy (defaults to RetryPolicy.from_config(llm_config))
+            stream: Stream responses and measure time-to-first-token and decode speed
+            log: Function used for messages about the run (e.g. Gemini context caching falling back)
+        """
         self.current_config = None
+        self.log = log
         self.system_prompt = system_prompt
         self.client = None
+        self.async_client = None
         self._setup_llm(llm_config, system_prompt)
+        self.rate_limiter = get_rate_limiter(llm_config)
+        self.response_cache = response_cache if cache_enabled(llm_config) else None
+        self.retry_policy = retry_policy or RetryPolicy.from_config(llm_config)
+        self.stream = stream
+        self.price = get_price(llm_config)
+        self._gemini_prefix_models = {}
+        self._gemini_prefix_lock = threading.Lock()
+        self._gemini_prefix_alock = asyncio.Lock()
 
     def _setup_llm(self, llm_config: dict, system_prompt: str):
         """Setup the specified LLM client."""
         # Find config for the specified LLM
         llm_name = llm_config['model']
         self.current_config = llm_config
-        
-        # Setup client based on LLM type
+
+        # Setup client based on LLM type (clients come from the process-wide pool)
         if 'gpt' in llm_name.lower() or 'o4' in llm_name.lower():
-            self.client = OpenAI(
-                base_url=llm_config['base_url'],
-                api_key=llm_config['api_key']
-            )
+            self.client = client_pool.openai_client(llm_config['base_url'], llm_config['api_key'])
+            self.async_client = client_pool.openai_client(llm_config['base_url'], llm_config['api_key'], use_async=True)
         elif 'gemini' in llm_name.lower():
             genai.configure(api_key=llm_config['api_key'])
             self.client = genai.GenerativeModel(llm_name, system_instruction=system_prompt)
+            # GenerativeModel exposes generate_content_async on the same object
+            self.async_client = self.client
         elif 'claude' in llm_name.lower():
-            self.client = Anthropic(api_key=llm_config['api_key'])
+            # base_url is optional; set it to point Claude configs at a local stand-in server
+            self.client = client_pool.anthropic_client(llm_config['api_key'], llm_config.get('base_url'))
+            self.async_client = client_pool.anthropic_client(llm_config['api_key'], llm_config.get('base_url'), use_async=True)
         elif 'deepseek' in llm_name.lower() or 'qwen' in llm_name.lower():
-            self.client = OpenAI(
-                base_url=llm_config['base_url'],
-                api_key=llm_config['api_key']
-            )
+            self.client = client_pool.openai_client(llm_config['base_url'], llm_config['api_key'])
+            self.async_client = client_pool.openai_client(llm_config['base_url'], llm_config['api_key'], use_async=True)
         else:
             raise ValueError(f"Unsupported LLM type: {llm_name}")
-    
-    def generate_response(self, prompt: str) -> str:
-        """Generate response using the current LLM."""
+
+    def _gemini_prefix_key(self, prompt_prefix: str) -> Optional[str]:
+        """Key of the context cache for `prompt_prefix`, or None when the request can't use one."""
+        if not prompt_prefix or 'gemini' not in self.current_config['model'].lower():
+            return None
+        return hashlib.sha256(prompt_prefix.encode('utf-8')).hexdigest()
+
+    def _create_gemini_prefix_model(self, prompt_prefix: str):
+        """Create the context cache of system prompt + `prompt_prefix` (blocking); None if it can't be created."""
+        llm_name = self.current_config['model']
+        try:
+            cached_content = caching.CachedContent.create(
+                model=f"models/{llm_name}",
+                system_instruction=self.system_prompt,
+                contents=[prompt_prefix],
+                ttl=self.GEMINI_CACHE_TTL,
+            )
+            return genai.GenerativeModel.from_cached_content(cached_content)
+        except Exception as e:
+            self.log(f"Gemini context caching unavailable, sending the full prompt: {str(e)}")
+            return None
+
+    def _gemini_prefix_model(self, prompt_prefix: str):
+        """
+        Gemini model bound to a context cache of system prompt + `prompt_prefix`.
+
+        Returns None for other providers, or when the cache can't be created
+        (e.g. the prefix is below the model's minimum cacheable size).
+        """
+        key = self._gemini_prefix_key(prompt_prefix)
+        if key is None:
+            return None
+        with self._gemini_prefix_lock:
+            if key not in self._gemini_prefix_models:
+                self._gemini_prefix_models[key] = self._create_gemini_prefix_model(prompt_prefix)
+            return self._gemini_prefix_models[key]
+
+    async def _agemini_prefix_model(self, prompt_prefix: str):
+        """Async variant of _gemini_prefix_model(): the cache is created in a worker thread."""
+        key = self._gemini_prefix_key(prompt_prefix)
+        if key is None:
+            return None
+        async with self._gemini_prefix_alock:
+            if key not in self._gemini_prefix_models:
+                loop = asyncio.get_running_loop()
+                self._gemini_prefix_models[key] = await loop.run_in_executor(
+                    None, self._create_gemini_prefix_model, prompt_prefix)
+            return self._gemini_prefix_models[key]
+
+    def _request_kwargs(self, prompt: str, prompt_prefix: str = '', prefix_cached: bool = False) -> dict:
+        """
+        Build the provider request for a prompt; shared by the sync and async paths.
+
+        `prompt_prefix` is the part shared by every problem. It always comes first so
+        OpenAI-compatible servers (OpenAI, OpenRouter, Ollama) can reuse it through
+        automatic prefix caching, Anthropic gets a cache_control breakpoint after it,
+        and for Gemini it is left out when it already lives in a context cache.
+        """
         llm_name = self.current_config['model']
         max_tokens = self.current_config.get('max_tokens', 5000)
         temperature = self.current_config.get('temperature', 0.8)
-        
+
+        if 'gemini' in llm_name.lower():
+            return {'contents': prompt if prefix_cached else prompt_prefix + prompt}
+        elif 'claude' in llm_name.lower():
+            if prompt_prefix:
+                content = [
+                    {"type": "text", "text": prompt_prefix, "cache_control": {"type": "ephemeral"}},
+                    {"type": "text", "text": prompt}
+                ]
+            else:
+                content = prompt
+            return {
+                'model': llm_name,
+                'max_tokens': max_tokens,
+                'temperature': temperature,
+                'system': self.system_prompt,
+                'messages': [{"role": "user", "content": content}]
+            }
+        elif 'o4-mini' in llm_name.lower():  # OpenAI-compatible APIs (o4-mini does not support max tokens)
+            return {
+                'model': llm_name,
+                'messages': [
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": prompt_prefix + prompt}
+                ],
+            }
+        else:  # OpenAI-compatible APIs (GPT, DeepSeek, Qwen, etc.)
+            return {
+                'model': llm_name,
+                'messages': [
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": prompt_prefix + prompt}
+                ],
+                'max_tokens': max_tokens,
+                'temperature': temperature
+            }
+
+    def _create(self, client, request: dict, use_async: bool = False, timeout: Optional[float] = None,
+                stream: bool = False):
+        """
+        Send a request with the given client; returns a coroutine when use_async is set.
+
+        Retries are left to the RetryPolicy, so the SDK's own retries are switched off.
+        With `stream` the provider's stream object is returned instead of a full response.
+        """
+        llm_name = self.current_config['model']
+        if 'gemini' in llm_name.lower():
+            if timeout is not None:
+                request = dict(request, request_options={'timeout': timeout})
+            if stream:
+                request = dict(request, stream=True)
+            if use_async:
+                return client.generate_content_async(**request)
+            return client.generate_content(**request)
+
+        if timeout is not None:
+            request = dict(request, timeout=timeout)
+        if stream:
+            request = dict(request, stream=True)
+            if 'claude' not in llm_name.lower():
+                # The final chunk then carries the token usage
+                request['stream_options'] = {'include_usage': True}
+        client = client.with_options(max_retries=0)
+        if 'claude' in llm_name.lower():
+            return client.messages.create(**request)
+        else:
+            return client.chat.completions.create(**request)
+
+    def _extract_text(self, response) -> str:
+        """Pull the answer text out of a provider response."""
+        llm_name = self.current_config['model']
+        if 'gemini' in llm_name.lower():
+            return response.text
+        elif 'claude' in llm_name.lower():
+            return response.content[0].text
+        else:
+            return response.choices[0].message.content
+
+    def _extract_usage(self, response) -> dict:
+        """Input/output token counts of a response, split into cached, cache-write and uncached input."""
+        llm_name = self.current_config['model']
+        if 'gemini' in llm_name.lower():
+            usage = getattr(response, 'usage_metadata', None)
+            if usage is None:
+                return {}
+            input_tokens = usage.prompt_token_count or 0
+            cached = getattr(usage, 'cached_content_token_count', 0) or 0
+            written = 0
+            # Thinking tokens are counted apart from the candidates but billed as output
+            reasoning = getattr(usage, 'thoughts_token_count', 0) or 0
+            output_tokens = (usage.candidates_token_count or 0) + reasoning
+        elif 'claude' in llm_name.lower():
+            usage = response.usage
+            # Anthropic reports cache reads and writes separately from input_tokens
+            cached = getattr(usage, 'cache_read_input_tokens', 0) or 0
+            written = getattr(usage, 'cache_creation_input_tokens', 0) or 0
+            input_tokens = usage.input_tokens + cached + written
+            # Extended thinking is included in output_tokens and not reported separately
+            reasoning = 0
+            output_tokens = usage.output_tokens
+        else:
+            usage = getattr(response, 'usage', None)
+            if usage is None:
+                return {}
+            details = getattr(usage, 'prompt_tokens_details', None)
+            cached = (getattr(details, 'cached_tokens', 0) or 0) if details else 0
+            written = 0
+            input_tokens = usage.prompt_tokens
+            output_tokens = usage.completion_tokens
+            completion_details = getattr(usage, 'completion_tokens_details', None)
+            reasoning = (getattr(completion_details, 'reasoning_tokens', 0) or 0) if completion_details else 0
+        return {
+            'input_tokens': input_tokens,
+            'cached_input_tokens': cached,
+            'cache_write_input_tokens': written,
+            'uncached_input_tokens': input_tokens - cached - written,
+            'output_tokens': output_tokens,
+            'reasoning_tokens': reasoning,
+        }
+
+    def _extract_meta(self, response) -> dict:
+        """finish_reason, request/response IDs and answering model of a provider response."""
+        llm_name = self.current_config['model']
+        if 'gemini' in llm_name.lower():
+            candidates = getattr(response, 'candidates', None)
+            finish_reason = getattr(candidates[0].finish_reason, 'name', None) if candidates else None
+            return {'finish_reason': finish_reason, 'request_id': None, 'response_id': None, 'model': llm_name}
+        elif 'claude' in llm_name.lower():
+            finish_reason = response.stop_reason
+        else:
+            finish_reason = response.choices[0].finish_reason if response.choices else None
+        return {
+            'finish_reason': finish_reason,
+            'request_id': getattr(response, '_request_id', None),
+            'response_id': response.id,
+            'model': response.model,
+        }
+
+    def _result(self, text: str, usage: dict, meta: dict, attempts: int, timing: dict = None,
+                batch: bool = False) -> CallResult:
+        """CallResult of a successful request, priced with the model's price table entry."""
+        return CallResult(text, usage, timing=timing, attempts=attempts,
+                          cost=compute_cost(self.price, usage, batch), **meta)
+
+    def _stream_delta(self, event, state: dict) -> Optional[str]:
+        """
+        Output carried by one streamed event: its answer text, '' for reasoning-only
+        output, or None for events without output. Events reporting usage are kept in `state`.
+        """
+        llm_name = self.current_config['model']
+        if 'gemini' in llm_name.lower():
+            try:
+                return event.text
+            except ValueError:
+                # Chunks without text parts (e.g. a final chunk with only finish_reason)
+                return None
+        elif 'claude' in llm_name.lower():
+            if event.type == 'message_start':
+                state['message'] = event.message
+            elif event.type == 'message_delta' and 'message' in state:
+                state['message'].usage.output_tokens = event.usage.output_tokens
+                state['message'].stop_reason = event.delta.stop_reason
+            elif event.type == 'content_block_delta':
+                return event.delta.text if event.delta.type == 'text_delta' else ''
+            return None
+        else:
+            if getattr(event, 'usage', None):
+                state['usage_chunk'] = event
+            state['last_chunk'] = event
+            if not event.choices:
+                return None
+            if event.choices[0].finish_reason:
+                state['finish_reason'] = event.choices[0].finish_reason
+            delta = event.choices[0].delta
+            if delta.content:
+                return delta.content
+            # DeepSeek-R1 / OpenRouter stream their reasoning before the answer
+            if getattr(delta, 'reasoning_content', None) or getattr(delta, 'reasoning', None):
+                return ''
+            return None
+
+    def _stream_result(self, stream, state: dict, parts: list, timer: StreamTimer, attempts: int) -> CallResult:
+        """Assemble the CallResult once a stream has been consumed."""
+        llm_name = self.current_config['model']
+        text = ''.join(parts)
+        if 'gemini' in llm_name.lower():
+            usage = self._extract_usage(stream)
+            meta = self._extract_meta(stream)
+        elif 'claude' in llm_name.lower():
+            usage = self._extract_usage(state['message']) if 'message' in state else {}
+            meta = self._extract_meta(state['message'])
+            meta['request_id'] = stream.response.headers.get('request-id')
+        else:
+            usage = self._extract_usage(state['usage_chunk']) if 'usage_chunk' in state else {}
+            chunk = state.get('last_chunk')
+            meta = {
+                'finish_reason': state.get('finish_reason'),
+                'request_id': stream.response.headers.get('x-request-id'),
+                'response_id': chunk.id if chunk else None,
+                'model': chunk.model if chunk else llm_name,
+            }
+        output_tokens = usage.get('output_tokens') or len(text) // 4
+        return self._result(text, usage, meta, attempts, timer.stats(output_tokens))
+
+    def _consume_stream(self, stream, timer: StreamTimer, attempts: int) -> CallResult:
+        """Read a stream to the end, building the text incrementally."""
+        state, parts = {}, []
+        for event in stream:
+            delta = self._stream_delta(event, state)
+            if delta is not None:
+                timer.mark()
+                parts.append(delta)
+        return self._stream_result(stream, state, parts, timer, attempts)
+
+    async def _aconsume_stream(self, stream, timer: StreamTimer, attempts: int) -> CallResult:
+        """Async variant of _consume_stream()."""
+        state, parts = {}, []
+        async for event in stream:
+            delta = self._stream_delta(event, state)
+            if delta is not None:
+                timer.mark()
+                parts.append(delta)
+        return self._stream_result(stream, state, parts, timer, attempts)
+
+    def _estimate_tokens(self, prompt: str) -> int:
+        """Rough token cost of a request (≈4 characters per token plus the output budget)."""
+        return (len(self.system_prompt) + len(prompt)) // 4 + self.current_config.get('max_tokens', 5000)
+
+    def _call(self, prompt: str, prompt_prefix: str = '') -> CallResult:
+        """
+        Send one prompt behind the rate limiter, retrying transient failures.
+
+        Returns:
+            CallResult: text, usage and telemetry of the successful attempt (latency is set by the caller)
+
+        Raises:
+            RequestFailed: on a fatal error, or when attempts or deadlines run out
+        """
+        prefix_model = self._gemini_prefix_model(prompt_prefix)
+        client = prefix_model or self.client
+        request = self._request_kwargs(prompt, prompt_prefix, prefix_cached=prefix_model is not None)
+        tokens = self._estimate_tokens(prompt_prefix + prompt)
+        start = time.monotonic()
+        deadline = self.retry_policy.deadline_for(start)
+        attempt = 0
+        while True:
+            try:
+                timeout = self.retry_policy.attempt_timeout(deadline)
+            except DeadlineExceeded as e:
+                raise RequestFailed(self.retry_policy.failure_record(e, attempt, start)) from e
+            attempt += 1
+            self.rate_limiter.acquire(tokens)
+            succeeded, error = False, None
+            try:
+                if self.stream:
+                    timer = StreamTimer()
+                    stream = self._create(client, request, timeout=timeout, stream=True)
+                    result = self._consume_stream(stream, timer, attempt)
+                else:
+                    response = self._create(client, request, timeout=timeout)
+                    result = self._result(self._extract_text(response), self._extract_usage(response),
+                                          self._extract_meta(response), attempt)
+                succeeded = True
+                return result
+            except Exception as e:
+                error = e
+            finally:
+                # Also runs on cancellation, which frees the slot without counting as a success or a throttle
+                self.rate_limiter.release(success=succeeded, throttled=error is not None and is_throttle_error(error))
+            delay = self.retry_policy.next_delay(attempt, error, deadline)
+            if delay is None:
+                raise RequestFailed(self.retry_policy.failure_record(error, attempt, start)) from error
+            time.sleep(delay)
+
+    async def _acall(self, prompt: str, prompt_prefix: str = '') -> CallResult:
+        """Async variant of _call()."""
+        prefix_model = await self._agemini_prefix_model(prompt_prefix)
+        client = prefix_model or self.async_client
+        request = self._request_kwargs(prompt, prompt_prefix, prefix_cached=prefix_model is not None)
+        tokens = self._estimate_tokens(prompt_prefix + prompt)
+        start = time.monotonic()
+        deadline = self.retry_policy.deadline_for(start)
+        attempt = 0
+        while True:
+            try:
+                timeout = self.retry_policy.attempt_timeout(deadline)
+            except DeadlineExceeded as e:
+                raise RequestFailed(self.retry_policy.failure_record(e, attempt, start)) from e
+            attempt += 1
+            await self.rate_limiter.aacquire(tokens)
+            succeeded, error = False, None
+            try:
+                if self.stream:
+                    timer = StreamTimer()
+                    stream = await self._create(client, request, use_async=True, timeout=timeout, stream=True)
+                    result = await self._aconsume_stream(stream, timer, attempt)
+                else:
+                    response = await self._create(client, request, use_async=True, timeout=timeout)
+                    result = self._result(self._extract_text(response), self._extract_usage(response),
+                                          self._extract_meta(response), attempt)
+                succeeded = True
+                return result
+            except Exception as e:
+                error = e
+            finally:
+                # Also runs on cancellation, which frees the slot without counting as a success or a throttle
+                self.rate_limiter.release(success=succeeded, throttled=error is not None and is_throttle_error(error))
+            delay = self.retry_policy.next_delay(attempt, error, deadline)
+            if delay is None:
+                raise RequestFailed(self.retry_policy.failure_record(error, attempt, start)) from error
+            await asyncio.sleep(delay)
+
+    def _finish(self, calls: list, text: Optional[str], start: float) -> CallResult:
+        """Result of generate_result(): the provider call's result, or a cache hit when no call was made."""
+        if calls:
+            result = calls[0]
+        else:
+            result = CallResult(text, model=self.current_config['model'], from_cache=True)
+        result.latency = time.monotonic() - start
+        return result
+
+    def _failure(self, error: Exception, start: float) -> CallResult:
+        """CallResult of a request that raised instead of answering."""
+        elapsed = time.monotonic() - start
+        record = error.record if isinstance(error, RequestFailed) else error_record(error, 1, elapsed)
+        return CallResult(error=record, latency=elapsed, attempts=record['attempts'],
+                          model=self.current_config['model'])
+
+    def generate_result(self, prompt: str, prompt_prefix: str = '') -> CallResult:
+        """
+        Generate response with its token usage and telemetry.
+
+        Args:
+            prompt: Problem-specific part of the user prompt
+            prompt_prefix: Leading part of the user prompt shared by many requests;
+                marked for provider-side prefix caching
+
+        Returns:
+            CallResult: text (None on failure), usage, error record, streaming timing,
+                latency, attempts, finish_reason, request IDs and cost
+        """
+        calls = []
+
+        def call() -> str:
+            result = self._call(prompt, prompt_prefix)
+            calls.append(result)
+            return result.text
+
+        start = time.monotonic()
         try:
-            if 'gemini' in llm_name.lower():
-                response = self.client.generate_content(prompt)
-                return response.text
-            elif 'claude' in llm_name.lower():
-                msg = self.client.messages.create(
-                    model=llm_name,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    system=self.system_prompt,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                return msg.content[0].text
-            elif 'o4-mini' in llm_name.lower():  # OpenAI-compatible APIs (o4-mini does not support max tokens)
-                completion = self.client.chat.completions.create(
-                    model=llm_name,
-                    messages=[
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": prompt}
-                    ],
-                )
-                return completion.choices[0].message.content
-            else:  # OpenAI-compatible APIs (GPT, DeepSeek, Qwen, etc.)
-                completion = self.client.chat.completions.create(
-                    model=llm_name,
-                    messages=[
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=max_tokens,
-                    temperature=temperature
-                )
-                return completion.choices[0].message.content
+            if self.response_cache is None:
+                text = call()
+            else:
+                key = make_cache_key(self.current_config, self.system_prompt, prompt_prefix + prompt)
+                text = self.response_cache.get_or_compute(key, call)
         except Exception as e:
-            return f"Error generating response: {str(e)}"
+            return self._failure(e, start)
+        return self._finish(calls, text, start)
+
+    async def agenerate_result(self, prompt: str, prompt_prefix: str = '') -> CallResult:
+        """Async variant of generate_result()."""
+        calls = []
+
+        async def call() -> str:
+            result = await self._acall(prompt, prompt_prefix)
+            calls.append(result)
+            return result.text
+
+        start = time.monotonic()
+        try:
+            if self.response_cache is None:
+                text = await call()
+            else:
+                key = make_cache_key(self.current_config, self.system_prompt, prompt_prefix + prompt)
+                text = await self.response_cache.aget_or_compute(key, call)
+        except Exception as e:
+            return self._failure(e, start)
+        return self._finish(calls, text, start)
+
+    def generate_response(self, prompt: str, prompt_prefix: str = '') -> str:
+        """Generate response using the current LLM (an error string if the request failed)."""
+        result = self.generate_result(prompt, prompt_prefix)
+        return result.text if result.ok else f"{ERROR_RESPONSE_PREFIX} {result.error['message']}"
+
+    async def agenerate_response(self, prompt: str, prompt_prefix: str = '') -> str:
+        """Generate response using the current LLM without blocking the event loop."""
+        result = await self.agenerate_result(prompt, prompt_prefix)
+        return result.text if result.ok else f"{ERROR_RESPONSE_PREFIX} {result.error['message']}"
+
+    async def arun_batch(self, prompts: Dict[str, str], prompt_prefix: str = '', poll_interval: float = 30.0,
+                         log=print) -> Dict[str, CallResult]:
+        """
+        Answer many prompts through the provider's batch API (OpenAI files + batches, or Anthropic message batches).
+
+        Requests are built with the same _request_kwargs() as synchronous calls. Batches bypass
+        the rate limiter and the response cache.
+
+        Args:
+            prompts: custom_id -> problem-specific prompt
+            prompt_prefix: Shared leading part of every prompt
+            poll_interval: Seconds between status checks
+            log: Function used for progress messages
+
+        Returns:
+            dict: custom_id -> CallResult (without latency; the batch is timed as a whole)
+        """
+        llm_name = self.current_config['model']
+        if 'gemini' in llm_name.lower():
+            raise ValueError(f"Batch mode is not supported for {llm_name}")
+
+        requests = {custom_id: self._request_kwargs(prompt, prompt_prefix) for custom_id, prompt in prompts.items()}
+        if 'claude' in llm_name.lower():
+            outputs = await self._arun_anthropic_batch(requests, poll_interval, log)
+        else:
+            outputs = await self._arun_openai_batch(requests, poll_interval, log)
+
+        results = {}
+        for custom_id in prompts:
+            if custom_id not in outputs or isinstance(outputs[custom_id], str):
+                error = BatchRequestError(outputs.get(custom_id, "missing from batch output"))
+                results[custom_id] = CallResult(error=error_record(error, 1, 0.0), attempts=1, model=llm_name)
+            else:
+                response = outputs[custom_id]
+                results[custom_id] = self._result(self._extract_text(response), self._extract_usage(response),
+                                                  self._extract_meta(response), attempts=1, batch=True)
+        return results
+
+    async def _arun_openai_batch(self, requests: Dict[str, dict], poll_interval: float, log) -> dict:
+        """Upload a JSONL batch to /v1/files, run it via /v1/batches and collect ChatCompletions (or error strings)."""
+        lines = [
+            json.dumps({'custom_id': custom_id, 'method': 'POST', 'url': '/v1/chat/completions', 'body': request})
+            for custom_id, request in requests.items()
+        ]
+        input_file = await self.async_client.files.create(
+            file=('batch_input.jsonl', ('\n'.join(lines) + '\n').encode('utf-8')), purpose='batch'
+        )
+        batch = await self.async_client.batches.create(
+            input_file_id=input_file.id, endpoint='/v1/chat/completions', completion_window='24h'
+        )
+        log(f"Submitted batch {batch.id} with {len(requests)} requests")
+
+        while batch.status not in self.OPENAI_BATCH_FINAL_STATES:
+            await asyncio.sleep(poll_interval)
+            batch = await self.async_client.batches.retrieve(batch.id)
+            counts = batch.request_counts
+            log(f"Batch {batch.id}: {batch.status}" + (f" ({counts.completed}/{counts.total} done)" if counts else ""))
+
+        outputs = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.async_client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get('response') or {}
+                if record.get('error') or response.get('status_code') != 200:
+                    outputs[record['custom_id']] = str(record.get('error') or response.get('body'))
+                else:
+                    outputs[record['custom_id']] = ChatCompletion.model_validate(response['body'])
+        if batch.status != 'completed':
+            log(f"Batch {batch.id} ended with status {batch.status}")
+        return outputs
+
+    async def _arun_anthropic_batch(self, requests: Dict[str, dict], poll_interval: float, log) -> dict:
+        """Run an Anthropic message batch and collect Messages (or error strings)."""
+        batch = await self.async_client.messages.batches.create(
+            requests=[{'custom_id': custom_id, 'params': request} for custom_id, request in requests.items()]
+        )
+        log(f"Submitted batch {batch.id} with {len(requests)} requests")
+
+        while batch.processing_status != 'ended':
+            await asyncio.sleep(poll_interval)
+            batch = await self.async_client.messages.batches.retrieve(batch.id)
+            counts = batch.request_counts
+            log(f"Batch {batch.id}: {batch.processing_status} ({counts.succeeded + counts.errored}/{len(requests)} done)")
+
+        outputs = {}
+        async for entry in await self.async_client.messages.batches.results(batch.id):
+            if entry.result.type == 'succeeded':
+                outputs[entry.custom_id] = entry.result.message
+            else:
+                outputs[entry.custom_id] = f"batch request {entry.result.type}"
+        return outputs
@@ -1,94 +1,439 @@
 import argparse
+import asyncio
 import datetime
+import re
+import time
 import yaml
 from pathlib import Path
 
+from client_pool import client_pool
+from corpus import parse_id_range
+from early_stop import DEFAULT_CONFIDENCE, DEFAULT_MIN_SCORED, AccuracyMonitor
 from llm_configs import LLM_MAPPING
 from llm_tester_system_prompt import bo_calculation_system_prompt
-from llm_tester import LLMTester
+from llm_tester import LLMTester, is_error_response
+from response_cache import ResponseCache
+from retry_policy import RetryPolicy
+from telemetry import CallResult, write_run_summary
+from result_writer import JOURNAL_SUFFIX, BlobStore, ResultJournal, export_yaml, iter_journal, iter_latest_results
 from problem_loader import ProblemSetLoader
 
-def main():
-    parser = argparse.ArgumentParser(description='Test LLMs on Bayesian Optimization problem set')
-    parser.add_argument('-l', '--llm', type=str, choices=["gpt", "gemini", "claude", "deepseek", "qwen"], default="qwen3", help="LLM name to test.")
-    parser.add_argument('-e', '--experiment', default=24, choices=['100', '24'], help='Experiment type: 100-problem, 24-problem, or 5-problem')
-    parser.add_argument('-p', '--problems', default='problem_set/24problems', help='Path to problem set directory')
-    parser.add_argument('-o', '--output', default='results/', help='Output directory for results')
-    parser.add_argument('-m', '--max-files', type=int, help='Maximum number of files to test (for debugging)')
 
-    args = parser.parse_args()
-    
-    # Create output directory
-    timestamp = datetime.datetime.now().strftime("%m%d%H%M%S")
-    output_dir = Path(args.output) / timestamp
-    output_dir.mkdir(exist_ok=True)
-    
+def load_api_keys(key_file: str) -> dict:
+    """Read `llm:api_key` lines (see llm_keys__example.txt)."""
+    keys = {}
+    with open(key_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                llm, key = line.split(':', 1)
+                keys[llm.strip()] = key.strip()
+    return keys
+
+
+def build_prompt_prefix(introduction: str) -> str:
+    """Leading part of every problem prompt; identical across a run so providers can cache it."""
+    return f"""Please solve the Bayesian Optimization problems step by step:
+
+{introduction}
+
+---
+
+"""
+
+
+def build_problem_prompt(problem_content: str) -> str:
+    """Problem-specific part of the prompt, sent after build_prompt_prefix()."""
+    return f"""{problem_content}
+
+Please solve this Bayesian Optimization problem step by step following the same format as shown in the examples above.
+"""
+
+
+def build_prompt(introduction: str, problem_content: str) -> str:
+    """Create prompt with introduction followed by the problem content."""
+    return build_prompt_prefix(introduction) + build_problem_prompt(problem_content)
+
+
+def result_file_prefix(experiment: str, llm_name: str, timestamp: str) -> str:
+    """Common file name prefix of every result file in a run."""
+    return f"{experiment}problems_{timestamp}_{llm_name.replace(':', '_')}"
+
+
+def _is_failed(result: dict) -> bool:
+    return bool(result.get('error')) or is_error_response(result.get('llm_response'))
+
+
+def load_completed_indices(output_dir: Path, prefix: str, problem_files: list, journal: ResultJournal) -> set:
+    """
+    Find the problems an earlier run in `output_dir` already answered successfully.
+
+    Results that recorded an error (or, in older runs, an error string), or whose problem file no longer
+    matches the problem at that index, are left out so they get re-queued.
+    Runs written before the journal existed are imported from their
+    `_{i}_result.yaml` files into `journal`.
+
+    Returns:
+        set: problem indexes (1-based) that don't need to run again
+    """
+    # Only the last record per index counts; a re-run appends a newer one
+    latest = {}
+    for index, result in iter_journal(journal.path):
+        latest[index] = (result.get('problem_file'), _is_failed(result))
+
+    if not latest:
+        for i in range(1, len(problem_files) + 1):
+            result_file = output_dir / f"{prefix}_{i}_result.yaml"
+            if not result_file.exists():
+                continue
+            try:
+                with open(result_file, 'r') as f:
+                    stored = yaml.safe_load(f)
+            except yaml.YAMLError:
+                # Truncated by a killed process
+                continue
+            if stored:
+                journal.append(i, stored[0])
+                latest[i] = (stored[0].get('problem_file'), _is_failed(stored[0]))
+
+    return {
+        i for i, problem_file in enumerate(problem_files, 1)
+        if i in latest and latest[i] == (problem_file['filename'], False)
+    }
+
+
+def build_result_record(problem_file: dict, experiment: str, llm_name: str, call: CallResult,
+                        introduction_ref: dict, system_prompt_ref: dict, blob_store: BlobStore) -> dict:
+    """Journal record of one problem: references to the shared texts, the response and its telemetry."""
+    result = {
+        'problem_file': problem_file['filename'],
+        'experiment_type': experiment,
+        'introduction': introduction_ref,
+        'system_prompt': system_prompt_ref,
+        'file_content': blob_store.put(problem_file['content']),
+        'llm_response': call.text,
+        'llm_name': llm_name,
+        'usage': call.usage,
+        'telemetry': call.telemetry(),
+    }
+    if call.timing:
+        result['timing'] = call.timing
+    if call.error:
+        result['error'] = call.error
+    return result
+
+
+async def run_problems(llm_tester: LLMTester, problem_files: list, introduction: str, experiment: str, llm_name: str,
+                       journal: ResultJournal, blob_store: BlobStore, concurrency: int = 1, completed: set = None,
+                       monitor: AccuracyMonitor = None, log=print) -> tuple:
+    """
+    Test problem files with at most `concurrency` requests in flight.
+
+    Each result is appended to `journal` as soon as it completes; nothing is kept in memory.
+    The introduction, system prompt and problem content go to `blob_store` once and
+    records only reference them. Problems whose index is in `completed` are not sent again.
+    With a `monitor`, each response is scored as it arrives and problems still waiting
+    for a slot are skipped once it has stopped the run.
+
+    Returns:
+        tuple: (number of problems run, number of failed requests, summed request time in seconds)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    request_times = [0.0] * len(problem_files)
+    failed, skipped = [], []
+    completed = completed or set()
+    prompt_prefix = build_prompt_prefix(introduction)
+    introduction_ref = blob_store.put(introduction)
+    system_prompt_ref = blob_store.put(llm_tester.system_prompt)
+
+    async def run_one(i: int, problem_file: dict):
+        async with semaphore:
+            if monitor is not None and monitor.stopped:
+                skipped.append(i)
+                return
+            log(f"Testing problem file {i}/{len(problem_files)}: {problem_file['filename']}")
+            prompt = build_problem_prompt(problem_file['content'])
+
+            # Generate response
+            start = time.perf_counter()
+            call = await llm_tester.agenerate_result(prompt, prompt_prefix)
+            request_times[i - 1] = time.perf_counter() - start
+
+        # Store result
+        journal.append(i, build_result_record(problem_file, experiment, llm_name, call,
+                                              introduction_ref, system_prompt_ref, blob_store))
+
+        usage, timing, error = call.usage, call.timing, call.error
+        if error:
+            failed.append(i)
+            log(f"✗ Failed problem file {i} after {error['attempts']} attempts ({error['category']}): {error['message']}")
+            return
+        if monitor is not None:
+            monitor.record(problem_file['filename'], call.text)
+        cached_note = f", {usage['cached_input_tokens']}/{usage['input_tokens']} input tokens cached" if usage else ""
+        if timing.get('ttft') is not None:
+            cached_note += f", TTFT {timing['ttft']:.2f}s"
+        if timing.get('output_tokens_per_sec'):
+            cached_note += f", {timing['output_tokens_per_sec']:.0f} tok/s"
+        if call.cost:
+            cached_note += f", ${call.cost:.4f}"
+        log(f"✓ Completed problem file {i} ({request_times[i - 1]:.1f}s{cached_note})")
+
+    pending = [(i, problem_file) for i, problem_file in enumerate(problem_files, 1) if i not in completed]
+    await asyncio.gather(*(run_one(i, problem_file) for i, problem_file in pending))
+    if skipped:
+        log(f"Skipped {len(skipped)} problem files after the early stop")
+    return len(pending) - len(skipped), len(failed), sum(request_times)
+
+
+async def run_problems_batch(llm_tester: LLMTester, problem_files: list, introduction: str, experiment: str,
+                             llm_name: str, journal: ResultJournal, blob_store: BlobStore, completed: set = None,
+                             poll_interval: float = 30.0, log=print) -> tuple:
+    """
+    Test problem files through the provider's batch API instead of one request per problem.
+
+    Results are journaled exactly like run_problems() once the batch has finished.
+
+    Returns:
+        tuple: (number of problems run, number of failed requests, time spent waiting on the batch in seconds)
+    """
+    completed = completed or set()
+    pending = {i: problem_file for i, problem_file in enumerate(problem_files, 1) if i not in completed}
+    if not pending:
+        return 0, 0, 0.0
+
+    prompt_prefix = build_prompt_prefix(introduction)
+    introduction_ref = blob_store.put(introduction)
+    system_prompt_ref = blob_store.put(llm_tester.system_prompt)
+    prompts = {f"problem-{i}": build_problem_prompt(problem_file['content']) for i, problem_file in pending.items()}
+
+    start = time.perf_counter()
+    outputs = await llm_tester.arun_batch(prompts, prompt_prefix, poll_interval, log)
+    batch_time = time.perf_counter() - start
+
+    failed = 0
+    for i, problem_file in pending.items():
+        call = outputs[f"problem-{i}"]
+        if call.error:
+            failed += 1
+        journal.append(i, build_result_record(problem_file, experiment, llm_name, call,
+                                              introduction_ref, system_prompt_ref, blob_store))
+    log(f"✓ Completed {len(pending)} problem files in batch mode ({failed} failed)")
+    return len(pending), failed, batch_time
+
+
+async def run_experiment(llm_name: str, llm_config: dict, experiment: str, problems_dir: str,
+                         output_root: str = 'results/', max_files: int = None, concurrency: int = 1,
+                         resume_dir: str = None, response_cache: ResponseCache = None,
+                         timestamp: str = None, batch: bool = False, batch_poll_interval: float = 30.0,
+                         deadline: float = None, stream: bool = False, early_stop: AccuracyMonitor = None,
+                         filters: dict = None, check_stale: bool = False, log=print) -> dict:
+    """
+    Run one LLM on one problem set and export its YAML results.
+
+    Args:
+        llm_name: LLM_MAPPING key, used in result file names
+        llm_config: Config of the LLM to test
+        experiment: Experiment type ("100", "24", ...)
+        problems_dir: Path to the problem set directory
+        output_root: Directory in which the run directory is created
+        max_files: Maximum number of problem files to test
+        concurrency: Number of problems kept in flight at once
+        resume_dir: Earlier run directory to continue instead of starting a new one
+        response_cache: Optional shared response cache
+        timestamp: Run directory name (defaults to the current time)
+        batch: Submit all problems through the provider's batch API
+        batch_poll_interval: Seconds between batch status checks
+        deadline: time.monotonic() value after which no new request attempt is started;
+            problems left unanswered are recorded as errors and re-run by a resume
+        stream: Stream responses and record time-to-first-token and tokens/sec per problem
+        early_stop: Score responses as they arrive and stop issuing problems once accuracy is decisively
+            above or below its threshold (see early_stop.py); not supported with `batch`
+        filters: Problem filters of ProblemSetLoader.iter_problems (ids, pattern, surrogate, sample, seed);
+            a resumed run needs the same filters to find its problems at the same indexes
+        check_stale: Check every problem file for in-place edits before using a compiled corpus (see corpus.is_stale)
+        log: Function used for progress messages
+
+    Returns:
+        dict: output_file, summary_file, run_summary (see telemetry.summarize_results), journal,
+            tested, failed, wall_time and request_time of the run, and early_stop (AccuracyMonitor.summary) if given
+    """
+    # Create output directory (or reuse the one being resumed)
+    if resume_dir:
+        output_dir = Path(resume_dir)
+        if not output_dir.is_dir():
+            raise FileNotFoundError(f"Resume directory not found: {output_dir}")
+        timestamp = output_dir.name
+    else:
+        timestamp = timestamp or datetime.datetime.now().strftime("%m%d%H%M%S")
+        output_dir = Path(output_root) / timestamp
+        output_dir.mkdir(parents=True, exist_ok=True)
+
     # Initialize LLM tester and problem loader
-    llm_config_using = LLM_MAPPING[args.llm]
-    llm_tester = LLMTester(llm_config_using, bo_calculation_system_prompt)
-    problem_loader = ProblemSetLoader(args.problems)
-    
+    llm_tester = LLMTester(llm_config, bo_calculation_system_prompt, response_cache,
+                           RetryPolicy.from_config(llm_config, run_deadline=deadline), stream=stream, log=log)
+    problem_loader = ProblemSetLoader(problems_dir, check_stale=check_stale)
+
     # Setup LLM
-    print(f"Setting up LLM: {args.llm}")
-    
+    log(f"Setting up LLM: {llm_name}")
+
     # Load introduction
-    print("Loading introduction...")
+    log("Loading introduction...")
     introduction = problem_loader.load_introduction()
-    
+
     # Load problem files
-    print(f"Loading {args.experiment}-problem experiment files...")
-    problem_files = problem_loader.load_problem_files(args.experiment)
-    
-    if args.max_files:
-        problem_files = problem_files[:args.max_files]
-    
-    print(f"Found {len(problem_files)} problem files to test")
-    
+    log(f"Loading {experiment}-problem experiment files...")
+    problem_files = problem_loader.load_problem_files(experiment, max_files, **(filters or {}))
+
+    log(f"Found {len(problem_files)} problem files to test (concurrency: {concurrency})")
+
+    prefix = result_file_prefix(experiment, llm_name, timestamp)
+    journal = ResultJournal(output_dir / f"{prefix}{JOURNAL_SUFFIX}")
+
+    completed = set()
+    if resume_dir:
+        completed = load_completed_indices(output_dir, prefix, problem_files, journal)
+        log(f"Resuming {output_dir}: {len(completed)} problems already done, {len(problem_files) - len(completed)} to run")
+
+    if early_stop is not None:
+        if batch:
+            raise ValueError("Early stopping is not supported in batch mode")
+        early_stop.prepare(problem_files, introduction, problems_dir, log)
+        # Responses of a resumed run count towards the decision
+        for index, result in iter_latest_results(journal.path) if completed else ():
+            if index in completed:
+                early_stop.record(problem_files[index - 1]['filename'], result.get('llm_response'), decide=False)
+        early_stop.check()
+
     # Test each problem file
-    results = []
-    for i, problem_file in enumerate(problem_files, 1):
-        print(f"Testing problem file {i}/{len(problem_files)}: {problem_file['filename']}")
-        
-        # Create prompt with introduction followed by the problem content
-        prompt = f"""Please solve the Bayesian Optimization problems step by step:
+    wall_start = time.perf_counter()
+    with journal:
+        if batch:
+            tested, failed, request_time = await run_problems_batch(llm_tester, problem_files, introduction, experiment,
+                                                            llm_name, journal, BlobStore(output_dir), completed,
+                                                            batch_poll_interval, log)
+        else:
+            tested, failed, request_time = await run_problems(llm_tester, problem_files, introduction, experiment, llm_name,
+                                                      journal, BlobStore(output_dir), concurrency, completed,
+                                                      early_stop, log)
+    wall_time = time.perf_counter() - wall_start
 
-{introduction}
+    # Save results (YAML is derived from the journal once the requests are done)
+    output_file = export_yaml(journal.path, output_dir, prefix)
+    extra = {
+        'llm_name': llm_name,
+        'model': llm_config['model'],
+        'mode': 'batch' if batch else ('stream' if stream else 'request'),
+        'concurrency': concurrency,
+        'wall_time': round(wall_time, 3),
+    }
+    if early_stop is not None:
+        extra['early_stop'] = early_stop.summary()
+    summary_file, run_summary = write_run_summary(journal.path, output_dir, prefix, extra=extra)
 
----
+    return {
+        'output_file': output_file,
+        'summary_file': summary_file,
+        'run_summary': run_summary,
+        'journal': journal.path,
+        'tested': tested,
+        'failed': failed,
+        'wall_time': wall_time,
+        'request_time': request_time,
+        'early_stop': extra.get('early_stop'),
+    }
 
-{problem_file['content']}
 
-Please solve this Bayesian Optimization problem step by step following the same format as shown in the examples above.
-"""
-        
-        # Generate response
-        response = llm_tester.generate_response(prompt)
-        
-        # Store result
-        result = {
-            'problem_file': problem_file['filename'],
-            'experiment_type': args.experiment,
-            'introduction': introduction,
-            'file_content': problem_file['content'],
-            'llm_response': response,
-            'llm_name': args.llm
-        }
-        results.append(result)
-        
-        print(f"✓ Completed problem file {i}")
-
-        # Save single result
-        output_file = output_dir / f"{args.experiment}problems_{timestamp}_{args.llm.replace(':', '_')}_{i}_result.yaml"
-        with open(output_file, 'w') as f:
-            yaml.dump([result], f, default_flow_style=False, indent=2)
-
-    # Save results
-    output_file = output_dir / f"{args.experiment}problems_{timestamp}_{args.llm.replace(':', '_')}_all_results.yaml"
-    with open(output_file, 'w') as f:
-        yaml.dump(results, f, default_flow_style=False, indent=2)
-    
-    print(f"\nTesting completed! Results saved to: {output_file}")
-    print(f"Total problem files tested: {len(results)}")
+def main():
+    parser = argparse.ArgumentParser(description='Test LLMs on Bayesian Optimization problem set')
+    parser.add_argument('-l', '--llm', type=str, choices=sorted(LLM_MAPPING), default="qwen", help="LLM name to test.")
+    parser.add_argument('-e', '--experiment', default='24', choices=['100', '24'], help='Experiment type: 100-problem, 24-problem, or 5-problem')
+    parser.add_argument('-p', '--problems', default='problem_set/24problems', help='Path to problem set directory (or compiled corpus file, see corpus.py)')
+    parser.add_argument('-o', '--output', default='results/', help='Output directory for results')
+    parser.add_argument('-m', '--max-files', type=int, help='Maximum number of files to test (for debugging)')
+    parser.add_argument('--check-stale', action='store_true', help='Stat every problem file for in-place edits before using a compiled corpus (see corpus.py)')
+    parser.add_argument('--ids', type=parse_id_range, metavar='FIRST-LAST', help='Only test problems whose number (## QN.) is in this inclusive range, e.g. 50-100')
+    parser.add_argument('--match', metavar='REGEX', help='Only test problem files whose filename matches this regular expression')
+    parser.add_argument('--surrogate', choices=['GP', 'TPE'], help='Only test problems of this surrogate type')
+    parser.add_argument('--sample', type=int, metavar='N', help='Test a random sample of N of the selected problems')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of --sample (default: 0)')
+    parser.add_argument('-r', '--resume', metavar='OUTPUT_DIR', help='Continue an earlier run in OUTPUT_DIR, re-running only missing or failed problems')
+    parser.add_argument('--key-file', help='File with "llm:api_key" lines; overrides OPENAI_API_KEY for the tested LLM')
+    parser.add_argument('--cache', action='store_true', help='Reuse cached responses for identical requests (see --cache-dir)')
+    parser.add_argument('--cache-dir', default='.llm_cache', help='Directory of the shared response cache (default: .llm_cache)')
+    parser.add_argument('-c', '--concurrency', type=int, default=1, help='Number of problems kept in flight at once (default: 1, sequential)')
+    parser.add_argument('--batch', action='store_true', help='Submit all problems through the OpenAI/Anthropic batch API')
+    parser.add_argument('--batch-poll-interval', type=float, default=30.0, help='Seconds between batch status checks (default: 30)')
+    parser.add_argument('--stream', action='store_true', help='Stream responses and record time-to-first-token and tokens/sec per problem')
+    parser.add_argument('--early-stop', type=float, metavar='ACCURACY', help='Score responses as they arrive and stop issuing problems once accuracy per GP/TPE is decisively below (or, for both, above) this cutoff, e.g. 0.6')
+    parser.add_argument('--early-stop-confidence', type=float, default=DEFAULT_CONFIDENCE, help=f'Posterior probability that makes the early-stop decision (default: {DEFAULT_CONFIDENCE})')
+    parser.add_argument('--early-stop-min', type=int, default=DEFAULT_MIN_SCORED, help=f'Scored responses per surrogate type before it can stop the run (default: {DEFAULT_MIN_SCORED})')
+    parser.add_argument('--deadline', type=float, metavar='SECONDS', help='Stop sending requests after this many seconds; unanswered problems are recorded as errors for --resume')
+
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.resume and not Path(args.resume).is_dir():
+        parser.error(f"--resume directory not found: {args.resume}")
+    if args.sample is not None and args.sample < 1:
+        parser.error("--sample must be at least 1")
+    if args.match is not None:
+        try:
+            re.compile(args.match)
+        except re.error as e:
+            parser.error(f"--match is not a valid regular expression: {e}")
+    if args.early_stop is not None and args.batch:
+        parser.error("--early-stop cannot be combined with --batch")
+    try:
+        early_stop = AccuracyMonitor(args.early_stop, args.early_stop_confidence, args.early_stop_min) \
+            if args.early_stop is not None else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    llm_config = dict(LLM_MAPPING[args.llm])
+    if args.key_file:
+        api_keys = load_api_keys(args.key_file)
+        if args.llm in api_keys:
+            llm_config['api_key'] = api_keys[args.llm]
+    response_cache = ResponseCache(args.cache_dir) if args.cache else None
+    deadline = time.monotonic() + args.deadline if args.deadline else None
+    summary = asyncio.run(run_experiment(
+        args.llm, llm_config, args.experiment, args.problems, args.output,
+        args.max_files, args.concurrency, args.resume, response_cache,
+        batch=args.batch, batch_poll_interval=args.batch_poll_interval, deadline=deadline, stream=args.stream,
+        early_stop=early_stop,
+        filters={'ids': args.ids, 'pattern': args.match, 'surrogate': args.surrogate,
+                 'sample': args.sample, 'seed': args.seed},
+        check_stale=args.check_stale
+    ))
+
+    print(f"\nTesting completed! Results saved to: {summary['output_file']}")
+    print(f"Total problem files tested: {summary['tested']} (journal: {summary['journal']})")
+    if summary['failed']:
+        print(f"Failed requests: {summary['failed']}; re-run them with: -r {Path(summary['journal']).parent}")
+    print(f"Wall-clock time: {summary['wall_time']:.1f}s, summed request time: {summary['request_time']:.1f}s")
+    run_summary = summary['run_summary']
+    if run_summary['latency']:
+        latency = run_summary['latency']
+        print(f"Latency p50/p95/p99: {latency['p50']:.2f}s / {latency['p95']:.2f}s / {latency['p99']:.2f}s")
+    tokens = run_summary['tokens']
+    cost_note = f", cost: ${run_summary['cost_usd']:.4f}" if run_summary['cost_usd'] is not None else ""
+    print(f"Tokens: {tokens['input_tokens']} input ({tokens['cached_input_tokens']} cached, "
+          f"{tokens['cache_write_input_tokens']} cache writes), "
+          f"{tokens['output_tokens']} output ({tokens['reasoning_tokens']} reasoning){cost_note}")
+    print(f"Run summary: {summary['summary_file']}")
+    if summary['early_stop']:
+        early = summary['early_stop']
+        status = f"accuracy {early['stopped']} {early['threshold']:.0%}" if early['stopped'] else 'not triggered'
+        print(f"Early stop: {status}")
+        for surrogate, stats in early['surrogates'].items():
+            low, high = stats['interval']
+            print(f"  {surrogate}: {stats['correct']}/{stats['scored']} correct, "
+                  f"{early['confidence']:.0%} interval [{low:.2f}, {high:.2f}], P(below) = {stats['p_below']:.3f}")
+    if response_cache is not None:
+        print(f"Response cache: {response_cache.hits} hits, {response_cache.misses} misses")
+    pool_stats = client_pool.stats()
+    print(f"Client pool: {pool_stats['hits']} hits, {pool_stats['misses']} misses")
 
 
 if __name__ == "__main__":
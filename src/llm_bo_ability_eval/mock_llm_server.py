@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the LLM provider APIs, for running the harness without network access.
+
+Speaks the OpenAI chat-completions and Anthropic messages APIs (streaming and
+non-streaming) plus the OpenAI (files + batches) and Anthropic (message batches)
+batch APIs. Point a config's `base_url` at it, e.g. `http://127.0.0.1:8000/v1` for
+OpenAI-compatible models or `http://127.0.0.1:8000` for Claude.
+
+Latency, decode speed and failures are configurable, so concurrency, retries and
+caching can be stress-tested offline:
+- `--latency`: time to first token, as a distribution (see LatencyModel)
+- `--token-rate`: output tokens per second after the first one (0: instant)
+- `--error-rate` / `--error-statuses` / `--fail-first`: inject 429 / 5xx responses
+- `--answer` / `--answers-file`: canned or templated answers, `--output-tokens` pads them
+
+Usage:
+    python mock_llm_server.py --port 8000 --answer "Candidate 2"
+    python mock_llm_server.py --latency lognormal:2,0.5 --token-rate 60 --error-rate 0.05 \
+        --answer "Request {n}: I recommend Candidate {candidate}." --output-tokens 2000
+"""
+
+import argparse
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Sequence
+
+import yaml
+
+# Filler appended to answers shorter than --output-tokens (≈1 token per word)
+FILLER_WORD = 'lorem '
+
+
+class LatencyModel:
+    def __init__(self, spec: str = '0'):
+        """
+        Random delay in seconds, parsed from a spec string:
+        `0.5` or `fixed:0.5`, `uniform:LOW,HIGH`, `normal:MEAN,STD` (clipped at 0),
+        `lognormal:MEDIAN,SIGMA` or `exp:MEAN`.
+        """
+        kind, _, params = spec.partition(':') if ':' in spec else ('fixed', '', spec)
+        self.kind = kind
+        self.params = [float(p) for p in params.split(',')] if params else []
+        expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exp': 1}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == 'fixed':
+            return p[0]
+        elif self.kind == 'uniform':
+            return rng.uniform(p[0], p[1])
+        elif self.kind == 'normal':
+            return max(0.0, rng.gauss(p[0], p[1]))
+        elif self.kind == 'lognormal':
+            return rng.lognormvariate(math.log(p[0]), p[1])
+        else:
+            return rng.expovariate(1.0 / p[0])
+
+
+class _TemplateFields(dict):
+    def __missing__(self, key):
+        return '{' + key + '}'
+
+
+class MockLLMServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, answer: str = 'Mock answer.',
+                 batch_delay: float = 0.0, latency: str = '0', token_rate: float = 0.0,
+                 error_rate: float = 0.0, error_statuses: Sequence[int] = (429, 500, 503),
+                 retry_after: float = None, fail_first: int = 0, answers: List[str] = None,
+                 output_tokens: int = None, candidates: int = 5, seed: int = None):
+        """
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free one; see `base_url`)
+            answer: Answer template returned for every completion; may use {n} (request
+                number), {model}, {prompt_tokens} and {candidate} (random 1..candidates)
+            batch_delay: Seconds a submitted batch stays in progress before it completes
+            latency: LatencyModel spec of the time to first token
+            token_rate: Output tokens per second after the first one (0 sends them at once)
+            error_rate: Probability that a completion request fails
+            error_statuses: HTTP statuses an injected failure picks from
+            retry_after: Retry-After header (seconds) sent with injected 429/503 responses
+            fail_first: Number of initial completion requests that fail with error_statuses[0]
+            answers: Answer templates picked at random instead of `answer`
+            output_tokens: Pad answers to about this many tokens
+            candidates: Range of {candidate}
+            seed: Seed for latencies, failures and templates
+        """
+        self.answer = answer
+        self.answers = answers
+        self.batch_delay = batch_delay
+        self.latency = LatencyModel(latency)
+        self.token_rate = token_rate
+        self.error_rate = error_rate
+        self.error_statuses = list(error_statuses)
+        self.retry_after = retry_after
+        self.fail_first = fail_first
+        self.output_tokens = output_tokens
+        self.candidates = candidates
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.request_count = 0
+        self.completion_count = 0
+        self.status_counts = Counter()
+        self._rng = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockLLMServer':
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def next_id(self, prefix: str) -> str:
+        with self._lock:
+            return f"{prefix}_{next(self._ids):06d}"
+
+    # Behaviour of one completion request
+
+    def plan_completion(self) -> dict:
+        """Decide a completion request's fate: an injected error status, or its time to first token."""
+        with self._lock:
+            self.completion_count += 1
+            n = self.completion_count
+            if n <= self.fail_first:
+                return {'n': n, 'error': self.error_statuses[0]}
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return {'n': n, 'error': self._rng.choice(self.error_statuses)}
+            return {'n': n, 'error': None, 'ttft': self.latency.sample(self._rng),
+                    'candidate': self._rng.randint(1, self.candidates),
+                    'template': self._rng.choice(self.answers) if self.answers else self.answer}
+
+    def make_answer(self, plan: dict, model: str, prompt_tokens: int) -> str:
+        """Fill in the answer template of a planned request and pad it to output_tokens."""
+        fields = _TemplateFields(n=plan['n'], model=model, prompt_tokens=prompt_tokens,
+                                 candidate=plan['candidate'])
+        try:
+            text = plan['template'].format_map(fields)
+        except (ValueError, IndexError):
+            # Not a format string (e.g. unbalanced braces in a canned answer)
+            text = plan['template']
+        if self.output_tokens:
+            missing = self.output_tokens - len(text) // 4
+            if missing > 0:
+                text += ' ' + FILLER_WORD * missing
+        return text
+
+    def decode_time(self, text: str) -> float:
+        """Seconds needed to emit `text` at token_rate."""
+        return len(text) / 4 / self.token_rate if self.token_rate else 0.0
+
+    def _default_plan(self) -> dict:
+        """Plan for requests served without latency or failures (batches)."""
+        with self._lock:
+            return {'n': self.completion_count, 'error': None, 'ttft': 0.0,
+                    'candidate': self._rng.randint(1, self.candidates),
+                    'template': self._rng.choice(self.answers) if self.answers else self.answer}
+
+    # Response bodies
+
+    def chat_completion(self, body: dict, text: str = None) -> dict:
+        prompt_chars = sum(len(str(m.get('content', ''))) for m in body.get('messages', []))
+        if text is None:
+            text = self.make_answer(self._default_plan(), body.get('model', 'mock'), prompt_chars // 4)
+        return {
+            'id': self.next_id('chatcmpl'),
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': text},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_chars // 4,
+                'completion_tokens': len(text) // 4,
+                'total_tokens': prompt_chars // 4 + len(text) // 4,
+            },
+        }
+
+    def chat_completion_chunks(self, body: dict, text: str) -> Iterator[dict]:
+        """chat.completion.chunk events of a streamed answer (one per token-sized piece)."""
+        completion = self.chat_completion(body, text)
+        base = {k: completion[k] for k in ('id', 'created', 'model')}
+        base['object'] = 'chat.completion.chunk'
+        yield dict(base, choices=[{'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None}])
+        for piece in _pieces(text):
+            yield dict(base, choices=[{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}])
+        yield dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+        if (body.get('stream_options') or {}).get('include_usage'):
+            yield dict(base, choices=[], usage=completion['usage'])
+
+    def anthropic_message(self, params: dict, text: str = None) -> dict:
+        prompt_chars = len(json.dumps(params.get('messages', []))) + len(str(params.get('system', '')))
+        if text is None:
+            text = self.make_answer(self._default_plan(), params.get('model', 'mock'), prompt_chars // 4)
+        return {
+            'id': self.next_id('msg'),
+            'type': 'message',
+            'role': 'assistant',
+            'model': params.get('model', 'mock'),
+            'content': [{'type': 'text', 'text': text}],
+            'stop_reason': 'end_turn',
+            'stop_sequence': None,
+            'usage': {'input_tokens': prompt_chars // 4, 'output_tokens': len(text) // 4},
+        }
+
+    def anthropic_message_events(self, params: dict, text: str) -> Iterator[dict]:
+        """Server-sent events of a streamed Anthropic message."""
+        message = self.anthropic_message(params, text)
+        start = dict(message, content=[], stop_reason=None,
+                     usage={'input_tokens': message['usage']['input_tokens'], 'output_tokens': 1})
+        yield {'type': 'message_start', 'message': start}
+        yield {'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}}
+        for piece in _pieces(text):
+            yield {'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': piece}}
+        yield {'type': 'content_block_stop', 'index': 0}
+        yield {'type': 'message_delta', 'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+               'usage': {'output_tokens': message['usage']['output_tokens']}}
+        yield {'type': 'message_stop'}
+
+    # Batches
+
+    def _batch_done(self, batch: dict) -> bool:
+        return time.time() - batch['submitted'] >= self.batch_delay
+
+    def openai_batch(self, batch_id: str) -> dict:
+        batch = self.batches[batch_id]
+        if self._batch_done(batch) and batch['status'] != 'completed':
+            lines = []
+            for line in self.files[batch['input_file_id']].decode('utf-8').splitlines():
+                if line.strip():
+                    request = json.loads(line)
+                    lines.append(json.dumps({
+                        'id': self.next_id('batch_req'),
+                        'custom_id': request['custom_id'],
+                        'response': {'status_code': 200, 'body': self.chat_completion(request['body'])},
+                        'error': None,
+                    }))
+            output_file_id = self.next_id('file')
+            self.files[output_file_id] = ('\n'.join(lines) + '\n').encode('utf-8')
+            batch.update(status='completed', output_file_id=output_file_id, completed_at=int(time.time()),
+                         request_counts={'total': len(lines), 'completed': len(lines), 'failed': 0})
+        return {k: v for k, v in batch.items() if k != 'submitted'}
+
+    def anthropic_batch(self, batch_id: str) -> dict:
+        batch = self.batches[batch_id]
+        if self._batch_done(batch) and batch['processing_status'] != 'ended':
+            count = len(batch['requests'])
+            batch.update(processing_status='ended', ended_at=_iso_now(),
+                         results_url=f"{self.base_url}/v1/messages/batches/{batch_id}/results",
+                         request_counts={'processing': 0, 'succeeded': count, 'errored': 0,
+                                         'canceled': 0, 'expired': 0})
+        return {k: v for k, v in batch.items() if k not in ('submitted', 'requests')}
+
+    def anthropic_batch_results(self, batch_id: str) -> bytes:
+        lines = [
+            json.dumps({'custom_id': request['custom_id'],
+                        'result': {'type': 'succeeded', 'message': self.anthropic_message(request['params'])}})
+            for request in self.batches[batch_id]['requests']
+        ]
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _pieces(text: str, size: int = 4) -> Iterator[str]:
+    """Split text into token-sized pieces (≈4 characters) for streaming."""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def _error_body(status: int) -> dict:
+    messages = {429: 'Rate limit exceeded (injected by mock server)',
+                503: 'Service overloaded (injected by mock server)'}
+    return {'type': 'error',
+            'error': {'type': 'mock_error', 'code': status,
+                      'message': messages.get(status, f"Server error {status} (injected by mock server)")}}
+
+
+def _iso_now() -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+def _parse_multipart(content_type: str, body: bytes) -> Dict[str, bytes]:
+    """Fields of a multipart/form-data body (as sent by the OpenAI SDK for file uploads)."""
+    message = BytesParser(policy=HTTP).parsebytes(b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+    return {part.get_param('name', header='content-disposition'): part.get_payload(decode=True)
+            for part in message.iter_parts()}
+
+
+def _make_handler(server: MockLLMServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload, content_type: str = 'application/json'):
+            body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        def _send_error(self, status: int):
+            body = json.dumps(_error_body(status)).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if server.retry_after is not None and status in (429, 503):
+                self.send_header('Retry-After', str(server.retry_after))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_events(self, events: Iterator[dict], named: bool, interval: float, done_marker: bool):
+            """Stream events as server-sent events, one every `interval` seconds for the text pieces."""
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            def write(data: str):
+                chunk = data.encode('utf-8')
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+
+            first = True
+            try:
+                for event in events:
+                    carries_text = bool(event.get('delta', {}).get('text')) or any(
+                        choice.get('delta', {}).get('content') for choice in event.get('choices', []))
+                    if carries_text and not first and interval:
+                        time.sleep(interval)
+                    first = first and not carries_text
+                    prefix = f"event: {event['type']}\n" if named else ''
+                    write(f"{prefix}data: {json.dumps(event)}\n\n")
+                if done_marker:
+                    write("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading (e.g. it hit its timeout or got what it needed)
+                self.close_connection = True
+
+        def _complete(self, request: dict, anthropic: bool):
+            """Answer a chat completion / message request with the planned latency and failures."""
+            plan = server.plan_completion()
+            with server._lock:
+                server.status_counts[plan['error'] or 200] += 1
+            if plan['error']:
+                self._send_error(plan['error'])
+                return
+
+            time.sleep(plan['ttft'])
+            model = request.get('model', 'mock')
+            if anthropic:
+                prompt_chars = len(json.dumps(request.get('messages', []))) + len(str(request.get('system', '')))
+            else:
+                prompt_chars = sum(len(str(m.get('content', ''))) for m in request.get('messages', []))
+            text = server.make_answer(plan, model, prompt_chars // 4)
+
+            if request.get('stream'):
+                interval = 1.0 / server.token_rate if server.token_rate else 0.0
+                if anthropic:
+                    self._send_events(server.anthropic_message_events(request, text), True, interval, False)
+                else:
+                    self._send_events(server.chat_completion_chunks(request, text), False, interval, True)
+                return
+
+            time.sleep(server.decode_time(text))
+            if anthropic:
+                self._send(200, server.anthropic_message(request, text))
+            else:
+                self._send(200, server.chat_completion(request, text))
+
+        def do_POST(self):
+            with server._lock:
+                server.request_count += 1
+            path = self.path.split('?')[0].rstrip('/')
+            body = self._body()
+
+            if path.endswith('/chat/completions'):
+                self._complete(json.loads(body), anthropic=False)
+            elif path.endswith('/v1/messages'):
+                self._complete(json.loads(body), anthropic=True)
+            elif path.endswith('/v1/files'):
+                fields = _parse_multipart(self.headers['Content-Type'], body)
+                file_id = server.next_id('file')
+                server.files[file_id] = fields['file']
+                self._send(200, {'id': file_id, 'object': 'file', 'bytes': len(fields['file']),
+                                 'created_at': int(time.time()), 'filename': 'batch.jsonl',
+                                 'purpose': fields.get('purpose', b'batch').decode(), 'status': 'processed'})
+            elif path.endswith('/v1/messages/batches'):
+                batch_id = server.next_id('msgbatch')
+                server.batches[batch_id] = {
+                    'id': batch_id, 'type': 'message_batch', 'processing_status': 'in_progress',
+                    'request_counts': {'processing': 0, 'succeeded': 0, 'errored': 0, 'canceled': 0, 'expired': 0},
+                    'created_at': _iso_now(), 'expires_at': _iso_now(), 'ended_at': None,
+                    'archived_at': None, 'cancel_initiated_at': None, 'results_url': None,
+                    'requests': json.loads(body)['requests'], 'submitted': time.time(),
+                }
+                self._send(200, server.anthropic_batch(batch_id))
+            elif path.endswith('/v1/batches'):
+                request = json.loads(body)
+                batch_id = server.next_id('batch')
+                server.batches[batch_id] = {
+                    'id': batch_id, 'object': 'batch', 'endpoint': request['endpoint'],
+                    'input_file_id': request['input_file_id'], 'completion_window': request['completion_window'],
+                    'status': 'in_progress', 'created_at': int(time.time()), 'output_file_id': None,
+                    'error_file_id': None, 'request_counts': {'total': 0, 'completed': 0, 'failed': 0},
+                    'submitted': time.time(),
+                }
+                self._send(200, server.openai_batch(batch_id))
+            else:
+                self._send(404, {'error': {'message': f"Unknown endpoint {path}"}})
+
+        def do_GET(self):
+            path = self.path.split('?')[0].rstrip('/')
+            parts = path.split('/')
+            if '/v1/messages/batches/' in path and path.endswith('/results'):
+                self._send(200, server.anthropic_batch_results(parts[-2]), 'application/binary')
+            elif '/v1/messages/batches/' in path:
+                self._send(200, server.anthropic_batch(parts[-1]))
+            elif '/v1/batches/' in path:
+                self._send(200, server.openai_batch(parts[-1]))
+            elif '/v1/files/' in path and path.endswith('/content'):
+                self._send(200, server.files[parts[-2]], 'application/octet-stream')
+            else:
+                self._send(404, {'error': {'message': f"Unknown endpoint {path}"}})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the OpenAI / Anthropic APIs')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=8000, help='Port to bind')
+    parser.add_argument('--answer', default='Mock answer.', help='Answer template: {n}, {model}, {prompt_tokens}, {candidate}')
+    parser.add_argument('--answers-file', help='YAML list of answer templates picked at random')
+    parser.add_argument('--output-tokens', type=int, help='Pad answers to about this many tokens')
+    parser.add_argument('--candidates', type=int, default=5, help='Range of {candidate} in templates (default: 5)')
+    parser.add_argument('--batch-delay', type=float, default=0.0, help='Seconds before a submitted batch completes')
+    parser.add_argument('--latency', default='0', help='Time to first token: SECONDS, uniform:LOW,HIGH, normal:MEAN,STD, lognormal:MEDIAN,SIGMA or exp:MEAN')
+    parser.add_argument('--token-rate', type=float, default=0.0, help='Output tokens per second (default: 0, instant)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probability that a completion request fails')
+    parser.add_argument('--error-statuses', type=int, nargs='+', default=[429, 500, 503], help='Statuses of injected failures (default: 429 500 503)')
+    parser.add_argument('--retry-after', type=float, help='Retry-After seconds sent with injected 429/503 responses')
+    parser.add_argument('--fail-first', type=int, default=0, help='Fail the first N completion requests')
+    parser.add_argument('--seed', type=int, help='Random seed for latencies, failures and templates')
+    args = parser.parse_args()
+
+    answers = None
+    if args.answers_file:
+        with open(args.answers_file, 'r', encoding='utf-8') as f:
+            answers = [str(answer) for answer in yaml.safe_load(f)]
+
+    server = MockLLMServer(args.host, args.port, args.answer, args.batch_delay, args.latency, args.token_rate,
+                           args.error_rate, args.error_statuses, args.retry_after, args.fail_first, answers,
+                           args.output_tokens, args.candidates, args.seed)
+    print(f"Mock LLM server listening on {server.base_url} (OpenAI base_url: {server.base_url}/v1)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+        print(f"Served {server.request_count} requests; completion statuses: {dict(server.status_counts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+from typing import Optional
+
+# List prices in USD per million tokens: uncached input, cached input (prefix/context cache reads), output,
+# and for Anthropic cache writes. Reasoning tokens are billed as output. Check the provider pages before
+# relying on these for budgets.
+PRICES = {
+    'o4-mini': {'input': 1.10, 'cached_input': 0.275, 'output': 4.40},
+    'openai/gpt-oss-120b': {'input': 0.09, 'cached_input': 0.09, 'output': 0.45},
+    'gemini-2.5-pro': {'input': 1.25, 'cached_input': 0.31, 'output': 10.00},
+    'claude-3-5-sonnet-20241022': {'input': 3.00, 'cached_input': 0.30, 'cache_write': 3.75, 'output': 15.00},
+    # Self-hosted (Ollama) and OpenRouter ":free" models
+    'deepseek-r1:32b': {'input': 0.0, 'cached_input': 0.0, 'output': 0.0},
+    'qwen3:32b': {'input': 0.0, 'cached_input': 0.0, 'output': 0.0},
+    'qwen/qwen3-235b-a22b:free': {'input': 0.0, 'cached_input': 0.0, 'output': 0.0},
+}
+# OpenAI and Anthropic bill batch API requests at half the list price
+BATCH_DISCOUNT = 0.5
+# Anthropic bills prompt cache writes (5-minute TTL) at 1.25x the input price
+CACHE_WRITE_MULTIPLIER = 1.25
+
+
+def get_price(llm_config: dict) -> Optional[dict]:
+    """
+    Price of a config's model: its own `price` key if set, else the PRICES entry (None if unknown).
+
+    Claude prices without a `cache_write` entry get CACHE_WRITE_MULTIPLIER times their input price.
+    """
+    price = llm_config.get('price') or PRICES.get(llm_config['model'])
+    if price and 'cache_write' not in price and 'claude' in llm_config['model'].lower():
+        price = dict(price, cache_write=price['input'] * CACHE_WRITE_MULTIPLIER)
+    return price
+
+
+def compute_cost(price: Optional[dict], usage: dict, batch: bool = False) -> Optional[float]:
+    """
+    Dollar cost of one call.
+
+    Args:
+        price: Entry of PRICES (or a config's `price`)
+        usage: Usage dict from LLMTester (uncached/cached/cache-write input and output tokens)
+        batch: The call went through a batch API
+
+    Returns:
+        float: cost in USD, or None when the price or the usage is unknown
+    """
+    if price is None or not usage:
+        return None
+    cost = (usage.get('uncached_input_tokens', 0) * price['input']
+            + usage.get('cached_input_tokens', 0) * price.get('cached_input', price['input'])
+            + usage.get('cache_write_input_tokens', 0) * price.get('cache_write', price['input'])
+            + usage.get('output_tokens', 0) * price['output']) / 1_000_000
+    if batch:
+        cost *= BATCH_DISCOUNT
+    return round(cost, 8)
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Procedural generator of GP and TPE problem sets.
+
+Samples problems with a controlled number of continuous / categorical
+dimensions, observed trials and candidates, and writes them in the layout
+ProblemSetLoader reads:
+- {prefix}_introduction.md: conventions (kernel, γ, bandwidths)
+- {prefix}_problem_NNN.md: one problem per file
+- {prefix}_answers.yaml: step-by-step answers with K, α, μ, σ, z, Φ, φ, EI or P(value|good/bad), l(x), g(x), l/g
+Every problem is parsed back with reference_solver.py, so the answers are
+computed from exactly what the loader and scoring.py see, and each chunk of
+problems is solved in one vectorized batch. Chunks run over a process pool;
+problem i is drawn from its own generator seeded with (seed, i), so the output
+depends only on the seed and options, not on the number of workers. A problem
+whose best candidate does not stand out (acquisition below MIN_ACQUISITION or
+within MIN_MARGIN of the runner-up) is drawn again from the same generator.
+
+Usage:
+    python problem_generator.py -n 10000 -o problem_set/generated_10k
+    python problem_generator.py -n 500 -o problem_set/tpe_500 --gp-fraction 0 --categorical 2-4 --seed 7
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import yaml
+
+import reference_solver
+
+DEFAULT_PREFIX = 'bo_hpo_llm_generated'
+CHUNK_SIZE = 250
+KERNEL = {'lengthscale': 0.30, 'signal_var': 1.0, 'noise': 0.01}  # noise is the std σ_n, squared on K's diagonal
+GAMMA = 0.33
+ALPHA = 1.0
+NOISE = 0.02  # std of the observation noise added to the synthetic losses
+MIN_ACQUISITION = 1e-4  # smallest EI / l/g of the best candidate
+MIN_MARGIN = 0.02  # relative lead of the best candidate over the runner-up
+MAX_ATTEMPTS = 20
+
+# Continuous dimensions: range, log-uniform sampling, decimals shown (values=... for a fixed grid).
+# GP ranges span at least a few kernel lengthscales (in log10 for `lr`).
+CONTINUOUS_DIMS = {
+    'lr': {'low': 1e-4, 'high': 1e-1, 'log': True, 'decimals': 6},
+    'drop': {'low': 0.0, 'high': 0.9, 'decimals': 3},
+    'momentum': {'low': 0.0, 'high': 0.99, 'decimals': 3},
+    'subsample': {'low': 0.1, 'high': 1.0, 'decimals': 3},
+    'warmup': {'low': 0.0, 'high': 1.0, 'decimals': 3},
+    'label_smoothing': {'low': 0.0, 'high': 0.5, 'decimals': 3},
+}
+# TPE problems use their own continuous dimensions (bandwidths from reference_solver.TPE_DEFAULTS)
+TPE_CONTINUOUS_DIMS = {
+    'lr': {'low': 1e-4, 'high': 0.3, 'log': True, 'decimals': 6},
+    'batch': {'values': [16, 32, 64, 128, 256]},
+    'epochs': {'low': 1, 'high': 50, 'decimals': 0},
+    'drop': {'low': 0.0, 'high': 0.5, 'decimals': 3},
+}
+CATEGORICAL_DIMS = {
+    'optimizer': ['SGD', 'Adam', 'AdamW', 'RMSprop'],
+    'architecture': ['LeNet5', 'ResNet18', 'ResNet50', 'LSTM-2', 'BERT-base', 'GPT-like'],
+    'scheduler': ['constant', 'cosine', 'step', 'linear'],
+    'fed_agg': ['fedavg', 'fedadam', 'fedprox'],
+}
+
+
+def parse_range(text: str) -> Tuple[int, int]:
+    """`3-8` -> (3, 8), `5` -> (5, 5)."""
+    low, _, high = text.partition('-')
+    low, high = int(low), int(high or low)
+    if low < 0 or high < low:
+        raise argparse.ArgumentTypeError(f"invalid range: {text}")
+    return low, high
+
+
+def _format(value: float, spec: Dict[str, Any]) -> str:
+    return str(int(value)) if spec.get('values') or spec.get('decimals') == 0 else f"{value:.{spec['decimals']}f}"
+
+
+def _sample(rng: np.random.Generator, spec: Dict[str, Any], size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """`size` values of a dimension (rounded as shown) and their position in [0, 1] of its range."""
+    if 'values' in spec:
+        index = rng.integers(len(spec['values']), size=size)
+        return np.asarray(spec['values'], dtype=float)[index], index / max(len(spec['values']) - 1, 1)
+    unit = rng.random(size)
+    if spec.get('log'):
+        values = spec['low'] * (spec['high'] / spec['low']) ** unit
+    else:
+        values = spec['low'] + (spec['high'] - spec['low']) * unit
+    values = np.round(values, spec['decimals'])
+    if spec.get('log'):
+        values = np.maximum(values, spec['low'])
+    return values, unit
+
+
+def _dims(rng: np.random.Generator, pool: Dict[str, Any], count_range: Tuple[int, int], minimum: int = 0) -> List[str]:
+    count = min(max(int(rng.integers(count_range[0], count_range[1] + 1)), minimum), len(pool))
+    names = list(pool)
+    return [names[i] for i in sorted(rng.choice(len(names), size=count, replace=False))]
+
+
+def _loss(rng: np.random.Generator, units: np.ndarray, offset: np.ndarray = 0.0) -> np.ndarray:
+    """Noisy quadratic bowl over the unit-scaled inputs, rounded to 4 decimals."""
+    centre, weight = rng.random(units.shape[1]), rng.uniform(0.2, 1.0, units.shape[1])
+    loss = 0.4 + offset + (weight * np.square(units - centre)).sum(1) + NOISE * rng.standard_normal(len(units))
+    return np.round(loss, 4)
+
+
+def generate_gp_problem(rng: np.random.Generator, number: int, dims: Tuple[int, int], observations: Tuple[int, int],
+                        candidates: Tuple[int, int]) -> str:
+    """Markdown of a GP problem (all dimensions continuous)."""
+    names = _dims(rng, CONTINUOUS_DIMS, dims, minimum=1)
+    n_obs = int(rng.integers(observations[0], observations[1] + 1))
+    n_cand = int(rng.integers(candidates[0], candidates[1] + 1))
+    columns = [_sample(rng, CONTINUOUS_DIMS[name], n_obs + n_cand) for name in names]
+    values = np.stack([column[0] for column in columns], 1)
+    loss = _loss(rng, np.stack([column[1] for column in columns], 1)[:n_obs])
+
+    def point(row):
+        return ', '.join(f"{name}={_format(value, CONTINUOUS_DIMS[name])}" for name, value in zip(names, row))
+
+    space = ', '.join(f"{name} (log-real) ∈ [{spec['low']}, {spec['high']}]" if spec.get('log')
+                      else f"{name} ∈ [{spec['low']}, {spec['high']}]"
+                      for name, spec in ((name, CONTINUOUS_DIMS[name]) for name in names))
+    lines = [f"## Q{number}. GP (continuous) — propose next ({', '.join(names)})",
+             f"**Search space**: {space}. All dimensions continuous.",
+             "**Observed trials** (loss):"]
+    lines += [f"- {point(row)} → y={y:.4f}" for row, y in zip(values[:n_obs], loss)]
+    lines += ["**Candidates** (evaluate EI):"]
+    lines += [f"- {point(row)}" for row in values[n_obs:]]
+    lines += ["", "**Ask**: Following the BO procedure with a GP surrogate and EI acquisition (minimization), "
+                  "which candidate should be sampled next?"]
+    return '\n'.join(lines)
+
+
+def generate_tpe_problem(rng: np.random.Generator, number: int, dims: Tuple[int, int], categorical: Tuple[int, int],
+                         observations: Tuple[int, int], candidates: Tuple[int, int]) -> str:
+    """Markdown of a TPE problem (categorical and continuous dimensions)."""
+    cat_names = _dims(rng, CATEGORICAL_DIMS, categorical, minimum=1)
+    names = _dims(rng, TPE_CONTINUOUS_DIMS, dims)
+    n_obs = int(rng.integers(observations[0], observations[1] + 1))
+    n_cand = int(rng.integers(candidates[0], candidates[1] + 1))
+    total = n_obs + n_cand
+
+    choices = np.stack([rng.integers(len(CATEGORICAL_DIMS[name]), size=total) for name in cat_names], 1)
+    effects = [rng.uniform(0.0, 0.3, len(CATEGORICAL_DIMS[name])) for name in cat_names]
+    offset = sum(effect[choices[:n_obs, d]] for d, effect in enumerate(effects))
+    columns = [_sample(rng, TPE_CONTINUOUS_DIMS[name], total) for name in names]
+    values = np.stack([column[0] for column in columns], 1) if names else np.empty((total, 0))
+    units = np.stack([column[1] for column in columns], 1) if names else np.empty((total, 0))
+    loss = _loss(rng, units[:n_obs], offset)
+
+    def point(i):
+        parts = [CATEGORICAL_DIMS[name][choices[i, d]] for d, name in enumerate(cat_names)]
+        parts += [f"{name}={_format(value, TPE_CONTINUOUS_DIMS[name])}" for name, value in zip(names, values[i])]
+        return f"({', '.join(parts)})"
+
+    space = ', '.join(f"{name} ∈ {{{', '.join(CATEGORICAL_DIMS[name])}}}" for name in cat_names)
+    if names:
+        space += f", and continuous {{{', '.join(names)}}}"
+    lines = [f"## Q{number}. TPE (categorical+continuous) — propose next ({', '.join(cat_names + names)})",
+             f"**Search space**: {space}.",
+             "**Observed trials** (loss):"]
+    lines += [f"- {point(i)} → {y:.4f}" for i, y in enumerate(loss)]
+    lines += ["**Candidates**:"]
+    lines += [f"- {point(i)}" for i in range(n_obs, total)]
+    lines += ["", f"**Ask**: Using TPE with γ={GAMMA} and Gaussian KDEs + Laplace-smoothed categorical masses "
+                  f"(α={ALPHA:g}), which candidate should be sampled next?"]
+    return '\n'.join(lines)
+
+
+def _point_text(problem: Dict[str, Any], index: int, trial: bool = False) -> str:
+    if problem['surrogate'] == reference_solver.GP:
+        values = dict(zip(problem['dims'], problem['X'][index] if trial else problem['candidates'][index]))
+        return ', '.join(f"{dim}={_format(value, CONTINUOUS_DIMS[dim])}" for dim, value in values.items())
+    cat_values, values = problem['trials'][index] if trial else problem['candidates'][index]
+    parts = [f"{dim}={_format(value, TPE_CONTINUOUS_DIMS[dim])}" for dim, value in values.items()]
+    return f"({', '.join(list(cat_values) + parts)})"
+
+
+def _matrix(rows: List[List[float]]) -> str:
+    return '[' + ', '.join('[' + ', '.join(f"{value:.4f}" for value in row) + ']' for row in rows) + ']'
+
+
+def gp_answer(problem: Dict[str, Any], result: Dict[str, Any]) -> str:
+    """Step-by-step answer of a GP problem in the layout of the hand-written answer keys."""
+    kernel = problem['kernel']
+    inputs = ', '.join(f"log10({dim})" if dim in problem['log_dims'] else dim for dim in problem['dims'])
+    best = result['recommended']
+    lines = ["1) **Choose surrogate**: all hyperparameters are continuous ⇒ use **Gaussian Process**.",
+             f"2) **Fit GP** on inputs `[{inputs}]` (RBF kernel, ℓ={kernel['lengthscale']:.2f}, "
+             f"σ_f²={kernel['signal_var']:g}, σ_n={kernel['noise']:g} i.e. noise variance "
+             f"σ_n²={kernel['noise'] ** 2:g}):",
+             "   - Kernel matrix K (rounded):",
+             f"     {_matrix(result['K'])}",
+             f"   - α = K⁻¹ y = [{', '.join(f'{value:.4f}' for value in result['alpha'])}]",
+             f"   - Current best f* (min observed y): {result['f_star']:.4f}",
+             "3) **Evaluate EI** at candidates:"]
+    for i in range(len(problem['candidates'])):
+        lines.append(f"   - {_point_text(problem, i)}: μ={result['mu'][i]:.4f}, σ={result['sigma'][i]:.4f}, "
+                     f"z={result['z'][i]:.4f}, Φ(z)={result['Phi'][i]:.4f}, φ(z)={result['phi'][i]:.4f}, "
+                     f"**EI={result['EI'][i]:.6f}**")
+    lines += [f"4) **Select argmax EI** ⇒ **{_point_text(problem, best)}**.",
+              f"5) **Recommendation**: next trial `{_point_text(problem, best)}`.",
+              "", "---"]
+    return '\n'.join(lines)
+
+
+def tpe_answer(problem: Dict[str, Any], result: Dict[str, Any]) -> str:
+    """Step-by-step answer of a TPE problem in the layout of the hand-written answer keys."""
+    settings, dims = problem['settings'], list(problem['categorical'])
+    best = result['recommended']
+    n_trials = len(problem['trials'])
+    lines = ["1) **Choose surrogate**: categorical present ⇒ use **TPE**.",
+             f"2) **Split trials** by loss (lower is better) at γ-quantile (γ={settings['gamma']:g} ⇒ best "
+             f"{len(result['good'])} of {n_trials} as **good**):",
+             "   - Good set (best losses):"]
+    lines += [f"     - {_point_text(problem, i, trial=True)} → {problem['losses'][i]:.4f}" for i in result['good']]
+    lines += ["   - Bad set (remaining):"]
+    lines += [f"     - {_point_text(problem, i, trial=True)} → {problem['losses'][i]:.4f}" for i in result['bad']]
+    masses = ', '.join(f"P({choice}|{split})={result['categoricals'][f'{split}_probs'][dim][choice]:.4f}"
+                       for dim in dims for choice in problem['categorical'][dim] for split in ('good', 'bad'))
+    lines += ["3) **Fit l(x) and g(x)**:",
+              f"   - Categorical masses with Laplace smoothing (α={settings['alpha']:g}): {masses}"]
+    if problem['continuous']:
+        widths = ', '.join(f"`{dim}` bandwidth {settings['bandwidths'][dim]:g}" for dim in problem['continuous'])
+        lines.append(f"   - Gaussian KDEs ({widths}) from the **good** vs **bad** sets.")
+    lines.append("4) **Evaluate l/g** at candidates (factorized across dims):")
+    for i, candidate in enumerate(result['candidates']):
+        cat_values, values = problem['candidates'][i]
+        parts = [f"l_{dim}={candidate[f'l_{dim}']:.6g}, g_{dim}={candidate[f'g_{dim}']:.6g}" for dim in values]
+        parts += [f"P({value}|good)={candidate[f'P({dim}|good)']:.4f}, P({value}|bad)={candidate[f'P({dim}|bad)']:.4f}"
+                  for dim, value in zip(dims, cat_values)]
+        lines.append(f"   - {_point_text(problem, i)}: {', '.join(parts)} ⇒ l(x)={candidate['l_x']:.6g}, "
+                     f"g(x)={candidate['g_x']:.6g}, **l/g={candidate['ratio']:.6f}**")
+    lines += [f"5) **Select argmax l/g** ⇒ **{_point_text(problem, best)}**.",
+              f"6) **Recommendation**: next trial `{_point_text(problem, best)}`.",
+              "", "---"]
+    return '\n'.join(lines)
+
+
+def introduction(count: int, seed: int) -> str:
+    """Introduction stating the conventions that reference_solver.parse_problem reads back."""
+    bandwidths = ', '.join(f"{width:g} for {dim}" for dim, width in reference_solver.TPE_DEFAULTS['bandwidths'].items())
+    return f"""# {count} Generated BO/HPO Questions (seed {seed})
+Procedurally generated GP and TPE problems (see problem_generator.py).
+Each item asks which candidate a real Bayesian Optimization (BO) HPO engine samples next:
+- Decide **GP vs TPE** based on the presence of categorical variables.
+- For **GP**: fit a Gaussian Process on the observed trials, compute the posterior mean/variance and **Expected Improvement (EI)**; propose the **argmax EI** candidate.
+- For **TPE**: split the trials into good/bad at the quantile **γ**, fit **l(x)** and **g(x)** (Gaussian KDEs for continuous, Laplace-smoothed masses for categorical dimensions), evaluate **l/g** for the candidates; propose the **argmax l/g** candidate.
+
+**Conventions**
+- Objective: *minimize* validation loss.
+- GP kernel: RBF with ℓ={KERNEL['lengthscale']:.2f}, σ_f²={KERNEL['signal_var']:g}, σ_n={KERNEL['noise']:g} (noise standard deviation: K = k(X, X) + σ_n² I with σ_n²={KERNEL['noise'] ** 2:g}); `(log-real)` dimensions are fitted in log10.
+- EI (minimization): EI(x) = (f\\* − μ(x)) Φ(z) + σ(x) φ(z), where z=(f\\*−μ)/σ.
+- TPE: γ={GAMMA}, Laplace α={ALPHA:g}, KDE bandwidth {bandwidths}, {reference_solver.TPE_DEFAULTS['bandwidth']:g} otherwise.
+- Numbers in the answers are rounded for readability.
+"""
+
+
+def _decisive(result: Dict[str, Any]) -> bool:
+    """Whether the best candidate's EI / l/g is large enough and clearly ahead of the runner-up."""
+    values = sorted(result[reference_solver.ACQUISITION[result['surrogate']][0]], reverse=True) + [0.0]
+    return values[0] >= MIN_ACQUISITION and values[0] - values[1] >= MIN_MARGIN * values[0]
+
+
+def generate_chunk(output_dir: str, prefix: str, numbers: List[int], count: int,
+                   options: Dict[str, Any]) -> Tuple[Dict[str, str], int]:
+    """
+    Generate, solve and write problems `numbers` (runs in a worker process).
+
+    Each round solves the problems still pending in one batch; indecisive ones are
+    drawn again from their own generator, up to MAX_ATTEMPTS times.
+
+    Returns:
+        tuple: (answer key entries of the chunk, Q<number> -> answer; number of GP problems)
+    """
+    intro = introduction(count, options['seed'])
+    rngs = {number: np.random.default_rng([options['seed'], number]) for number in numbers}
+    is_gp = {number: rngs[number].random() < options['gp_fraction'] for number in numbers}
+    contents, problems, results = {}, {}, {}
+    pending = list(numbers)
+    for _ in range(MAX_ATTEMPTS):
+        for number in pending:
+            rng = rngs[number]
+            if is_gp[number]:
+                contents[number] = generate_gp_problem(rng, number, options['dims'], options['observations'],
+                                                       options['candidates'])
+            else:
+                contents[number] = generate_tpe_problem(rng, number, options['dims'], options['categorical'],
+                                                        options['observations'], options['candidates'])
+            problems[number] = reference_solver.parse_problem(contents[number], intro)
+        results.update(zip(pending, reference_solver.solve_problems([problems[number] for number in pending])))
+        pending = [number for number in pending if not _decisive(results[number])]
+        if not pending:
+            break
+
+    width = max(3, len(str(count)))
+    answers = {}
+    for number in numbers:
+        (Path(output_dir) / f"{prefix}_problem_{number:0{width}d}.md").write_text(contents[number], encoding='utf-8')
+        render = gp_answer if is_gp[number] else tpe_answer
+        answers[f"Q{number}"] = render(problems[number], results[number])
+    return answers, sum(is_gp.values())
+
+
+def generate_problem_set(output_dir: str, count: int, seed: int = 0, prefix: str = DEFAULT_PREFIX,
+                         gp_fraction: float = 0.5, dims: Tuple[int, int] = (1, 3), categorical: Tuple[int, int] = (1, 2),
+                         observations: Tuple[int, int] = (4, 10), candidates: Tuple[int, int] = (3, 6),
+                         workers: int = None, log=print) -> Dict[str, Any]:
+    """
+    Write a generated problem set to `output_dir`.
+
+    Args:
+        output_dir: Directory for the problem, introduction and answer files
+        count: Number of problems
+        seed: Seed of the whole set; problem i uses the seed sequence (seed, i)
+        prefix: File name prefix
+        gp_fraction: Probability that a problem is a GP problem (else TPE)
+        dims: Range of continuous dimensions (at least 1 for GP problems)
+        categorical: Range of categorical dimensions of TPE problems (at least 1)
+        observations: Range of observed trials
+        candidates: Range of candidates
+        workers: Worker processes (defaults to the CPU count)
+
+    Returns:
+        dict: problems, gp and tpe counts, answers_file and elapsed seconds
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    options = {'seed': seed, 'gp_fraction': gp_fraction, 'dims': dims, 'categorical': categorical,
+               'observations': observations, 'candidates': candidates}
+    start = time.time()
+    (output_dir / f"{prefix}_introduction.md").write_text(introduction(count, seed), encoding='utf-8')
+
+    numbers = list(range(1, count + 1))
+    chunks = [numbers[i:i + CHUNK_SIZE] for i in range(0, count, CHUNK_SIZE)]
+    answers, gp = {}, 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [executor.submit(generate_chunk, str(output_dir), prefix, chunk, count, options) for chunk in chunks]
+        for done, future in enumerate(futures, 1):
+            chunk_answers, chunk_gp = future.result()
+            answers.update(chunk_answers)
+            gp += chunk_gp
+            log(f"Generated {min(done * CHUNK_SIZE, count)}/{count} problems")
+
+    answers_file = output_dir / f"{prefix}_answers.yaml"
+    with open(answers_file, 'w', encoding='utf-8') as f:
+        yaml.dump(answers, f, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper), default_flow_style=False,
+                  allow_unicode=True, sort_keys=False, width=120)
+    return {'problems': count, 'gp': gp, 'tpe': count - gp, 'answers_file': answers_file,
+            'elapsed': time.time() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a GP/TPE problem set with answer key')
+    parser.add_argument('-n', '--count', type=int, required=True, help='Number of problems')
+    parser.add_argument('-o', '--output-dir', required=True, help='Output directory (e.g. problem_set/generated_10k)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--prefix', default=DEFAULT_PREFIX, help=f'File name prefix (default: {DEFAULT_PREFIX})')
+    parser.add_argument('--gp-fraction', type=float, default=0.5, help='Fraction of GP problems (default: 0.5)')
+    parser.add_argument('--dims', type=parse_range, default=(1, 3), metavar='LO-HI',
+                        help='Continuous dimensions per problem (default: 1-3)')
+    parser.add_argument('--categorical', type=parse_range, default=(1, 2), metavar='LO-HI',
+                        help='Categorical dimensions per TPE problem (default: 1-2)')
+    parser.add_argument('--observations', type=parse_range, default=(4, 10), metavar='LO-HI',
+                        help='Observed trials per problem (default: 4-10)')
+    parser.add_argument('--candidates', type=parse_range, default=(3, 6), metavar='LO-HI',
+                        help='Candidates per problem (default: 3-6)')
+    parser.add_argument('-w', '--workers', type=int, help='Worker processes (default: CPU count)')
+    args = parser.parse_args()
+    if args.count < 1:
+        parser.error("--count must be at least 1")
+    if not 0.0 <= args.gp_fraction <= 1.0:
+        parser.error("--gp-fraction must be between 0 and 1")
+    if args.observations[0] < 2 or args.candidates[0] < 1:
+        parser.error("problems need at least 2 observations and 1 candidate")
+
+    summary = generate_problem_set(args.output_dir, args.count, args.seed, args.prefix, args.gp_fraction, args.dims,
+                                   args.categorical, args.observations, args.candidates, args.workers)
+    print(f"Generated {summary['problems']} problems ({summary['gp']} GP, {summary['tpe']} TPE) "
+          f"in {summary['elapsed']:.1f}s")
+    print(f"Answer key written to: {summary['answers_file']}")
+
+
+if __name__ == "__main__":
+    main()
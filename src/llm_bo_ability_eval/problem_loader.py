@@ -1,19 +1,49 @@
 import os
+import re
 import glob
+import random
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
+
+import numpy as np
+
+from corpus import INTRODUCTION_GLOBS, PROBLEM_GLOB, open_corpus
+
+
+def _header_matches(content: str, ids: Tuple[int, int] = None, surrogate: str = None) -> bool:
+    """Whether the `## QN. <surrogate> ...` header of a problem passes the ID range and surrogate filters."""
+    import reference_solver  # imported here: reference_solver loads problem sets through this module
+
+    if ids is not None:
+        match = reference_solver.HEADER_PATTERN.search(content)
+        number = int(match.group(1)) if match else 0  # as in the corpus index
+        if not ids[0] <= number <= ids[1]:
+            return False
+    return surrogate is None or reference_solver.surrogate_type(content) == surrogate
+
 
 class ProblemSetLoader:
-    def __init__(self, problem_dir: str):
-        """Initialize problem set loader."""
+    def __init__(self, problem_dir: str, use_corpus: bool = True, check_stale: bool = False):
+        """
+        Initialize problem set loader.
+
+        `problem_dir` may also be a corpus file (see corpus.py); a directory's compiled
+        corpus is used while it is up to date unless `use_corpus` is False. `check_stale`
+        also checks every problem file for in-place edits (see corpus.is_stale).
+        """
         self.problem_dir = Path(problem_dir)
+        self.corpus = open_corpus(self.problem_dir, check_stale) if use_corpus else None
         
     def load_introduction(self) -> str:
         """Load the introduction file."""
+        if self.corpus is not None:
+            introduction = self.corpus.introduction()
+            if not introduction:
+                raise FileNotFoundError(f"No introduction in corpus: {self.corpus.path}")
+            return introduction
+
         # Look for introduction file in the problem directory and subdirectories
-        intro_patterns = ["*introduction.md", "**/bo_hpo_llm_test_5_introduction.md"]
-        
-        for pattern in intro_patterns:
+        for pattern in INTRODUCTION_GLOBS:
             intro_files = glob.glob(str(self.problem_dir / pattern), recursive=True)
             if intro_files:
                 intro_file = intro_files[0]  # Take the first match
@@ -22,32 +52,94 @@ class ProblemSetLoader:
         
         raise FileNotFoundError(f"No introduction file found in {self.problem_dir}")
         
-    def load_problem_files(self, experiment_type: str) -> List[Dict[str, Any]]:
-        """Load problem files as strings based on experiment type."""
-        if experiment_type == "100":
-            pattern = "**/*problem_*.md"
-        elif experiment_type == "24":
-            pattern = "**/*problem_*.md"
-        elif experiment_type == "5":
-            # For the 5-problem set, load individual problem files
-            pattern = "**/*problem_*.md"
-        else:
+    def load_problem_files(self, experiment_type: str, max_files: int = None, **filters) -> List[Dict[str, Any]]:
+        """
+        Load problem files as strings based on experiment type.
+
+        Args:
+            experiment_type: '100', '24' or '5'
+            max_files: Load only the first `max_files` problems that pass the filters
+            **filters: ids, pattern, surrogate, sample and seed of iter_problems
+        """
+        if experiment_type not in ("100", "24", "5"):
             raise ValueError(f"Invalid experiment type: {experiment_type}. Use '100', '24', or '5'.")
-        
-        # Find matching files
-        problem_files = sorted(glob.glob(str(self.problem_dir / pattern), recursive=True))
-        
-        if not problem_files:
-            raise FileNotFoundError(f"No problem files found matching pattern: {pattern}")
-        
-        # Load file contents as strings
+
         problem_contents = []
-        for file_path in problem_files:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                problem_contents.append({
-                    'filename': os.path.basename(file_path),
-                    'content': content
-                })
-        
+        for problem_file in self.iter_problems(**filters):
+            if max_files is not None and len(problem_contents) >= max_files:
+                break
+            problem_contents.append(problem_file)
+
+        if not problem_contents:
+            if any(value is not None for key, value in filters.items() if key != 'seed'):
+                raise FileNotFoundError(f"No problems in {self.problem_dir} match the filters: {filters}")
+            if self.corpus is not None:
+                raise FileNotFoundError(f"No problems in corpus: {self.corpus.path}")
+            raise FileNotFoundError(f"No problem files found matching pattern: {PROBLEM_GLOB}")
         return problem_contents
+
+    def iter_problems(self, ids: Tuple[int, int] = None, pattern: str = None, surrogate: str = None,
+                      sample: int = None, seed: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the problem files (filename, content) that pass all given filters, lazily and in loader order.
+
+        A corpus is filtered on its index and only the yielded problems are read. Problem
+        files are read one at a time, and only if their filename matches `pattern`.
+
+        Args:
+            ids: Inclusive (first, last) range of problem numbers (N of the `## QN.` header)
+            pattern: Regular expression searched in the filename
+            surrogate: 'GP' or 'TPE', as named in the header (e.g. `## Q10. GP (continuous)`)
+            sample: Yield a random sample of this many of the matching problems
+            seed: Seed of the sample; a directory and its corpus give the same sample
+        """
+        if self.corpus is not None:
+            count = len(self.corpus)
+            filename = self.corpus.filename
+            selected = np.zeros(count, dtype=bool)
+            selected[self.corpus.select(ids, surrogate)] = True
+
+            def load(position: int):
+                if not selected[position]:
+                    return None
+                problem = self.corpus.problem(position)
+                return {'filename': problem['filename'], 'content': problem['content']}
+        else:
+            paths = sorted(glob.glob(str(self.problem_dir / PROBLEM_GLOB), recursive=True))
+            count = len(paths)
+
+            def filename(position: int) -> str:
+                return os.path.basename(paths[position])
+
+            def load(position: int):
+                with open(paths[position], 'r', encoding='utf-8') as f:
+                    content = f.read()
+                if not _header_matches(content, ids, surrogate):
+                    return None
+                return {'filename': filename(position), 'content': content}
+
+        positions = range(count)
+        if pattern is not None:
+            regex = re.compile(pattern)
+            positions = [position for position in positions if regex.search(filename(position))]
+
+        if sample is None:
+            for position in positions:
+                problem_file = load(position)
+                if problem_file is not None:
+                    yield problem_file
+            return
+
+        # The first `sample` matches of a seeded shuffle are a uniform sample of the matching
+        # problems; loading stops as soon as enough are found
+        positions = list(positions)
+        random.Random(seed).shuffle(positions)
+        chosen = {}
+        for position in positions:
+            if len(chosen) >= sample:
+                break
+            problem_file = load(position)
+            if problem_file is not None:
+                chosen[position] = problem_file
+        for position in sorted(chosen):
+            yield chosen[position]
@@ -31,6 +31,15 @@ def add_answers_to_experiments(
     # Load the experiment results and answers
     experiments = load_yaml_file(experiment_file_path)
     answers = load_yaml_file(answer_file_path)
+
+    # Inline the shared prompt blobs so the graded file is self-contained
+    blob_dir = Path(experiment_file_path).parent / "blobs"
+    if isinstance(experiments, list) and blob_dir.is_dir():
+        # Imported only for runs with blobs, so older runs still work from problem_set/; runs with blobs
+        # need the package modules: python -m problem_set.add_answer_after_response from src/llm_bo_ability_eval
+        from result_writer import resolve_blobs
+
+        experiments = [resolve_blobs(experiment, blob_dir) for experiment in experiments]
     
     # Create a mapping of problem indexes to experiment entries
     # Assuming experiments is a list and we match by index
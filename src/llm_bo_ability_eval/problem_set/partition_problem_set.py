@@ -1,16 +1,149 @@
 #!/usr/bin/env python3
 """
-Script to partition bo_hpo_llm_test_5.md into introduction and individual problem files.
+Script to partition a problem set markdown file into introduction, individual problem files and answers.
+
+The file is read once, line by line: everything before the first "---" is the
+introduction, every "## QN." starts a problem, and the "**Answer (steps):**" or
+"**Answer (step-by-step):**" section of a problem is split off into the answers
+YAML file.
+
+Usage:
+    python partition_problem_set.py bo_hpo_llm_test_arch_v3_24.md --answer-format steps
+    python partition_problem_set.py bo_hpo_llm_test_100.md --answer-format step-by-step
 """
 
+import argparse
 import re
 import yaml
 from pathlib import Path
+from typing import Dict, List, Tuple
+
+ANSWER_FORMATS = ("steps", "step-by-step")
+PROBLEM_START = re.compile(r'## Q(\d+)\.')
+SEPARATOR = '---'
+ANSWER_MARKER_PREFIX = '**Answer ('
+
+
+def _answer_marker(answer_format: str = None) -> re.Pattern:
+    """Pattern of the answer header; any of ANSWER_FORMATS if `answer_format` is None."""
+    formats = ANSWER_FORMATS if answer_format is None else (answer_format,)
+    return re.compile(rf'\*\*Answer \(({"|".join(re.escape(name) for name in formats)})\):\*\*')
+
+
+def parse_problem_set(input_file: str, answer_format: str = None) -> Tuple[str, List[Tuple[str, str]], Dict[str, str]]:
+    """
+    Split a problem set file into introduction, problems and answers in one pass over its lines.
+
+    Args:
+        input_file: Path to the input markdown file
+        answer_format: Format of answer section - "steps" or "step-by-step" (default: either)
+
+    Returns:
+        tuple: introduction (None if the file has no "---" separator), list of (problem ID, problem text
+            without its answer), and dict of problem ID to answer text for the problems that have one
+    """
+    marker = _answer_marker(answer_format)
+    introduction_lines = []
+    problems, answers = [], {}
+    problem_id, body, answer = None, None, None  # problem being read; answer is None until its marker
+
+    def finish():
+        if problem_id is None:
+            return
+        problems.append((problem_id, ''.join(body).strip().rstrip('-').strip()))
+        if answer is not None:
+            answers[problem_id] = ''.join(answer).strip()
+
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if introduction_lines is not None:
+                if SEPARATOR not in line:
+                    introduction_lines.append(line)
+                    continue
+                split = line.index(SEPARATOR)
+                introduction_lines.append(line[:split])
+                introduction = ''.join(introduction_lines).strip()
+                introduction_lines = None
+                line = line[split + len(SEPARATOR):]
+
+            # A line may hold several events (problem starts, the answer marker); the common case has none
+            while line:
+                start = PROBLEM_START.search(line) if '## Q' in line else None
+                found = None
+                if problem_id is not None and answer is None and ANSWER_MARKER_PREFIX in line:
+                    found = marker.search(line, 0, start.start() if start else len(line))
+                if found:
+                    body.append(line[:found.start()])
+                    answer = []
+                    line = line[found.end():]
+                    continue
+                if start is None:
+                    if problem_id is not None:
+                        (body if answer is None else answer).append(line)
+                    break
+                if problem_id is not None:
+                    (body if answer is None else answer).append(line[:start.start()])
+                finish()
+                problem_id, body, answer = f"Q{start.group(1)}", [start.group(0)], None
+                line = line[start.end():]
+    finish()
+
+    if introduction_lines is not None:
+        return None, [], {}
+    return introduction, problems, answers
+
+
+def _write_introduction(input_path: Path, output_dir: Path, introduction: str):
+    intro_path = output_dir / f"{input_path.stem}_introduction.md"
+    with open(intro_path, 'w', encoding='utf-8') as f:
+        f.write(introduction)
+    print(f"Created introduction file: {intro_path}")
+
+
+def _write_problems(input_path: Path, output_dir: Path, problems: List[Tuple[str, str]]):
+    for i, (_, problem_content) in enumerate(problems, 1):
+        with open(output_dir / f"{input_path.stem}_problem_{i:03d}.md", 'w', encoding='utf-8') as f:
+            f.write(problem_content)
+    print(f"Created {len(problems)} problem files: {output_dir / input_path.stem}_problem_*.md")
+
+
+def _write_answers(output_file: Path, answers: Dict[str, str]):
+    with open(output_file, 'w', encoding='utf-8') as f:
+        yaml.dump(answers, f, default_flow_style=False, allow_unicode=True, indent=2)
+    print(f"Extracted {len(answers)} answers and saved to: {output_file}")
+
+
+def split_problem_set(input_file: str, output_dir: str = None, answers_file: str = None, answer_format: str = None):
+    """
+    Write the introduction, problem and answers files of a problem set from a single parse.
+
+    Args:
+        input_file: Path to the input markdown file
+        output_dir: Directory to save partitioned files (defaults to same directory as input)
+        answers_file: Path of the answers YAML file (defaults to `{stem}_answers.yaml` in `output_dir`)
+        answer_format: Format of answer section - "steps" or "step-by-step" (default: either)
+
+    Returns:
+        dict: problem ID to answer text
+    """
+    input_path = Path(input_file)
+    output_dir = Path(output_dir) if output_dir is not None else input_path.parent
+    output_dir.mkdir(exist_ok=True)
+
+    introduction, problems, answers = parse_problem_set(input_path, answer_format)
+    if introduction is None:
+        print("Warning: No '---' separator found. Nothing to partition.")
+        return {}
+    _write_introduction(input_path, output_dir, introduction)
+    _write_problems(input_path, output_dir, problems)
+    _write_answers(Path(answers_file) if answers_file else output_dir / f"{input_path.stem}_answers.yaml", answers)
+    return answers
+
 
 def partition_problem_set(input_file: str, output_dir: str = None, answer_format: str = "steps"):
     """
     Partition the problem set file into introduction and individual problem files.
-    
+
     Args:
         input_file: Path to the input markdown file
         output_dir: Directory to save partitioned files (defaults to same directory as input)
@@ -21,56 +154,19 @@ def partition_problem_set(input_file: str, output_dir: str = None, answer_format
         output_dir = input_path.parent
     else:
         output_dir = Path(output_dir)
-    
+
     # Create output directory if it doesn't exist
     output_dir.mkdir(exist_ok=True)
-    
-    # Read the input file
-    with open(input_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Split content at the first "---" separator
-    parts = content.split('---', 1)
-    if len(parts) < 2:
+
+    introduction, problems, _ = parse_problem_set(input_path, answer_format)
+    if introduction is None:
         print("Warning: No '---' separator found. Using entire content as introduction.")
-        introduction = content
-        problem_section = ""
-    else:
-        introduction = parts[0].strip()
-        problem_section = parts[1].strip()
-    
-    # Save introduction file
-    intro_filename = f"{input_path.stem}_introduction.md"
-    intro_path = output_dir / intro_filename
-    with open(intro_path, 'w', encoding='utf-8') as f:
-        f.write(introduction)
-    print(f"Created introduction file: {intro_path}")
-    
-    # Split problem section by "## Q" pattern
-    if problem_section:
-        # Find all problem sections
-        problem_pattern = r'(## Q\d+\..*?)(?=## Q\d+\.|$)'
-        problems = re.findall(problem_pattern, problem_section, re.DOTALL)
-        
-        # Save each problem to a separate file
-        for i, problem in enumerate(problems, 1):
-            problem_filename = f"{input_path.stem}_problem_{i:03d}.md"
-            problem_path = output_dir / problem_filename
-            
-            # Clean up the problem content (remove extra whitespace)
-            problem_content = problem.strip()
-            
-            # Remove the answer section (everything from "**Answer (...)**" onwards)
-            answer_pattern = rf'\*\*Answer \({re.escape(answer_format)}\):\*\*.*'
-            problem_content = re.sub(answer_pattern, '', problem_content, flags=re.DOTALL)
-            
-            # Clean up any trailing whitespace and separators
-            problem_content = problem_content.rstrip().rstrip('-').strip()
-            
-            with open(problem_path, 'w', encoding='utf-8') as f:
-                f.write(problem_content)
-            print(f"Created problem file {i}: {problem_path}")
-        
+        with open(input_path, 'r', encoding='utf-8') as f:
+            introduction = f.read()
+    _write_introduction(input_path, output_dir, introduction)
+
+    if problems:
+        _write_problems(input_path, output_dir, problems)
         print(f"\nPartitioning complete!")
         print(f"Created 1 introduction file and {len(problems)} problem files.")
     else:
@@ -79,7 +175,7 @@ def partition_problem_set(input_file: str, output_dir: str = None, answer_format
 def extract_answers(input_file: str, output_file: str = None, answer_format: str = "steps"):
     """
     Extract answers from the problem set file and save them to a YAML file.
-    
+
     Args:
         input_file: Path to the input markdown file
         output_file: Path to save the YAML file with answers (defaults to same name with .yaml extension)
@@ -90,43 +186,22 @@ def extract_answers(input_file: str, output_file: str = None, answer_format: str
         output_file = input_path.parent / f"{input_path.stem}_answers.yaml"
     else:
         output_file = Path(output_file)
-    
-    # Read the input file
-    with open(input_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Split content at the first "---" separator to get problem section
-    parts = content.split('---', 1)
-    if len(parts) < 2:
+
+    introduction, _, answers = parse_problem_set(input_path, answer_format)
+    if introduction is None:
         print("Warning: No '---' separator found. No problems to extract answers from.")
         return
-    
-    problem_section = parts[1].strip()
-    
-    # Find all problem sections with their answers
-    problem_pattern = rf'## (Q\d+)\..*?\*\*Answer \({re.escape(answer_format)}\):\*\*(.*?)(?=## Q\d+\.|$)'
-    matches = re.findall(problem_pattern, problem_section, re.DOTALL)
-    
-    answers = {}
-    for problem_id, answer_content in matches:
-        # Clean up the answer content
-        answer_text = answer_content.strip()
-        answers[problem_id] = answer_text
-    
-    # Save answers to YAML file
-    with open(output_file, 'w', encoding='utf-8') as f:
-        yaml.dump(answers, f, default_flow_style=False, allow_unicode=True, indent=2)
-    
-    print(f"Extracted {len(answers)} answers and saved to: {output_file}")
+
+    _write_answers(output_file, answers)
     return answers
 
 if __name__ == "__main__":
-    # Example usage for bo_hpo_llm_test_arch_v3_24.md (uses "steps")
-    input_file = "bo_hpo_llm_test_arch_v3_24.md"
-    partition_problem_set(input_file, answer_format="steps")
-    extract_answers(input_file, answer_format="steps")
-    
-    # Example usage for bo_hpo_llm_test_100.md (uses "step-by-step")
-    # input_file = "bo_hpo_llm_test_100.md"
-    # partition_problem_set(input_file, answer_format="step-by-step")
-    # extract_answers(input_file, answer_format="step-by-step")
+    parser = argparse.ArgumentParser(description='Partition a problem set into introduction, problem and answers files')
+    parser.add_argument('input_file', nargs='?', default='bo_hpo_llm_test_arch_v3_24.md',
+                        help='Problem set markdown file (default: bo_hpo_llm_test_arch_v3_24.md)')
+    parser.add_argument('-o', '--output-dir', help='Directory of the partitioned files (default: beside the input)')
+    parser.add_argument('--answers-file', help='Answers YAML file (default: <output-dir>/<stem>_answers.yaml)')
+    parser.add_argument('--answer-format', choices=ANSWER_FORMATS,
+                        help='Answer section format: steps (24-problem set) or step-by-step (100-problem set); default: either')
+    args = parser.parse_args()
+    split_problem_set(args.input_file, args.output_dir, args.answers_file, args.answer_format)
@@ -0,0 +1,156 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """Return True for provider errors that mean "slow down" (HTTP 429 / 503)."""
+    # openai/anthropic errors carry status_code, google.api_core errors carry code
+    for attr in ('status_code', 'code'):
+        status = getattr(error, attr, None)
+        if isinstance(status, int) and status in (429, 503):
+            return True
+    return False
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        """Token bucket refilled continuously at `per_minute` tokens per minute."""
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, amount: float) -> float:
+        """Take `amount` tokens if available; otherwise return the seconds to wait."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+    def acquire(self, amount: float = 1.0):
+        """Block until `amount` tokens have been taken."""
+        while True:
+            wait = self._reserve(amount)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, amount: float = 1.0):
+        """Wait without blocking the event loop until `amount` tokens have been taken."""
+        while True:
+            wait = self._reserve(amount)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+class RateLimiter:
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, max_concurrency: int = 64,
+                 initial_concurrency: int = 4, decrease_factor: float = 0.5, cooldown: float = 5.0):
+        """
+        Requests/min and tokens/min limits plus AIMD concurrency for one endpoint.
+
+        The concurrency limit grows by about one slot per round of successful calls
+        and is multiplied by `decrease_factor` on a throttle (at most once per `cooldown` seconds,
+        so a burst of 429s from calls already in flight counts as one signal).
+
+        Args:
+            rpm: Requests per minute (None for unlimited)
+            tpm: Tokens per minute, prompt plus max output (None for unlimited)
+            max_concurrency: Upper bound on concurrent requests
+            initial_concurrency: Starting concurrency limit
+            decrease_factor: Multiplier applied to the limit on a throttle
+            cooldown: Minimum seconds between two multiplicative decreases
+        """
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(initial_concurrency, max_concurrency))
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.throttle_count = 0
+        self._last_decrease = float('-inf')
+        self._lock = threading.Lock()
+
+    def _try_enter(self) -> bool:
+        with self._lock:
+            if self.in_flight < max(1, int(self.limit)):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self, tokens: float = 0):
+        """
+        Block until a concurrency slot and the rpm/tpm budget are available.
+
+        Every successful acquire must be paired with exactly one release(), also when the call is cancelled.
+        """
+        while not self._try_enter():
+            time.sleep(self.POLL_INTERVAL)
+        try:
+            if self.request_bucket:
+                self.request_bucket.acquire(1)
+            if self.token_bucket and tokens:
+                self.token_bucket.acquire(tokens)
+        except BaseException:
+            self.release(success=False)
+            raise
+
+    async def aacquire(self, tokens: float = 0):
+        """Async variant of acquire()."""
+        while not self._try_enter():
+            await asyncio.sleep(self.POLL_INTERVAL)
+        try:
+            if self.request_bucket:
+                await self.request_bucket.aacquire(1)
+            if self.token_bucket and tokens:
+                await self.token_bucket.aacquire(tokens)
+        except BaseException:
+            # Cancelled (or interrupted) while waiting for the buckets: give the slot back
+            self.release(success=False)
+            raise
+
+    def release(self, success: bool = True, throttled: bool = False):
+        """Free the slot and adapt the concurrency limit to the outcome of the call."""
+        with self._lock:
+            self.in_flight -= 1
+            if throttled:
+                self.throttle_count += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(1.0, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            elif success:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+
+
+_rate_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(llm_config: dict) -> RateLimiter:
+    """
+    Return the process-wide rate limiter for a config's base_url + model.
+
+    Limits are read from the optional `rpm`, `tpm` and `max_concurrency` config keys.
+    """
+    key = (llm_config.get('base_url') or '', llm_config['model'])
+    with _rate_limiters_lock:
+        if key not in _rate_limiters:
+            _rate_limiters[key] = RateLimiter(
+                rpm=llm_config.get('rpm'),
+                tpm=llm_config.get('tpm'),
+                max_concurrency=llm_config.get('max_concurrency', 64),
+            )
+        return _rate_limiters[key]
@@ -0,0 +1,701 @@
+#!/usr/bin/env python3
+"""
+Reference solver for the BO problem sets.
+
+Parses the observed trials and candidates of each problem file and recomputes
+the answer key with NumPy, batched across problems and candidates, so ground
+truth can be checked or regenerated for thousands of problems at once.
+
+GP problems follow the conventions of the answer keys: zero-mean GP with an RBF
+kernel k(a, b) = σ_f² exp(-|a - b|² / 2ℓ²) on the inputs (log10 for `log-real`
+dimensions such as `lr`), K = k(X, X) + σ_n⁴ I (the keys use the stated σ_n² as
+the noise standard deviation; generated sets state that standard deviation as
+σ_n), α = K⁻¹y via Cholesky, μ = k*ᵀα,
+σ² = σ_f² - k*ᵀK⁻¹k* + σ_n⁴ and EI for minimization against f* = min y.
+
+TPE problems: the best ceil(γn) trials are "good", the rest "bad"; l(x) and g(x)
+multiply Laplace-smoothed categorical masses and Gaussian KDEs (fixed bandwidth
+per continuous dimension; a conditional dimension such as `mu` only uses the
+trials that set it) and candidates are ranked by l/g. Settings stated in the
+problem or introduction (γ, h, α) take precedence over TPE_DEFAULTS, which
+reproduce bo_hpo_llm_test_arch_v3_24_gt.json.
+
+Usage:
+    python reference_solver.py problem_set/24problems             # recommended candidate per problem
+    python reference_solver.py problem_set/100problems --check    # compare with *_answers.yaml
+    python reference_solver.py problem_set/24problems --ground-truth problem_set/bo_hpo_llm_test_arch_v3_24_gt.json
+    python reference_solver.py problem_set/24problems -o gt.json  # write ground truth
+"""
+
+import argparse
+import glob
+import json
+import math
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import yaml
+
+try:
+    from scipy import special
+except ImportError:  # scipy is optional: _erfc falls back to a NumPy approximation
+    special = None
+
+from problem_loader import ProblemSetLoader
+
+GP = 'GP'
+TPE = 'TPE'
+
+HEADER_PATTERN = re.compile(r'^##\s*Q(\d+)\.\s*(.*)$', re.MULTILINE)
+KERNEL_PATTERN = re.compile(r'ℓ\s*=\s*([\d.]+)\W+σ_f²\s*=\s*([\d.]+)\W+σ_n²?\s*=\s*([\d.]+)')
+PAIR_PATTERN = re.compile(r'([^\s,=()]+)\s*=\s*([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)')
+NUMBER_PATTERN = re.compile(r'[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?')
+LOG_DIM_PATTERN = re.compile(r'(\w+)\s*\(log[-\w]*\)')
+SUBSCRIPTS = str.maketrans('', '', '₀₁₂₃₄₅₆₇₈₉')
+CHOICES_PATTERN = re.compile(r'(\w+)\s*∈\s*\{([^}]*)\}')
+TUPLE_PATTERN = re.compile(r'\(([^()]*)\)')
+SETTING_PATTERNS = {
+    'gamma': re.compile(r'γ\s*=\s*([\d.]+)'),
+    'bandwidth': re.compile(r'\bh\s*=\s*([\d.]+)'),
+    'alpha': re.compile(r'α\s*=\s*([\d.]+)'),
+}
+
+TPE_DEFAULTS = {
+    'gamma': 0.33,
+    'alpha': 1.0,
+    'bandwidths': {'lr': 0.25, 'batch': 20.0, 'epochs': 2.0, 'mu': 0.1},
+    'bandwidth': 0.1,  # continuous dimensions not listed in `bandwidths`
+}
+# Density of a dimension no trial of the set has, and the smallest g(x) in l/g
+DENSITY_FLOOR = 1e-12
+# Acquisition per surrogate: result key and label in the answer keys
+ACQUISITION = {GP: ('EI', 'EI'), TPE: ('ratio', 'l/g')}
+
+
+def _erfc_approx(x: np.ndarray) -> np.ndarray:
+    """
+    erfc by the Chebyshev fit of Numerical Recipes (erfcc), vectorized over `x`.
+
+    Relative error below 1.2e-7 wherever erfc(x) is a normal double (|x| < 26.5),
+    well inside the 4-6 decimals of the answer keys.
+    """
+    x = np.asarray(x, dtype=float)
+    t = 1.0 / (1.0 + 0.5 * np.abs(x))
+    poly = -1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (-0.18628806 + t * (
+        0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (-0.82215223 + t * 0.17087277))))))))
+    tail = t * np.exp(poly - np.square(x))
+    return np.where(x >= 0, tail, 2.0 - tail)
+
+
+_erfc = special.erfc if special is not None else _erfc_approx
+
+
+def parse_kernel(text: str) -> Optional[Dict[str, float]]:
+    """
+    GP hyperparameters stated as `ℓ=0.30, σ_f²=1, σ_n²=0.01` (or `σ_n=0.01`) in `text` (None if absent).
+
+    Either way 'noise' is the noise standard deviation; solve_gp adds its square to the diagonal of K.
+    """
+    match = KERNEL_PATTERN.search(text.replace('*', ''))
+    if not match:
+        return None
+    lengthscale, signal_var, noise = (float(value) for value in match.groups())
+    return {'lengthscale': lengthscale, 'signal_var': signal_var, 'noise': noise}
+
+
+def surrogate_type(content: str) -> Optional[str]:
+    """'GP' or 'TPE' from a problem header such as `## Q10. GP (continuous)`."""
+    match = HEADER_PATTERN.search(content)
+    if not match:
+        return None
+    for surrogate in (TPE, GP):
+        if re.search(rf'\b{surrogate}\b', match.group(2)):
+            return surrogate
+    return None
+
+
+def _section_lines(content: str, heading: str) -> List[str]:
+    """Lines of the bullet list (or inline text) following a `**<heading>...**` line."""
+    lines = content.splitlines()
+    for i, line in enumerate(lines):
+        if line.startswith(f'**{heading}'):
+            inline = line.split(':', 1)[1].strip() if ':' in line else ''
+            if inline:
+                return [inline]
+            section = []
+            for item in lines[i + 1:]:
+                if item.startswith('- '):
+                    section.append(item[2:].strip())
+                elif section or item.startswith('**'):
+                    break
+            return section
+    return []
+
+
+def _pairs(text: str) -> Dict[str, float]:
+    return {key.translate(SUBSCRIPTS): float(value) for key, value in PAIR_PATTERN.findall(text)}
+
+
+def parse_gp_problem(content: str) -> Optional[Dict[str, Any]]:
+    """
+    Observations and candidates of a GP problem file.
+
+    Args:
+        content: Problem markdown (e.g. `- lr=0.0025, wd=0.0, drop=0.10 → y=0.5438` trials
+            and a bullet list of candidates, or `- x₁=0.10 → y₁=0.437` with an inline candidate set)
+
+    Returns:
+        dict: id, dims, log_dims, X, y and candidates (raw values), or None if it is not a GP problem
+    """
+    if surrogate_type(content) != GP:
+        return None
+    problem_id = f"Q{HEADER_PATTERN.search(content).group(1)}"
+
+    dims, X, y = [], [], []
+    for line in _section_lines(content, 'Observed trials'):
+        inputs, _, output = line.partition('→')
+        values = _pairs(inputs)
+        dims = dims or list(values)
+        X.append([values[dim] for dim in dims])
+        y.append(float(NUMBER_PATTERN.findall(output)[-1]))
+
+    candidates = []
+    for line in _section_lines(content, 'Candidate'):
+        values = _pairs(line)
+        if values:
+            candidates.append([values[dim] for dim in dims])
+        else:
+            candidates.extend([float(value)] for value in NUMBER_PATTERN.findall(line))
+
+    search_space = next((line for line in content.splitlines() if line.startswith('**Search space')), '')
+    log_names = LOG_DIM_PATTERN.findall(search_space)
+    log_dims = [dim for dim in dims if any(name.startswith(dim) or dim.startswith(name) for name in log_names)]
+    return {'id': problem_id, 'dims': dims, 'log_dims': log_dims, 'X': X, 'y': y, 'candidates': candidates}
+
+
+def _transform(values: List[List[float]], dims: List[str], log_dims: List[str]) -> np.ndarray:
+    array = np.asarray(values, dtype=float).reshape(len(values), len(dims))
+    for j, dim in enumerate(dims):
+        if dim in log_dims:
+            array[:, j] = np.log10(array[:, j])
+    return array
+
+
+def _triangular_solve(L: np.ndarray, B: np.ndarray, transpose: bool = False) -> np.ndarray:
+    """
+    Solve L x = B (or Lᵀ x = B) for a batch of lower-triangular L (B, n, n) and B (B, n, k).
+
+    Forward (back) substitution: one step per row, each vectorized over the batch
+    and the right-hand sides, so O(n²) work per column instead of an LU solve.
+    """
+    n = L.shape[-1]
+    X = np.empty(B.shape, dtype=float)
+    for i in (range(n - 1, -1, -1) if transpose else range(n)):
+        if transpose:  # row i of Lᵀ is column i of L
+            known = np.einsum('bj,bjk->bk', L[:, i + 1:, i], X[:, i + 1:])
+        else:
+            known = np.einsum('bj,bjk->bk', L[:, i, :i], X[:, :i])
+        X[:, i] = (B[:, i] - known) / L[:, i, i, None]
+    return X
+
+
+def normal_cdf(z: np.ndarray) -> np.ndarray:
+    return 0.5 * _erfc(-np.asarray(z) / math.sqrt(2))
+
+
+def normal_pdf(z: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * np.square(z)) / math.sqrt(2 * math.pi)
+
+
+def solve_gp(problems: List[Dict[str, Any]], predictive_noise: bool = True) -> List[Dict[str, Any]]:
+    """
+    GP posterior and EI for a batch of parsed GP problems.
+
+    Problems are padded to the largest observation, candidate and dimension
+    counts and solved together: padded observations get a unit diagonal and
+    zero covariance, so they leave α, μ and σ of the real ones unchanged.
+
+    Args:
+        problems: Dicts from parse_gp_problem, each with a `kernel` (see parse_kernel)
+        predictive_noise: Include the noise in σ(x) as the answer keys do; False gives
+            the latent σ(x) of the system prompt (σ² = k(x,x) - k*ᵀK_y⁻¹k*)
+
+    Returns:
+        list: per problem K, alpha, f_star, candidates (mu, sigma, z, EI) and recommended index
+    """
+    if not problems:
+        return []
+    B = len(problems)
+    n = max(len(p['y']) for p in problems)
+    m = max(len(p['candidates']) for p in problems)
+    d = max(len(p['dims']) for p in problems)
+
+    X = np.zeros((B, n, d))
+    C = np.zeros((B, m, d))
+    y = np.zeros((B, n))
+    obs_mask = np.zeros((B, n), dtype=bool)
+    lengthscale, signal_var, noise_var = (np.empty(B) for _ in range(3))
+    for b, problem in enumerate(problems):
+        k, c, dims = len(problem['y']), len(problem['candidates']), len(problem['dims'])
+        X[b, :k, :dims] = _transform(problem['X'], problem['dims'], problem['log_dims'])
+        C[b, :c, :dims] = _transform(problem['candidates'], problem['dims'], problem['log_dims'])
+        y[b, :k] = problem['y']
+        obs_mask[b, :k] = True
+        kernel = problem['kernel']
+        lengthscale[b], signal_var[b] = kernel['lengthscale'], kernel['signal_var']
+        noise_var[b] = kernel['noise'] ** 2
+
+    def rbf(A, Bm):
+        sq_dist = np.square(A[:, :, None, :] - Bm[:, None, :, :]).sum(-1)
+        return signal_var[:, None, None] * np.exp(-sq_dist / (2 * np.square(lengthscale)[:, None, None]))
+
+    K = np.where(obs_mask[:, :, None] & obs_mask[:, None, :], rbf(X, X), 0.0)
+    K += np.where(obs_mask, noise_var[:, None], 1.0)[:, :, None] * np.eye(n)
+    L = np.linalg.cholesky(K)
+
+    alpha = _triangular_solve(L, _triangular_solve(L, y[..., None]), transpose=True)[..., 0]
+    k_star = np.where(obs_mask[:, None, :], rbf(C, X), 0.0)  # (B, m, n)
+    mu = np.einsum('bmn,bn->bm', k_star, alpha)
+    v = _triangular_solve(L, np.swapaxes(k_star, 1, 2))  # (B, n, m)
+    variance = signal_var[:, None] - np.square(v).sum(1) + (noise_var[:, None] if predictive_noise else 0.0)
+    sigma = np.sqrt(np.maximum(variance, 0.0))
+
+    f_star = np.where(obs_mask, y, np.inf).min(1)
+    improvement = f_star[:, None] - mu
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(sigma > 0, improvement / sigma, 0.0)
+    Phi, phi = normal_cdf(z), normal_pdf(z)
+    ei = np.where(sigma > 0, improvement * Phi + sigma * phi, np.maximum(improvement, 0.0))
+
+    results = []
+    for b, problem in enumerate(problems):
+        k, c = len(problem['y']), len(problem['candidates'])
+        results.append({
+            'id': problem['id'],
+            'K': K[b, :k, :k].tolist(),
+            'alpha': alpha[b, :k].tolist(),
+            'f_star': float(f_star[b]),
+            'mu': mu[b, :c].tolist(),
+            'sigma': sigma[b, :c].tolist(),
+            'z': z[b, :c].tolist(),
+            'Phi': Phi[b, :c].tolist(),
+            'phi': phi[b, :c].tolist(),
+            'EI': ei[b, :c].tolist(),
+            'recommended': int(np.argmax(ei[b, :c])),
+        })
+    return results
+
+
+def parse_tpe_settings(text: str) -> Dict[str, float]:
+    """γ, KDE bandwidth h and Laplace α stated in `text` (only those present)."""
+    text = text.replace('*', '')
+    return {name: float(match.group(1)) for name, pattern in SETTING_PATTERNS.items()
+            if (match := pattern.search(text))}
+
+
+def _parse_point(text: str, continuous: List[str]) -> tuple:
+    """Categorical values and continuous values of a `(Adam, lr=0.30)` or `(SGD, 0.20)` tuple."""
+    categorical, values, positional = [], {}, []
+    for token in (token.strip() for token in text.split(',')):
+        if '=' in token:
+            key, value = token.split('=', 1)
+            values[key.strip()] = float(value)
+        elif NUMBER_PATTERN.fullmatch(token):
+            positional.append(float(token))
+        elif token:
+            categorical.append(token)
+    values.update(zip([dim for dim in continuous if dim not in values], positional))
+    return categorical, values
+
+
+def parse_tpe_problem(content: str) -> Optional[Dict[str, Any]]:
+    """
+    Trials and candidates of a TPE problem file.
+
+    Args:
+        content: Problem markdown with `optimizer ∈ {SGD, Adam, RMSprop}` categorical
+            dimensions, `- (Adam, lr=0.30) → loss=0.611` trials and `(SGD, 0.20), ...`
+            or `- (ResNet18, SGD, fedavg, lr=0.1, batch=128, epochs=30)` candidates
+
+    Returns:
+        dict: id, categorical (dim -> choices), continuous dims, trials, losses and
+        candidates (each a (categorical values, continuous values) pair), or None if it is not a TPE problem
+    """
+    if surrogate_type(content) != TPE:
+        return None
+    problem_id = f"Q{HEADER_PATTERN.search(content).group(1)}"
+    search_space = next((line for line in content.splitlines() if line.startswith('**Search space')), '')
+    categorical = {dim: [choice.strip() for choice in choices.split(',')]
+                   for dim, choices in CHOICES_PATTERN.findall(search_space)}
+
+    continuous, trials, losses = [], [], []
+    for line in _section_lines(content, 'Observed trials'):
+        point, _, output = line.partition('→')
+        cat_values, values = _parse_point(TUPLE_PATTERN.search(point).group(1), continuous)
+        continuous.extend(dim for dim in values if dim not in continuous)
+        trials.append((cat_values, values))
+        losses.append(float(NUMBER_PATTERN.findall(output)[-1]))
+
+    candidates = []
+    for line in _section_lines(content, 'Candidate'):
+        for point in TUPLE_PATTERN.findall(line):
+            cat_values, values = _parse_point(point, continuous)
+            continuous.extend(dim for dim in values if dim not in continuous)
+            candidates.append((cat_values, values))
+
+    return {'id': problem_id, 'categorical': categorical, 'continuous': continuous,
+            'trials': trials, 'losses': losses, 'candidates': candidates}
+
+
+def _choice_index(problem: Dict[str, Any], dim: str, value: str) -> int:
+    try:
+        return problem['categorical'][dim].index(value)
+    except ValueError:
+        raise ValueError(f"{problem['id']}: {value!r} is not a choice of {dim}") from None
+
+
+def solve_tpe(problems: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    l(x), g(x) and l/g for a batch of parsed TPE problems.
+
+    Problems are padded to the largest trial, candidate, dimension and choice
+    counts; padded categorical dimensions contribute a mass of 1 and missing
+    continuous values (padding, or an unset conditional dimension) are masked
+    out of the KDEs.
+
+    Args:
+        problems: Dicts from parse_tpe_problem, each with `settings` (gamma, alpha, bandwidths)
+
+    Returns:
+        list: per problem the good/bad split, categorical masses and, per candidate,
+        P(value|good/bad), l_<dim>/g_<dim> densities, l(x), g(x) and l/g, plus the recommended index
+    """
+    if not problems:
+        return []
+    T = max(len(p['trials']) for p in problems)
+    M = max(len(p['candidates']) for p in problems)
+    Dc = max(len(p['categorical']) for p in problems) or 1
+    V = max((len(choices) for p in problems for choices in p['categorical'].values()), default=1)
+    Dn = max(len(p['continuous']) for p in problems) or 1
+
+    # Padded inputs are built as nested lists and converted once
+    def encode(problem, points, rows):
+        dims, continuous = list(problem['categorical']), problem['continuous']
+        cats, nums = [], []
+        for cat_values, values in points:
+            indices = [_choice_index(problem, dim, value) for dim, value in zip(dims, cat_values)]
+            cats.append(indices + [-1] * (Dc - len(indices)))
+            nums.append([values.get(dim, math.nan) for dim in continuous] + [math.nan] * (Dn - len(continuous)))
+        cats += [[-1] * Dc] * (rows - len(points))
+        nums += [[math.nan] * Dn] * (rows - len(points))
+        return cats, nums
+
+    trial_cats, trial_nums, cand_cats, cand_nums, rank = [], [], [], [], []
+    n_choices, bandwidth, loss, gamma, alpha = [], [], [], [], []
+    for problem in problems:
+        cats, nums = encode(problem, problem['trials'], T)
+        trial_cats.append(cats)
+        trial_nums.append(nums)
+        cats, nums = encode(problem, problem['candidates'], M)
+        cand_cats.append(cats)
+        cand_nums.append(nums)
+
+        choices = [len(choices) for choices in problem['categorical'].values()]
+        n_choices.append(choices + [0] * (Dc - len(choices)))
+        settings = problem['settings']
+        widths = [settings['bandwidths'][dim] for dim in problem['continuous']]
+        bandwidth.append(widths + [1.0] * (Dn - len(widths)))
+        gamma.append(settings['gamma'])
+        alpha.append(settings['alpha'])
+        n_trials = len(problem['trials'])
+        loss.append(problem['losses'] + [math.inf] * (T - n_trials))
+        # Ties in loss are ordered by the trial's values, as the answer keys do
+        order = sorted(range(n_trials), key=lambda i: (
+            problem['losses'][i], problem['trials'][i][0], sorted(problem['trials'][i][1].items())))
+        ranks = [T] * T
+        for position, i in enumerate(order):
+            ranks[i] = position
+        rank.append(ranks)
+
+    trial_cats, cand_cats, rank = np.array(trial_cats), np.array(cand_cats), np.array(rank)
+    trial_nums, cand_nums, loss = np.array(trial_nums), np.array(cand_nums), np.array(loss)
+    n_choices, bandwidth, gamma, alpha = np.array(n_choices), np.array(bandwidth), np.array(gamma), np.array(alpha)
+
+    # Good/bad split: the best ceil(γn) trials are good
+    valid = np.isfinite(loss)
+    n_good = np.maximum(1, np.ceil(gamma * valid.sum(1) - 1e-9))
+    good = valid & (rank < n_good[:, None])
+    bad = valid & ~good
+
+    # Laplace-smoothed categorical masses, (B, Dc, V), gathered at the candidates' choices
+    trial_onehot = trial_cats[..., None] == np.arange(V)
+    cand_onehot = cand_cats[..., None] == np.arange(V)
+
+    def masses(split):
+        counts = np.einsum('btdv,bt->bdv', trial_onehot, split.astype(float))
+        probs = (counts + alpha[:, None, None]) / (split.sum(1)[:, None, None] + alpha[:, None, None] * n_choices[..., None])
+        at_candidates = np.where(cand_cats >= 0, (cand_onehot * probs[:, None]).sum(-1), 1.0)
+        return counts, probs, at_candidates
+
+    # Gaussian KDEs per continuous dimension, (B, M, Dn)
+    scaled = (cand_nums[:, :, None, :] - trial_nums[:, None, :, :]) / bandwidth[:, None, None, :]
+    kernel = np.exp(-0.5 * np.square(scaled)) / (bandwidth[:, None, None, :] * math.sqrt(2 * math.pi))
+
+    def densities(split):
+        weights = split[:, :, None] & ~np.isnan(trial_nums)  # (B, T, Dn)
+        totals = weights.sum(1)[:, None, :]
+        with np.errstate(invalid='ignore'):
+            density = np.where(weights[:, None], kernel, 0.0).sum(2) / totals
+        density = np.where(totals > 0, density, DENSITY_FLOOR)
+        return np.where(np.isnan(cand_nums), 1.0, density)
+
+    good_counts, good_probs, p_good = masses(good)
+    bad_counts, bad_probs, p_bad = masses(bad)
+    l_dens, g_dens = densities(good), densities(bad)
+    l_x = p_good.prod(-1) * l_dens.prod(-1)
+    g_x = p_bad.prod(-1) * g_dens.prod(-1)
+    ratio = l_x / np.maximum(g_x, DENSITY_FLOOR)
+
+    # Convert once: per-element indexing of NumPy arrays dominates otherwise
+    tables = {name: table.tolist() for name, table in (
+        ('good_counts', good_counts), ('bad_counts', bad_counts), ('good_probs', good_probs), ('bad_probs', bad_probs))}
+    p_good, p_bad, l_dens, g_dens = p_good.tolist(), p_bad.tolist(), l_dens.tolist(), g_dens.tolist()
+    l_x, g_x, ratio_list = l_x.tolist(), g_x.tolist(), ratio.tolist()
+    order = np.argsort(rank, axis=1).tolist()
+    good, bad = good.tolist(), bad.tolist()
+
+    results = []
+    for b, problem in enumerate(problems):
+        dims, continuous = list(problem['categorical']), problem['continuous']
+        n_trials, n_candidates = len(problem['trials']), len(problem['candidates'])
+
+        candidates = []
+        for m, (_, values) in enumerate(problem['candidates']):
+            candidate = {f'P({dim}|good)': p_good[b][m][d] for d, dim in enumerate(dims)}
+            candidate.update({f'P({dim}|bad)': p_bad[b][m][d] for d, dim in enumerate(dims)})
+            for j, dim in enumerate(continuous):
+                if dim in values:
+                    candidate[f'l_{dim}'], candidate[f'g_{dim}'] = l_dens[b][m][j], g_dens[b][m][j]
+            candidate.update(l_x=l_x[b][m], g_x=g_x[b][m], ratio=ratio_list[b][m])
+            candidates.append(candidate)
+
+        trial_order = order[b][:n_trials]
+        results.append({
+            'id': problem['id'],
+            'good': [i for i in trial_order if good[b][i]],
+            'bad': [i for i in trial_order if bad[b][i]],
+            'categoricals': {name: {dim: dict(zip(problem['categorical'][dim], table[b][d])) for d, dim in enumerate(dims)}
+                             for name, table in tables.items()},
+            'candidates': candidates,
+            'ratio': ratio_list[b][:n_candidates],
+            'recommended': int(np.argmax(ratio[b, :n_candidates])),
+        })
+    return results
+
+
+def _load_answers(problem_dir: str) -> Dict[str, str]:
+    answer_files = glob.glob(str(Path(problem_dir) / '**' / '*answers.yaml'), recursive=True)
+    if not answer_files:
+        return {}
+    with open(answer_files[0], 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+
+def parse_problem(content: str, introduction: str = '', answer: str = '') -> Optional[Dict[str, Any]]:
+    """
+    Parse a GP or TPE problem and attach its solver settings.
+
+    GP kernel hyperparameters come from the introduction, or else from the
+    problem's answer key entry (the 24-problem set states them per answer).
+    TPE settings come from the problem text, then the introduction, then
+    TPE_DEFAULTS; a stated bandwidth h applies to every continuous dimension.
+
+    Returns:
+        dict: the parsed problem with `surrogate` and `kernel` or `settings`, or None if neither surrogate is recognized
+
+    Raises:
+        ValueError: a GP problem without stated kernel hyperparameters
+    """
+    problem = parse_gp_problem(content)
+    if problem is not None:
+        problem['surrogate'] = GP
+        problem['kernel'] = parse_kernel(str(answer)) or parse_kernel(introduction)
+        if problem['kernel'] is None:
+            raise ValueError(f"No GP kernel hyperparameters found for {problem['id']}")
+        return problem
+
+    problem = parse_tpe_problem(content)
+    if problem is not None:
+        problem['surrogate'] = TPE
+        stated = {**parse_tpe_settings(introduction), **parse_tpe_settings(content)}
+        bandwidths = {dim: stated.get('bandwidth') or TPE_DEFAULTS['bandwidths'].get(dim, TPE_DEFAULTS['bandwidth'])
+                      for dim in problem['continuous']}
+        problem['settings'] = {'gamma': stated.get('gamma', TPE_DEFAULTS['gamma']),
+                               'alpha': stated.get('alpha', TPE_DEFAULTS['alpha']),
+                               'bandwidths': bandwidths}
+    return problem
+
+
+def load_problems(problem_dir: str, answers: Dict[str, str] = None) -> List[Dict[str, Any]]:
+    """Parse every GP and TPE problem of a problem set directory (see parse_problem)."""
+    loader = ProblemSetLoader(problem_dir)
+    answers = _load_answers(problem_dir) if answers is None else answers
+    try:
+        introduction = loader.load_introduction()
+    except FileNotFoundError:
+        introduction = ''
+
+    problems = []
+    for problem_file in loader.load_problem_files('100'):
+        match = HEADER_PATTERN.search(problem_file['content'])
+        answer = answers.get(f"Q{match.group(1)}", '') if match else ''
+        problem = parse_problem(problem_file['content'], introduction, answer)
+        if problem is not None:
+            problem['filename'] = problem_file['filename']
+            problems.append(problem)
+    return problems
+
+
+def solve_problems(problems: List[Dict[str, Any]], predictive_noise: bool = True) -> List[Dict[str, Any]]:
+    """Solve a mix of GP and TPE problems (one batch per surrogate); results keep the input order."""
+    results = [None] * len(problems)
+    for surrogate, solve in ((GP, lambda batch: solve_gp(batch, predictive_noise)), (TPE, solve_tpe)):
+        indices = [i for i, problem in enumerate(problems) if problem['surrogate'] == surrogate]
+        for i, result in zip(indices, solve([problems[i] for i in indices])):
+            result['surrogate'] = surrogate
+            results[i] = result
+    return results
+
+
+def candidate_values(problem: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """Hyperparameter values of a problem's candidate."""
+    if problem['surrogate'] == GP:
+        return dict(zip(problem['dims'], problem['candidates'][index]))
+    cat_values, values = problem['candidates'][index]
+    return {**dict(zip(problem['categorical'], cat_values)), **values}
+
+
+def ground_truth_item(problem: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    """Ground-truth record in the layout of bo_hpo_llm_test_arch_v3_24_gt.json."""
+    recommended = {'criterion': ACQUISITION[problem['surrogate']][1], 'index': result['recommended'],
+                   'candidate': candidate_values(problem, result['recommended'])}
+    if problem['surrogate'] == GP:
+        dims = problem['dims']
+        return {
+            'id': problem['id'],
+            'surrogate': GP,
+            'kernel': problem['kernel'],
+            'observations': [dict(zip(dims, x), loss=y) for x, y in zip(problem['X'], problem['y'])],
+            'K': result['K'],
+            'alpha': result['alpha'],
+            'f_star': result['f_star'],
+            'candidates': [dict(candidate_values(problem, i), mu=mu, sigma=sigma, EI=ei)
+                           for i, (mu, sigma, ei) in enumerate(zip(result['mu'], result['sigma'], result['EI']))],
+            'recommended': recommended,
+        }
+    return {
+        'id': problem['id'],
+        'surrogate': TPE,
+        'settings': problem['settings'],
+        'search_space': {**problem['categorical'], 'continuous': problem['continuous']},
+        'trials': [{**dict(zip(problem['categorical'], cat_values)), **values, 'loss': loss}
+                   for (cat_values, values), loss in zip(problem['trials'], problem['losses'])],
+        'good': result['good'],
+        'categoricals': result['categoricals'],
+        'candidates': [dict(candidate_values(problem, i), **candidate) for i, candidate in enumerate(result['candidates'])],
+        'recommended': recommended,
+    }
+
+
+def answer_key_values(answer: str, surrogate: str) -> List[float]:
+    """Per-candidate `EI=...` (GP) or `l/g=...` (TPE) values listed in an answer key entry."""
+    label = ACQUISITION[surrogate][1]
+    pattern = rf'(?<![\w/]){re.escape(label)}\s*=\s*([-+]?\d*\.?\d+)'
+    return [float(value) for value in re.findall(pattern, str(answer).replace('*', ''))]
+
+
+def check_against_answers(results: List[Dict[str, Any]], answers: Dict[str, str], tolerance: float) -> List[str]:
+    """Mismatches between computed EI / l/g values and the `EI=...` / `l/g=...` values listed in the answer keys."""
+    mismatches = []
+    for result in results:
+        key, label = ACQUISITION[result['surrogate']]
+        expected = answer_key_values(answers.get(result['id'], ''), result['surrogate'])
+        if not expected:
+            mismatches.append(f"{result['id']}: no {label} values in the answer key")
+            continue
+        if len(expected) != len(result[key]):
+            mismatches.append(f"{result['id']}: {len(expected)} {label} values in the answer key, "
+                              f"{len(result[key])} candidates")
+            continue
+        errors = np.abs(np.asarray(result[key]) - np.asarray(expected))
+        if errors.max() > tolerance or int(np.argmax(expected)) != result['recommended']:
+            mismatches.append(f"{result['id']}: {label} {np.round(result[key], 5).tolist()} vs answer key {expected}")
+    return mismatches
+
+
+def check_against_ground_truth(results: List[Dict[str, Any]], items: List[Dict[str, Any]],
+                               rtol: float = 1e-3) -> List[str]:
+    """Mismatches between computed values and a *_gt.json file (EI for GP, ratio for TPE items)."""
+    by_id = {item['id']: item for item in items}
+    mismatches = []
+    for result in results:
+        key, label = ACQUISITION[result['surrogate']]
+        item = by_id.get(result['id'])
+        if item is None:
+            mismatches.append(f"{result['id']}: not in the ground truth file")
+            continue
+        expected = [candidate[key] for candidate in item['candidates']]
+        if len(expected) != len(result[key]) or not np.allclose(result[key], expected, rtol=rtol, atol=1e-12) \
+                or int(np.argmax(expected)) != result['recommended']:
+            mismatches.append(f"{result['id']}: {label} {np.round(result[key], 6).tolist()} vs ground truth {expected}")
+    return mismatches
+
+
+def _report(mismatches: List[str], total: int, reference: str) -> None:
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch}")
+    print(f"{total - len(mismatches)}/{total} problems match the {reference}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute GP/EI and TPE l/g ground truth for a problem set')
+    parser.add_argument('problem_dir', help='Problem set directory (e.g. problem_set/24problems)')
+    parser.add_argument('--check', action='store_true', help='Compare EI and l/g values with the *_answers.yaml answer key')
+    parser.add_argument('--tolerance', type=float, default=1e-3,
+                        help='Absolute tolerance for --check (default: 1e-3; answer keys are rounded)')
+    parser.add_argument('--ground-truth', help='Compare with a *_gt.json file (relative tolerance 1e-3)')
+    parser.add_argument('-o', '--output', help='Write ground truth JSON to this file')
+    args = parser.parse_args()
+
+    answers = _load_answers(args.problem_dir)
+    problems = load_problems(args.problem_dir, answers)
+    results = solve_problems(problems)
+
+    for problem, result in zip(problems, results):
+        key, label = ACQUISITION[result['surrogate']]
+        best = result['recommended']
+        print(f"{result['id']}: recommend {candidate_values(problem, best)} ({label}={result[key][best]:.5g})")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'items': [ground_truth_item(p, r) for p, r in zip(problems, results)]}, f, indent=1)
+        print(f"Ground truth written to: {args.output}")
+
+    mismatches = []
+    if args.check:
+        checked = check_against_answers(results, answers, args.tolerance)
+        _report(checked, len(results), 'answer key')
+        mismatches += checked
+    if args.ground_truth:
+        with open(args.ground_truth, 'r', encoding='utf-8') as f:
+            checked = check_against_ground_truth(results, json.load(f)['items'])
+        _report(checked, len(results), 'ground truth')
+        mismatches += checked
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+
+def make_cache_key(llm_config: dict, system_prompt: str, prompt: str) -> str:
+    """Content hash of everything that determines a completion."""
+    payload = {
+        'model': llm_config['model'],
+        'system_prompt': system_prompt,
+        'prompt': prompt,
+        'temperature': llm_config.get('temperature'),
+        'max_tokens': llm_config.get('max_tokens'),
+        'cache_seed': llm_config.get('cache_seed'),
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def cache_enabled(llm_config: dict) -> bool:
+    """An explicit `"cache_seed": None` in a config opts that model out of caching."""
+    return not ('cache_seed' in llm_config and llm_config['cache_seed'] is None)
+
+
+class ResponseCache:
+    def __init__(self, cache_dir: str = '.llm_cache', max_bytes: int = 512 * 1024 * 1024,
+                 memory_entries: int = 256):
+        """
+        Two-tier response cache: an in-memory LRU in front of a shared SQLite file.
+
+        The SQLite file runs in WAL mode, so several main.py processes can read and
+        write the same cache directory at once. When the stored responses exceed
+        `max_bytes`, the least recently used rows are evicted.
+
+        Args:
+            cache_dir: Directory holding `responses.sqlite`
+            max_bytes: Size budget for stored response text
+            memory_entries: Number of responses kept in the in-memory tier
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._ainflight: Dict[str, asyncio.Future] = {}
+
+        self._conn = sqlite3.connect(str(self.cache_dir / 'responses.sqlite'), timeout=30,
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA busy_timeout=30000')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, '
+            'created REAL NOT NULL, last_access REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        # Running size of the stored responses; re-read from the file only when it exceeds the budget
+        self._total = self._stored_bytes()
+
+    def _remember(self, key: str, response: str):
+        self._memory[key] = response
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        """The response for `key` if it is in the in-memory tier (counted as a hit), else None."""
+        with self._lock:
+            if key not in self._memory:
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for `key`, or None."""
+        cached = self._get_memory(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            row = self._conn.execute('SELECT response FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (time.time(), key))
+            self._remember(key, row[0])
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """Store a response and evict least recently used rows beyond the size budget."""
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            self._remember(key, response)
+            replaced = self._conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, response, size, created, last_access) VALUES (?, ?, ?, ?, ?)',
+                (key, response, size, now, now)
+            )
+            self._total += size - (replaced[0] if replaced else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Other processes sharing the file also insert and evict: resynchronise before trimming
+        self._total = self._stored_bytes()
+        if self._total <= self.max_bytes:
+            return
+        # Trim to 90% of the budget so eviction doesn't run on every insert
+        excess = self._total - int(self.max_bytes * 0.9)
+        freed = 0
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall():
+            if freed >= excess:
+                break
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._memory.pop(key, None)
+            freed += size
+        self._total -= freed
+
+    def get_or_compute(self, key: str, compute: Callable[[], str]) -> str:
+        """
+        Return the cached response, or run `compute` once and cache its result.
+
+        Concurrent callers asking for the same key wait for the first call instead of
+        issuing their own. Failures are not cached; waiters then compute it themselves.
+        """
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+            with self._lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+            if not owner:
+                event.wait()
+                # The owner either cached the response or failed; in the latter case retry ourselves
+                continue
+            try:
+                response = compute()
+                self.put(key, response)
+                return response
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                event.set()
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        """
+        Async variant of get_or_compute(); waiters share the first caller's result or exception.
+
+        SQLite reads and writes run in a worker thread so they don't stall the event loop.
+        """
+        cached = self._get_memory(key)
+        if cached is None and key not in self._ainflight:
+            cached = await asyncio.to_thread(self.get, key)
+        if cached is not None:
+            return cached
+        future = self._ainflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self._ainflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await compute()
+            await asyncio.to_thread(self.put, key, response)
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure doesn't log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._ainflight[key]
+
+    def close(self):
+        """Close the SQLite connection."""
+        self._conn.close()
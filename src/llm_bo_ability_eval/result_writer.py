@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Append-only JSONL journal of per-problem results, with YAML export on demand.
+
+Each completed problem becomes one fsync'd JSON line, so a crash loses at most the
+problems still in flight and memory use does not grow with the run size. The
+`_{i}_result.yaml` files and `all_results.yaml` are produced from the journal
+after the run, or at any time with:
+
+    python result_writer.py results/<timestamp>/<prefix>_results.jsonl
+
+Texts shared by many records (introduction, system prompt, problem content) are
+stored once per run under `blobs/` and referenced from records as
+`{'blob': <sha256>}`; `load_results()` resolves them back to text.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import yaml
+
+JOURNAL_SUFFIX = "_results.jsonl"
+BLOB_DIR_NAME = "blobs"
+
+
+class BlobStore:
+    def __init__(self, run_dir: Path):
+        """Hash-addressed text blobs stored once per run in `run_dir/blobs`."""
+        self.blob_dir = Path(run_dir) / BLOB_DIR_NAME
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self._written = set()
+
+    def put(self, text: str) -> Dict[str, str]:
+        """Store `text` if it is new and return the reference to put in a record."""
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        if digest not in self._written:
+            path = self.blob_dir / f"{digest}.txt"
+            if not path.exists():
+                tmp_path = path.with_suffix('.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(tmp_path, path)
+            self._written.add(digest)
+        return {'blob': digest}
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and set(value) == {'blob'}
+
+
+@lru_cache(maxsize=256)
+def _read_blob(blob_dir: str, digest: str) -> str:
+    with open(Path(blob_dir) / f"{digest}.txt", 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def resolve_blobs(result: Dict[str, Any], blob_dir: Path) -> Dict[str, Any]:
+    """Return a copy of `result` with every blob reference replaced by its text."""
+    return {
+        key: _read_blob(str(blob_dir), value['blob']) if is_blob_ref(value) else value
+        for key, value in result.items()
+    }
+
+
+def load_results(path: Path) -> List[Dict[str, Any]]:
+    """
+    Load a YAML result file or a JSONL journal with blob references resolved.
+
+    Blobs are looked up in the `blobs/` directory next to the file.
+    """
+    path = Path(path)
+    if path.name.endswith(JOURNAL_SUFFIX):
+        results = [result for _, result in iter_latest_results(path)]
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            results = yaml.safe_load(f) or []
+    blob_dir = path.parent / BLOB_DIR_NAME
+    return [resolve_blobs(result, blob_dir) for result in results]
+
+
+class ResultJournal:
+    def __init__(self, path: Path):
+        """Open (or continue) a journal file for appending."""
+        self.path = Path(path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        # Terminate a line torn by a crash so the next record starts on its own line
+        if self._file.tell() > 0:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b'\n'
+            if torn:
+                self._file.write('\n')
+
+    def append(self, index: int, result: Dict[str, Any]):
+        """Durably record the result of problem `index` (1-based)."""
+        line = json.dumps({'index': index, 'result': result}, ensure_ascii=False)
+        self._file.write(line + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_journal(path: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (index, result) pairs in write order, skipping torn lines (also cut inside a character)."""
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            yield record['index'], record['result']
+
+
+def _latest_offsets(path: Path) -> Dict[int, int]:
+    """Byte offset of the latest complete record for every problem index."""
+    offsets = {}
+    with open(path, 'rb') as f:
+        offset = 0
+        for line in f:
+            try:
+                offsets[json.loads(line)['index']] = offset
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                pass
+            offset += len(line)
+    return offsets
+
+
+def iter_latest_results(path: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Yield (index, result) sorted by index, keeping only the last record per index.
+
+    Only the offsets are held in memory; each result is read back from disk as it is yielded.
+    """
+    offsets = _latest_offsets(path)
+    with open(path, 'rb') as f:
+        for index in sorted(offsets):
+            f.seek(offsets[index])
+            yield index, json.loads(f.readline())['result']
+
+
+def export_yaml(journal_path: Path, output_dir: Path = None, prefix: str = None) -> Path:
+    """
+    Write `{prefix}_{i}_result.yaml` files and `{prefix}_all_results.yaml` from a journal.
+
+    The aggregate is streamed one record at a time, so it never holds the whole run.
+
+    Returns:
+        Path: the all_results.yaml file
+    """
+    journal_path = Path(journal_path)
+    output_dir = Path(output_dir) if output_dir else journal_path.parent
+    if prefix is None:
+        prefix = journal_path.name[:-len(JOURNAL_SUFFIX)]
+
+    all_results_file = output_dir / f"{prefix}_all_results.yaml"
+    with open(all_results_file, 'w') as all_f:
+        count = 0
+        for index, result in iter_latest_results(journal_path):
+            # A one-item list dumps as a single "- ..." entry, so entries concatenate into one list
+            entry = yaml.dump([result], default_flow_style=False, indent=2)
+            all_f.write(entry)
+            with open(output_dir / f"{prefix}_{index}_result.yaml", 'w') as f:
+                f.write(entry)
+            count += 1
+        if count == 0:
+            all_f.write(yaml.dump([]))
+    return all_results_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a JSONL result journal to the YAML result files')
+    parser.add_argument('journal', help='Path to a *_results.jsonl journal')
+    args = parser.parse_args()
+
+    output_file = export_yaml(args.journal)
+    print(f"YAML results written to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import asyncio
+import random
+import time
+from typing import Optional
+
+from rate_limiter import is_throttle_error
+
+# Error categories
+THROTTLED = 'throttled'   # 429 / 503: slow down, then retry
+RETRYABLE = 'retryable'   # other 5xx, dropped connections, timeouts
+FATAL = 'fatal'           # auth errors, unknown model, malformed request, ...
+DEADLINE = 'deadline'     # gave up because a request or run deadline passed
+
+# Exception class names of transient transport failures across the SDKs
+# (openai/anthropic APIConnectionError and APITimeoutError, httpx transport errors, google.api_core)
+RETRYABLE_ERROR_NAMES = {
+    'APIConnectionError', 'APITimeoutError', 'ConnectError', 'ConnectTimeout', 'ReadError',
+    'ReadTimeout', 'WriteError', 'RemoteProtocolError', 'PoolTimeout', 'DeadlineExceeded',
+    'ServiceUnavailable', 'InternalServerError', 'ServerError',
+}
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of retrying when the request or run deadline has passed."""
+
+
+class RequestFailed(Exception):
+    def __init__(self, record: dict):
+        """Final failure of a request after retries; `record` is the structured error record."""
+        super().__init__(record['message'])
+        self.record = record
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    # openai/anthropic errors carry status_code, google.api_core errors carry code
+    for attr in ('status_code', 'code'):
+        status = getattr(error, attr, None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def classify_error(error: Exception) -> str:
+    """Sort a provider exception into THROTTLED, RETRYABLE, FATAL or DEADLINE."""
+    if isinstance(error, DeadlineExceeded):
+        return DEADLINE
+    if is_throttle_error(error):
+        return THROTTLED
+    status = _status_code(error)
+    if status is not None:
+        # 5xx (including Anthropic's 529 overloaded), 408 Request Timeout and 409 Conflict are transient;
+        # the OpenAI and Anthropic SDKs retry 408/409 themselves (a 409 comes from a lock timeout)
+        return RETRYABLE if status >= 500 or status in (408, 409) else FATAL
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return RETRYABLE
+    if any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__):
+        return RETRYABLE
+    return FATAL
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds from a Retry-After header on the error's HTTP response, if any."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def error_record(error: Exception, attempts: int, elapsed: float, category: str = None) -> dict:
+    """Structured description of a failed request, stored in place of the response."""
+    return {
+        'category': category or classify_error(error),
+        'type': type(error).__name__,
+        'status_code': _status_code(error),
+        'message': str(error),
+        'attempts': attempts,
+        'elapsed': round(elapsed, 3),
+    }
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 timeout: float = None, request_deadline: float = None, run_deadline: float = None):
+        """
+        Retry with jittered exponential backoff, bounded by per-request and per-run deadlines.
+
+        Args:
+            max_attempts: Attempts per request, including the first one
+            base_delay: Backoff ceiling after the first failure (doubles per attempt)
+            max_delay: Upper bound of the backoff ceiling
+            timeout: Seconds a single attempt may take (passed to the client)
+            request_deadline: Seconds one request may take across all its attempts
+            run_deadline: time.monotonic() value after which no attempt is started
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.request_deadline = request_deadline
+        self.run_deadline = run_deadline
+
+    @classmethod
+    def from_config(cls, llm_config: dict, run_deadline: float = None) -> 'RetryPolicy':
+        """Policy from the optional config keys `timeout`, `request_deadline`, `max_retries`, `retry_base_delay`."""
+        return cls(
+            max_attempts=llm_config.get('max_retries', 4) + 1,
+            base_delay=llm_config.get('retry_base_delay', 1.0),
+            timeout=llm_config.get('timeout'),
+            request_deadline=llm_config.get('request_deadline'),
+            run_deadline=run_deadline,
+        )
+
+    def deadline_for(self, start: float) -> Optional[float]:
+        """Monotonic deadline of a request started at `start` (None when unbounded)."""
+        deadlines = [d for d in (self.run_deadline,
+                                 start + self.request_deadline if self.request_deadline else None) if d]
+        return min(deadlines) if deadlines else None
+
+    def attempt_timeout(self, deadline: Optional[float]) -> Optional[float]:
+        """Timeout of the next attempt: the configured timeout, cut short by the deadline."""
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("deadline passed before the request could be sent")
+        return min(self.timeout, remaining) if self.timeout else remaining
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter delay before retry number `attempt` (1-based), honouring Retry-After."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay = random.uniform(0, ceiling)
+        retry_after = _retry_after(error)
+        return max(delay, retry_after) if retry_after else delay
+
+    def next_delay(self, attempt: int, error: Exception, deadline: Optional[float]) -> Optional[float]:
+        """
+        Seconds to wait before retrying after a failed attempt, or None to give up.
+
+        Args:
+            attempt: Number of attempts made so far
+            error: Exception raised by the last attempt
+            deadline: Request deadline from deadline_for()
+        """
+        if classify_error(error) not in (THROTTLED, RETRYABLE) or attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt, error)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def failure_record(self, error: Exception, attempts: int, start: float) -> dict:
+        """Error record for a request given up after `attempts` attempts, started at `start`."""
+        category = classify_error(error)
+        if category in (THROTTLED, RETRYABLE) and attempts < self.max_attempts:
+            # Still retryable, but the deadline left no room for another attempt
+            category = DEADLINE
+        return error_record(error, attempts, time.monotonic() - start, category)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Run a matrix of LLMs x problem sets in one process.
+
+In-process replacement for `_bad_test_multiple_llms.sh` / `_bad_stop_llm_experiments.sh`:
+every job shares one interpreter and event loop, each endpoint (base_url) has its own
+job queue so a slow host never holds back another provider, completion events are
+reported as they happen, and Ctrl-C / SIGTERM cancels in-flight work cleanly (finished
+problems are already in each run's journal; continue with `main.py --resume`).
+
+Usage:
+    python scheduler.py -l gemini qwen -e 100 24
+    python scheduler.py -l qwen deepseek -e 24 -m 2 -c 4 --key-file llm_key_config.txt
+"""
+
+import argparse
+import asyncio
+import datetime
+import shlex
+import signal
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from llm_configs import LLM_MAPPING
+from main import load_api_keys, run_experiment
+from response_cache import ResponseCache
+
+
+def problem_path_for(experiment: str) -> str:
+    """Problem set directory of an experiment type."""
+    return f"problem_set/{experiment}problems"
+
+
+def endpoint_key(llm_config: dict) -> str:
+    """Jobs sharing a base_url share a queue; providers without one are keyed by model."""
+    return llm_config.get('base_url') or llm_config['model']
+
+
+def build_jobs(llms: List[str], experiments: List[str], api_keys: Dict[str, str] = None) -> List[dict]:
+    """Expand the LLM x experiment matrix into jobs, in the same order as the shell script."""
+    jobs = []
+    for llm in llms:
+        llm_config = dict(LLM_MAPPING[llm])
+        if api_keys and llm in api_keys:
+            llm_config['api_key'] = api_keys[llm]
+        for experiment in experiments:
+            jobs.append({
+                'number': len(jobs) + 1,
+                'llm': llm,
+                'llm_config': llm_config,
+                'experiment': experiment,
+                'problems': problem_path_for(experiment),
+            })
+    return jobs
+
+
+def job_options(args: argparse.Namespace) -> List[str]:
+    """main.py options that give a job the settings of this scheduler command line."""
+    options = []
+    if args.max_files is not None:
+        options += ['-m', str(args.max_files)]
+    if args.concurrency != 1:
+        options += ['-c', str(args.concurrency)]
+    if args.key_file:
+        options += ['--key-file', args.key_file]
+    if args.cache:
+        options += ['--cache', '--cache-dir', args.cache_dir]
+    if args.stream:
+        options.append('--stream')
+    return options
+
+
+def resume_command(job: dict, run_dir: Path, options: List[str] = ()) -> str:
+    """`main.py` command line that continues `job` in `run_dir` (with the job_options() of its matrix)."""
+    argv = ['python', 'main.py', '-l', job['llm'], '-e', job['experiment'], '-p', job['problems'], '-r', str(run_dir)]
+    return shlex.join(argv + list(options))
+
+
+def _job_label(job: dict) -> str:
+    return f"#{job['number']} {job['llm']}/{job['experiment']}"
+
+
+async def run_matrix(jobs: List[dict], output_root: str = 'results/', max_files: int = None,
+                     concurrency: int = 1, endpoint_concurrency: int = 1,
+                     response_cache: ResponseCache = None, deadline: float = None,
+                     stream: bool = False, resume_options: List[str] = ()) -> List[dict]:
+    """
+    Run all jobs, with one queue and `endpoint_concurrency` workers per endpoint.
+
+    `deadline` (a time.monotonic() value) bounds the whole matrix: after it, remaining
+    problems are recorded as errors and can be continued with `main.py --resume`.
+    `resume_options` (see job_options()) are added to the command printed for a cancelled job.
+
+    Returns:
+        list: one event dict per job ('finished', 'failed' or 'cancelled')
+    """
+    timestamp = datetime.datetime.now().strftime("%m%d%H%M%S")
+    events = asyncio.Queue()
+
+    queues: Dict[str, asyncio.Queue] = {}
+    for job in jobs:
+        queues.setdefault(endpoint_key(job['llm_config']), asyncio.Queue()).put_nowait(job)
+
+    async def worker(queue: asyncio.Queue):
+        while not queue.empty():
+            job = queue.get_nowait()
+            label = _job_label(job)
+
+            def log(message: str, label=label):
+                print(f"[{label}] {message}")
+
+            await events.put({'event': 'started', 'job': job})
+            start = time.perf_counter()
+            try:
+                summary = await run_experiment(
+                    job['llm'], job['llm_config'], job['experiment'], job['problems'], output_root,
+                    max_files, concurrency, response_cache=response_cache, timestamp=timestamp,
+                    deadline=deadline, stream=stream, log=log
+                )
+                await events.put({'event': 'finished', 'job': job, 'summary': summary,
+                                  'elapsed': time.perf_counter() - start})
+            except asyncio.CancelledError:
+                events.put_nowait({'event': 'cancelled', 'job': job, 'elapsed': time.perf_counter() - start})
+                raise
+            except Exception as e:
+                await events.put({'event': 'failed', 'job': job, 'error': str(e),
+                                  'elapsed': time.perf_counter() - start})
+
+    workers = [
+        asyncio.create_task(worker(queue))
+        for queue in queues.values()
+        for _ in range(endpoint_concurrency)
+    ]
+
+    # Cancel every worker on Ctrl-C / SIGTERM instead of killing processes
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: [w.cancel() for w in workers])
+
+    async def wait_workers():
+        await asyncio.gather(*workers, return_exceptions=True)
+        await events.put(None)
+
+    waiter = asyncio.create_task(wait_workers())
+
+    # Report completion events as they arrive
+    outcomes = []
+    while True:
+        event = await events.get()
+        if event is None:
+            break
+        job = event['job']
+        if event['event'] == 'started':
+            print(f"=== Started {_job_label(job)} ({job['problems']}) ===")
+            continue
+        outcomes.append(event)
+        progress = f"{len(outcomes)}/{len(jobs)}"
+        if event['event'] == 'finished':
+            failed_note = f", {event['summary']['failed']} failed requests" if event['summary']['failed'] else ""
+            print(f"=== Finished {_job_label(job)} in {event['elapsed']:.1f}s{failed_note} [{progress}]: {event['summary']['output_file']} ===")
+        elif event['event'] == 'failed':
+            print(f"=== Failed {_job_label(job)} after {event['elapsed']:.1f}s [{progress}]: {event['error']} ===")
+        else:
+            run_dir = Path(output_root) / timestamp
+            print(f"=== Cancelled {_job_label(job)} [{progress}]; continue with: "
+                  f"{resume_command(job, run_dir, resume_options)} ===")
+    await waiter
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.remove_signal_handler(sig)
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run several LLMs on several problem sets in one process')
+    parser.add_argument('-l', '--llms', nargs='+', required=True, choices=sorted(LLM_MAPPING), help='LLM_MAPPING keys to test')
+    parser.add_argument('-e', '--experiments', nargs='+', default=['100', '24'], help='Experiment types, e.g. 100 24 (default: 100 24)')
+    parser.add_argument('-o', '--output', default='results/', help='Output directory for results')
+    parser.add_argument('-m', '--max-files', type=int, help='Maximum number of files to test per job (for debugging)')
+    parser.add_argument('-c', '--concurrency', type=int, default=1, help='Problems kept in flight per job (default: 1)')
+    parser.add_argument('--endpoint-concurrency', type=int, default=1, help='Jobs run at once per endpoint (default: 1)')
+    parser.add_argument('--key-file', help='File with "llm:api_key" lines; overrides OPENAI_API_KEY per LLM')
+    parser.add_argument('--cache', action='store_true', help='Reuse cached responses for identical requests')
+    parser.add_argument('--cache-dir', default='.llm_cache', help='Directory of the shared response cache (default: .llm_cache)')
+    parser.add_argument('--stream', action='store_true', help='Stream responses and record time-to-first-token and tokens/sec per problem')
+    parser.add_argument('--deadline', type=float, metavar='SECONDS', help='Stop sending requests after this many seconds for the whole matrix')
+
+    args = parser.parse_args()
+    if args.concurrency < 1 or args.endpoint_concurrency < 1:
+        parser.error("--concurrency and --endpoint-concurrency must be at least 1")
+
+    api_keys = load_api_keys(args.key_file) if args.key_file else None
+    jobs = build_jobs(args.llms, args.experiments, api_keys)
+    response_cache = ResponseCache(args.cache_dir) if args.cache else None
+
+    print(f"LLMs: {' '.join(args.llms)}")
+    print(f"Experiments: {' '.join(args.experiments)}")
+    print(f"Total jobs: {len(jobs)} on {len({endpoint_key(job['llm_config']) for job in jobs})} endpoints")
+
+    deadline = time.monotonic() + args.deadline if args.deadline else None
+    outcomes = asyncio.run(run_matrix(jobs, args.output, args.max_files, args.concurrency,
+                                      args.endpoint_concurrency, response_cache, deadline, args.stream,
+                                      job_options(args)))
+
+    counts = {name: sum(1 for o in outcomes if o['event'] == name) for name in ('finished', 'failed', 'cancelled')}
+    print(f"\nAll jobs done: {counts['finished']} finished, {counts['failed']} failed, {counts['cancelled']} cancelled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Automatic scoring of LLM responses against ground truth.
+
+Every result journal (or, for older runs, `*_all_results.yaml`) under a results
+directory is scored: the recommended candidate is extracted from each
+`llm_response` (the `best_candidate` of the Stage 3 JSON block, else the last
+recommendation sentence) and compared with the argmax-EI / argmax-l/g candidate
+computed by reference_solver.py, or listed in the answer key with `--truth answers`.
+Records are scored in chunks over a process pool. Writes next to the results:
+- scores.jsonl: one line per record (status, predicted and expected candidate)
+- accuracy.yaml: accuracy per model (overall and per surrogate) and per problem
+With `--verify` each response's intermediate values are also checked by
+step_verifier.py; scores.jsonl gets the per-step results and the first wrong
+step, accuracy.yaml a per-model histogram of first wrong steps.
+
+Usage:
+    python scoring.py results/
+    python scoring.py results/ --truth answers --workers 8 -o scores/
+    python scoring.py results/ --verify
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+import reference_solver
+import step_verifier
+from result_writer import BLOB_DIR_NAME, JOURNAL_SUFFIX, iter_latest_results, load_results, resolve_blobs
+
+DEFAULT_ANSWERS_DIR = Path(__file__).parent / 'problem_set'
+SCORES_FILE = 'scores.jsonl'
+ACCURACY_FILE = 'accuracy.yaml'
+CHUNK_SIZE = 200
+
+CORRECT = 'correct'
+INCORRECT = 'incorrect'
+UNPARSED = 'unparsed'  # no candidate could be identified in the response
+FAILED = 'failed'  # the request failed, there is no response to score
+NO_GROUND_TRUTH = 'no_ground_truth'  # the problem could not be parsed or solved
+STATUSES = (CORRECT, INCORRECT, UNPARSED, FAILED, NO_GROUND_TRUTH)
+
+BEST_CANDIDATE_PATTERN = re.compile(r'"best_candidate"\s*:\s*')
+RECOMMENDATION_PATTERN = re.compile(r'recommend|select|choose|next (?:trial|candidate|point)|best candidate|argmax',
+                                    re.IGNORECASE)
+CANDIDATE_NUMBER_PATTERN = re.compile(r'\bcandidate\s*#?\s*(\d+)\b', re.IGNORECASE)
+TOKEN_PATTERN = re.compile(r'[A-Za-z][\w\-]*|[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?')
+PROBLEM_FILE_PATTERN = re.compile(r'^(.*)_problem_\d+\.md$')
+
+# Set in each worker by _init_worker
+_answers: Dict[str, Dict[str, str]] = {}
+_truth = 'solver'
+_verify = False
+
+
+def load_answer_keys(paths: List[str]) -> Dict[str, Dict[str, str]]:
+    """
+    Answer keys by problem set prefix, e.g. {'bo_hpo_llm_test_100': {'Q1': ..., ...}}.
+
+    Args:
+        paths: `*_answers.yaml` files or directories searched recursively for them
+    """
+    answers = {}
+    for path in map(Path, paths):
+        files = [path] if path.is_file() else sorted(path.rglob('*_answers.yaml'))
+        for file in files:
+            with open(file, 'r', encoding='utf-8') as f:
+                answers[file.name[:-len('_answers.yaml')]] = yaml.safe_load(f) or {}
+    return answers
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r'[^0-9a-z]', '', text.lower())
+
+
+def _tokens(value: Any, strings: set, numbers: list):
+    """Collect the string and numeric values of an extracted answer."""
+    if isinstance(value, dict):
+        for item in value.values():
+            _tokens(item, strings, numbers)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _tokens(item, strings, numbers)
+    elif isinstance(value, bool) or value is None:
+        return
+    elif isinstance(value, (int, float)):
+        numbers.append(float(value))
+    else:
+        for token in TOKEN_PATTERN.findall(str(value)):
+            if token[0].isalpha():
+                strings.add(_normalize(token))
+            else:
+                numbers.append(float(token))
+
+
+def match_candidate(answer: Any, candidates: List[Dict[str, Any]]) -> Optional[int]:
+    """
+    Index of the only candidate whose every value appears in `answer`.
+
+    Categorical values are compared case- and punctuation-insensitively, numbers
+    with a relative tolerance of 1e-3 (responses round to 3 decimals).
+    """
+    strings, numbers = set(), []
+    _tokens(answer, strings, numbers)
+
+    def present(value):
+        if isinstance(value, str):
+            return _normalize(value) in strings
+        return any(math.isclose(value, number, rel_tol=1e-3, abs_tol=1e-9) for number in numbers)
+
+    matches = [i for i, candidate in enumerate(candidates) if all(present(v) for v in candidate.values())]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _best_candidate_values(response: str) -> Iterator[Any]:
+    """`best_candidate` values of the JSON blocks in a response, last first."""
+    decoder = json.JSONDecoder()
+    for match in reversed(list(BEST_CANDIDATE_PATTERN.finditer(response))):
+        try:
+            yield decoder.raw_decode(response, match.end())[0]
+        except json.JSONDecodeError:
+            continue
+
+
+def extract_recommendation(response: str, candidates: List[Dict[str, Any]]) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Candidate index recommended by a response.
+
+    Tries the Stage 3 `best_candidate`, then the last lines that mention a
+    recommendation, then a `Candidate N` reference (1-based).
+
+    Returns:
+        tuple: (candidate index or None, how it was found: 'json', 'text', 'number' or None)
+    """
+    for value in _best_candidate_values(response):
+        index = match_candidate(value, candidates)
+        if index is not None:
+            return index, 'json'
+
+    lines = [line for line in response.splitlines() if RECOMMENDATION_PATTERN.search(line)]
+    for line in reversed(lines):
+        index = match_candidate(line, candidates)
+        if index is not None:
+            return index, 'text'
+
+    for line in reversed(lines or response.splitlines()):
+        match = CANDIDATE_NUMBER_PATTERN.search(line)
+        if match and 1 <= int(match.group(1)) <= len(candidates):
+            return int(match.group(1)) - 1, 'number'
+    return None, None
+
+
+def problem_set_name(problem_file: str) -> str:
+    """Problem set prefix of a problem file name (the key of its answer key in load_answer_keys)."""
+    match = PROBLEM_FILE_PATTERN.match(problem_file or '')
+    return match.group(1) if match else ''
+
+
+def _init_worker(answers: Dict[str, Dict[str, str]], truth: str, verify: bool = False):
+    global _answers, _truth, _verify
+    _answers, _truth, _verify = answers, truth, verify
+
+
+def _expected_index(problem: Dict[str, Any], solved: Dict[str, Any], answer: str) -> int:
+    if _truth == 'answers':
+        values = reference_solver.answer_key_values(answer, problem['surrogate'])
+        if len(values) == len(problem['candidates']):
+            return max(range(len(values)), key=values.__getitem__)
+    return solved['recommended']
+
+
+def parse_scored_problem(content: str, introduction: str, answer_key: Dict[str, str]) -> Optional[tuple]:
+    """
+    (problem, answer key entry) of a problem text, or None if it cannot be parsed.
+
+    Args:
+        content: Problem markdown
+        introduction: Introduction of its problem set
+        answer_key: Answer key of its problem set (see load_answer_keys), for GP kernels stated per answer
+    """
+    try:
+        match = reference_solver.HEADER_PATTERN.search(content)
+        answer = answer_key.get(f"Q{match.group(1)}", '') if match else ''
+        problem = reference_solver.parse_problem(content, introduction, answer)
+        return (problem, answer) if problem else None
+    except (ValueError, AttributeError, IndexError, KeyError):
+        return None
+
+
+def solve_parsed(problems: Dict[Any, Optional[tuple]], predictive_noise: bool = True) -> Dict[Any, Dict[str, Any]]:
+    """
+    Solver results of parse_scored_problem() entries in one batch.
+
+    Problems the solver rejects (e.g. an unknown categorical value) are left out.
+    """
+    parsed = [key for key, value in problems.items() if value is not None]
+    try:
+        return dict(zip(parsed, reference_solver.solve_problems([problems[key][0] for key in parsed],
+                                                                predictive_noise)))
+    except (ValueError, KeyError):  # fall back to one problem at a time
+        solved = {}
+        for key in parsed:
+            try:
+                solved[key] = reference_solver.solve_problems([problems[key][0]], predictive_noise)[0]
+            except (ValueError, KeyError):
+                pass
+        return solved
+
+
+def score_chunk(blob_dir: Optional[str], records: List[Tuple[str, int, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Score (source, index, record) triples from one run directory (runs in a worker process).
+
+    The chunk's distinct problems are parsed once and solved in one batch (GP problems
+    a second time with the latent σ(x) when verifying, as the system prompt defines it).
+    """
+    problems, keys, scores = {}, [], []
+    for source, index, record in records:
+        if blob_dir:
+            record = resolve_blobs(record, Path(blob_dir))
+        content = record.get('file_content') or ''
+        answer_key = _answers.get(problem_set_name(record.get('problem_file')), {})
+        key = (content, record.get('introduction') or '')
+        if key not in problems:
+            problems[key] = parse_scored_problem(content, key[1], answer_key)
+        keys.append(key)
+        scores.append({
+            'source': source,
+            'index': index,
+            'problem_file': record.get('problem_file'),
+            'llm_name': record.get('llm_name'),
+            'response': record.get('llm_response'),
+            'failed': bool(record.get('error')) or not record.get('llm_response'),
+        })
+
+    solved = solve_parsed(problems)
+    latent = {}
+    if _verify:
+        latent = solve_parsed({key: problems[key] for key in solved
+                               if problems[key][0]['surrogate'] == reference_solver.GP}, predictive_noise=False)
+
+    for key, score in zip(keys, scores):
+        response = score.pop('response')
+        entry = problems.get(key)
+        if entry is None or key not in solved:
+            score.update(problem_id=None, surrogate=None, status=NO_GROUND_TRUTH)
+            continue
+        problem, answer = entry
+        candidates = [reference_solver.candidate_values(problem, i) for i in range(len(problem['candidates']))]
+        expected = _expected_index(problem, solved[key], answer)
+        score.update(problem_id=problem['id'], surrogate=problem['surrogate'], expected=expected,
+                     expected_candidate=candidates[expected])
+        if score.pop('failed'):
+            score['status'] = FAILED
+            continue
+        predicted, method = extract_recommendation(response, candidates)
+        score.update(predicted=predicted, extraction=method,
+                     predicted_candidate=candidates[predicted] if predicted is not None else None)
+        score['status'] = UNPARSED if predicted is None else CORRECT if predicted == expected else INCORRECT
+        if _verify:
+            solutions = [solved[key]] + ([latent[key]] if key in latent else [])
+            verification = step_verifier.verify_response(response, problem, solutions, predicted, expected)
+            first_error = verification['first_error']
+            score.update(verification=verification['steps'], first_error=first_error,
+                         first_error_step=first_error['step'] if first_error else None)
+    for score in scores:
+        score.pop('failed', None)
+    return scores
+
+
+def iter_chunks(results_dir: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple]:
+    """
+    (blob_dir, records) chunks of every run under `results_dir`.
+
+    Journals are read record by record; a run directory without a journal is read from its `*_all_results.yaml`.
+    """
+    journals = sorted(results_dir.rglob(f'*{JOURNAL_SUFFIX}'))
+    journal_dirs = {journal.parent for journal in journals}
+    sources = [(journal, iter_latest_results(journal)) for journal in journals]
+    for yaml_file in sorted(results_dir.rglob('*_all_results.yaml')):
+        if yaml_file.parent not in journal_dirs:
+            sources.append((yaml_file, enumerate(load_results(yaml_file))))
+
+    for path, records in sources:
+        blob_dir = path.parent / BLOB_DIR_NAME
+        blob_dir = str(blob_dir) if blob_dir.is_dir() else None
+        source = str(path.relative_to(results_dir))
+        chunk = []
+        for index, record in records:
+            chunk.append((source, index, record))
+            if len(chunk) >= chunk_size:
+                yield blob_dir, chunk
+                chunk = []
+        if chunk:
+            yield blob_dir, chunk
+
+
+def _accuracy(counts: Dict[str, int]) -> Dict[str, Any]:
+    scored = counts[CORRECT] + counts[INCORRECT] + counts[UNPARSED]
+    summary = {'scored': scored, 'accuracy': round(counts[CORRECT] / scored, 4) if scored else None}
+    summary.update({status: counts[status] for status in STATUSES})
+    return summary
+
+
+def summarize_scores(scores: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Accuracy per model (overall and per surrogate) and per problem (overall and per model).
+
+    Verified scores (with a `verification` entry) also give each model a histogram of
+    the step where the response first went wrong (`none` when every checked step passed,
+    `unchecked` when the response had no values to check).
+    """
+    first_errors = defaultdict(lambda: defaultdict(int))
+    by_model, by_model_surrogate = defaultdict(lambda: defaultdict(int)), defaultdict(lambda: defaultdict(int))
+    by_problem, by_problem_model = defaultdict(lambda: defaultdict(int)), defaultdict(lambda: defaultdict(int))
+    for score in scores:
+        model, status = score['llm_name'], score['status']
+        by_model[model][status] += 1
+        if score['surrogate']:
+            by_model_surrogate[(model, score['surrogate'])][status] += 1
+        problem = f"{problem_set_name(score['problem_file'])}:{score['problem_id'] or score['problem_file']}"
+        by_problem[problem][status] += 1
+        by_problem_model[(problem, model)][status] += 1
+        if score.get('first_error_step'):
+            first_errors[model][score['first_error_step']] += 1
+
+    models = {}
+    for model in sorted(by_model, key=str):
+        models[model] = _accuracy(by_model[model])
+        models[model]['by_surrogate'] = {surrogate: _accuracy(counts)
+                                         for (name, surrogate), counts in sorted(by_model_surrogate.items())
+                                         if name == model}
+        if model in first_errors:
+            models[model]['first_error_steps'] = dict(sorted(first_errors[model].items(),
+                                                             key=lambda item: (-item[1], item[0])))
+    problems = {}
+    for problem in sorted(by_problem, key=lambda name: (name.split(':')[0], len(name), name)):
+        problems[problem] = _accuracy(by_problem[problem])
+        problems[problem]['by_model'] = {model: _accuracy(counts)['accuracy']
+                                         for (name, model), counts in sorted(by_problem_model.items(), key=str)
+                                         if name == problem}
+    return {'records': len(scores), 'per_model': models, 'per_problem': problems}
+
+
+def score_results(results_dir: str, output_dir: str = None, answer_paths: List[str] = None, truth: str = 'solver',
+                  workers: int = None, verify: bool = False, log=print) -> Tuple[Path, Dict[str, Any]]:
+    """
+    Score every run under `results_dir` and write scores.jsonl and accuracy.yaml.
+
+    Args:
+        results_dir: Directory searched recursively for result journals / YAML files
+        output_dir: Where to write the files (defaults to `results_dir`)
+        answer_paths: Answer key files or directories (GP kernels of the 24-problem set and `--truth answers`)
+        truth: 'solver' (reference_solver.py) or 'answers' (answer key values, solver where the key has none)
+        workers: Worker processes (defaults to the CPU count)
+        verify: Also check each response's intermediate values (see step_verifier.py)
+
+    Returns:
+        tuple: (accuracy file, accuracy summary)
+    """
+    results_dir = Path(results_dir)
+    output_dir = Path(output_dir) if output_dir else results_dir
+    output_dir.mkdir(parents=True, exist_ok=True)
+    answers = load_answer_keys(answer_paths or [str(DEFAULT_ANSWERS_DIR)])
+
+    start = time.time()
+    scores = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                             initargs=(answers, truth, verify)) as executor:
+        futures = [executor.submit(score_chunk, blob_dir, chunk) for blob_dir, chunk in iter_chunks(results_dir)]
+        with open(output_dir / SCORES_FILE, 'w', encoding='utf-8') as f:
+            for future in futures:
+                for score in future.result():
+                    f.write(json.dumps(score, ensure_ascii=False) + '\n')
+                    summary_fields = {key: score.get(key) for key in
+                                      ('llm_name', 'problem_file', 'problem_id', 'surrogate', 'status')}
+                    if 'verification' in score:
+                        summary_fields['first_error_step'] = (score['first_error_step'] or
+                                                              ('none' if score['verification'] else 'unchecked'))
+                    scores.append(summary_fields)
+
+    summary = summarize_scores(scores)
+    summary['truth'] = truth
+    summary['verified'] = verify
+    summary['scoring_time'] = round(time.time() - start, 3)
+    accuracy_file = output_dir / ACCURACY_FILE
+    with open(accuracy_file, 'w', encoding='utf-8') as f:
+        yaml.dump(summary, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+    log(f"Scored {len(scores)} records in {summary['scoring_time']:.2f}s")
+    return accuracy_file, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score LLM responses against reference-solver or answer-key ground truth')
+    parser.add_argument('results_dir', help='Results directory (searched recursively for runs)')
+    parser.add_argument('-o', '--output-dir', help='Where to write scores.jsonl and accuracy.yaml (default: results_dir)')
+    parser.add_argument('--answers', nargs='+',
+                        help=f'Answer key files or directories (default: {DEFAULT_ANSWERS_DIR.name}/)')
+    parser.add_argument('--truth', choices=['solver', 'answers'], default='solver',
+                        help='Ground truth: reference solver, or answer key values where listed (default: solver)')
+    parser.add_argument('-w', '--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--verify', action='store_true',
+                        help='Also check intermediate values step by step and report the first wrong step')
+    args = parser.parse_args()
+
+    accuracy_file, summary = score_results(args.results_dir, args.output_dir, args.answers, args.truth, args.workers,
+                                           args.verify)
+    print(f"{'model':<30} {'scored':>7} {'correct':>8} {'accuracy':>9} {'unparsed':>9} {'failed':>7}")
+    for model, stats in summary['per_model'].items():
+        accuracy = f"{stats['accuracy']:.1%}" if stats['accuracy'] is not None else '-'
+        print(f"{str(model):<30} {stats['scored']:>7} {stats[CORRECT]:>8} {accuracy:>9} "
+              f"{stats[UNPARSED]:>9} {stats[FAILED]:>7}")
+    if args.verify:
+        for model, stats in summary['per_model'].items():
+            steps = ', '.join(f'{step}: {count}' for step, count in stats.get('first_error_steps', {}).items())
+            print(f"{str(model):<30} first wrong step: {steps or '-'}")
+    print(f"Scores written to: {accuracy_file.parent / SCORES_FILE}")
+    print(f"Accuracy written to: {accuracy_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from llm_configs import LLM_MAPPING
 from llm_tester import LLMTester
-from openai import OpenAI, NOT_GIVEN
+from client_pool import client_pool
+from openai import NOT_GIVEN
 
 def simple_query_by_LLMTester(prompt: str, system_prompt: str = None, llm_name: str = "gemini"):
     """
@@ -47,11 +48,8 @@ def simple_query(prompt: str, system_prompt: str = None, llm_name: str = "gemini
     if system_prompt is None:
         system_prompt = "You are a helpful AI assistant. Please provide clear and concise responses."
     
-    # Use OpenAI SDK directly for testing
-    client = OpenAI(
-        base_url=llm_config['base_url'],
-        api_key=llm_config['api_key']
-    )
+    # Use OpenAI SDK directly for testing (shared pooled client, so repeated queries reuse connections)
+    client = client_pool.openai_client(llm_config['base_url'], llm_config['api_key'])
     response = client.chat.completions.create(
         model=llm_config['model'],
         messages=[
@@ -0,0 +1,433 @@
+"""
+Step-level numeric verification of LLM derivations.
+
+The system prompt asks for the intermediate values of the computation (kernel
+matrix, α, μ, σ, z, Φ(z), φ(z), EI for GP; P(value|good/bad), per-dimension
+densities, l(x), g(x), l/g for TPE). verify_response pulls those labelled values
+out of a response (`μ = 0.549`, `EI(0.2) ≈ 0.0386`, LaTeX, `K = [[...]]` or
+bmatrix matrices and markdown tables) and checks them, step by step in the order
+of the derivation, against the reference solver's values. Per-candidate values
+(μ, σ, z, Φ, φ, EI; densities, l(x), g(x), l/g) are tied to the candidate they
+belong to and checked against that candidate's reference only: a label argument
+(`EI(0.2)`), else a candidate named at the start of the line or table row (`x=0.20:`,
+`(SGD, lr=0.20):`, `Candidate 2`), else the last candidate named on an earlier
+line, else the order the values appear in (i-th value -> i-th candidate, when
+every candidate gets the same number of values). Only values that none of these
+ties to a candidate are accepted for any candidate. The first step with a value
+that fails is reported.
+
+Used by `scoring.py --verify`.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import reference_solver
+
+DEFAULT_RTOL = 0.02
+DEFAULT_ATOL = 0.0015  # responses round to 3 decimals
+
+_NUMBER = r'[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?'
+NUMBER_PATTERN = re.compile(_NUMBER)
+LEADING_NUMBER_PATTERN = re.compile(rf'\s*({_NUMBER})(?!\.?\d)\s*(.*)$', re.DOTALL)
+OPERATORS = '-+*/×·^('
+CLAUSE_SPLIT_PATTERN = re.compile(r'[,;⇒→]')
+SEGMENT_SPLIT_PATTERN = re.compile(r'[=≈:]')
+_SQUARED = r'(?:²|\^2|\^\{2\})'
+
+KERNEL_LABELS = {
+    'lengthscale': r'ℓ|\\ell|length[- ]?scale',
+    'signal_var': rf'σ_f{_SQUARED}|\\sigma_f{_SQUARED}|signal variance',
+    'noise': rf'σ_n{_SQUARED}|\\sigma_n{_SQUARED}|noise variance',
+}
+# Labels of each step, in derivation order
+GP_STEPS = {
+    'K': r'(?<![\w\\])K(?:_y|_\{y\})?(?![⁻^\w])',
+    'alpha': r'α|\\alpha\b|\balpha\b',
+    'mu': r'μ|\\mu\b|\bmu\b',
+    'sigma': r'(?:σ|\\sigma\b|\bsigma\b)(?![_²^])',
+    'z': r'(?<![\w\\])z(?!\w)',
+    'Phi': r'(?:Φ|\\Phi)(?:\(z\))?',
+    'phi': r'(?:[φϕ]|\\(?:var)?phi)(?:\(z\))?',
+    'EI': r'\bEI\b|expected improvement',
+}
+TPE_STEPS = {
+    'p_good': r'P\([^|()]*\|\s*good\)',
+    'p_bad': r'P\([^|()]*\|\s*bad\)',
+    'l_dim': r'(?:\bl|ℓ|\\ell)_(?!x\b|\{x\})\{?\w+\}?',
+    'g_dim': r'\bg_(?!x\b|\{x\})\{?\w+\}?',
+    'l_x': r'(?:\bl|ℓ|\\ell)(?:\(x\)|_x\b|_\{x\})',
+    'g_x': r'\bg(?:\(x\)|_x\b|_\{x\})',
+    'ratio': r'(?:\bl|ℓ|\\ell)(?:\(x\))?\s*/\s*g(?:\(x\))?|\bl_over_g\b',
+}
+MATRIX_STEPS = ('K', 'alpha')  # steps reported as vectors / matrices
+# Per-candidate steps whose values, when nothing names their candidate, follow the candidate order
+ORDERED_STEPS = ('mu', 'sigma', 'z', 'Phi', 'phi', 'EI', 'l_x', 'g_x', 'ratio')
+CHOICE = 'choice'
+ORDINAL_PATTERN = re.compile(r'\b(?:candidate|cand\.?)\s*#?\s*(\d+)(?![.\d])|(?<![\w.])(?:C|#)(\d+)\b', re.IGNORECASE)
+SECTION_PATTERN = re.compile(r'^\s*(?:#+|\d+[.)])\s')  # a heading or numbered step ends the last candidate's lines
+LIST_MARKER_PATTERN = re.compile(r'^[\s>|]*(?:(?:[-*•]|\d+[.)])\s+)?')
+WORD_PATTERN = re.compile(r'[^\W\d][\w-]*')
+NAMED_NUMBER_PATTERN = re.compile(rf'([^\W\d]\w*)\s*=\s*({_NUMBER})')
+LABEL_KEY_PATTERN = re.compile(r'P\(([^|()]*)\||_\{?(\w+)\}?')  # `P(SGD|good)` -> SGD, `l_{lr}` -> lr
+
+_REPLACEMENTS = (('\\approx', '≈'), ('\\left', ''), ('\\right', ''), ('**', ''), ('$', ''), ('\\,', ' '),
+                 ('\\;', ' '), ('\\!', ''), ('\\cdot', '·'), ('\\times', '×'), ('−', '-'), ('`', ''))
+
+
+def _normalize(text: str) -> str:
+    for old, new in _REPLACEMENTS:
+        text = text.replace(old, new)
+    return text
+
+
+def _compile(labels: Dict[str, str]) -> Dict[str, re.Pattern]:
+    return {step: re.compile(pattern, re.IGNORECASE if step in ('EI', 'lengthscale', 'signal_var', 'noise') else 0)
+            for step, pattern in labels.items()}
+
+
+def _any_label(patterns: Dict[str, re.Pattern]) -> re.Pattern:
+    """One pattern for `segment ends with some label`; most segments have none and are skipped in one search."""
+    alternatives = '|'.join(f"(?{'i' if pattern.flags & re.IGNORECASE else ''}:{pattern.pattern})"
+                            for pattern in patterns.values())
+    return re.compile(f'(?:{alternatives}){LABEL_TAIL}')
+
+
+LABEL_TAIL = r'\s*(?:\([^()]*\))?\s*(?:\[[^\]]*\])?\s*$'  # a trailing `(x)` / `[i]` argument
+_PATTERNS = {
+    reference_solver.GP: _compile(GP_STEPS),
+    reference_solver.TPE: _compile(TPE_STEPS),
+    'kernel': _compile(KERNEL_LABELS),
+}
+# Scalar steps (matrices are read by _matrix_values) and their combined label patterns
+_SCALAR_PATTERNS = {name: {step: pattern for step, pattern in patterns.items() if step not in MATRIX_STEPS}
+                    for name, patterns in _PATTERNS.items()}
+_ANY_LABEL = {name: _any_label(patterns) for name, patterns in _SCALAR_PATTERNS.items()}
+_ANY_LABEL_ANYWHERE = {name: re.compile(pattern.pattern[:-len(LABEL_TAIL)]) for name, pattern in _ANY_LABEL.items()}
+_LABEL_TAIL_PATTERN = re.compile(LABEL_TAIL)
+
+
+class CandidateLocator:
+    def __init__(self, problem: Dict[str, Any]):
+        """Finds which candidate of `problem` a piece of text (line start, table row, label argument) names."""
+        self.candidates = [reference_solver.candidate_values(problem, i) for i in range(len(problem['candidates']))]
+        self.signatures = [([value for value in values.values() if not isinstance(value, str)],
+                            {value.lower() for value in values.values() if isinstance(value, str)})
+                           for values in self.candidates]
+        # Identical candidates have identical reference values: text naming one names the first of them
+        self.first = [self.candidates.index(values) for values in self.candidates]
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def find(self, text: str) -> Optional[int]:
+        """
+        Index of the one candidate `text` names, or None.
+
+        By ordinal (`Candidate 2`, `C2`, `#2`), by hyperparameter names (`lr=0.2`
+        picks the only candidate with that lr), or by all of a candidate's values
+        (numbers exactly, categories as words) appearing in `text`.
+        """
+        if not text.strip():
+            return None
+        ordinal = ORDINAL_PATTERN.search(text)
+        if ordinal:
+            number = int(ordinal.group(1) or ordinal.group(2))
+            if 1 <= number <= len(self.candidates):
+                return number - 1
+        text = LIST_MARKER_PATTERN.sub('', text, count=1)
+
+        named = [(name, float(number)) for name, number in NAMED_NUMBER_PATTERN.findall(text)]
+        named = [(name, number) for name, number in named if name in self.candidates[0]]
+        if named:
+            matches = {self.first[i] for i, values in enumerate(self.candidates)
+                       if all(_same(values[name], number) for name, number in named)}
+            if len(matches) == 1:
+                return matches.pop()
+
+        numbers = [float(number) for number in NUMBER_PATTERN.findall(text)]
+        words = {word.lower() for word in WORD_PATTERN.findall(text)}
+        sizes = {i: len(values) + len(categories) for i, (values, categories) in enumerate(self.signatures)
+                 if (values or categories) and categories <= words
+                 and all(any(_same(value, number) for number in numbers) for value in values)}
+        if not sizes:
+            return None
+        largest = max(sizes.values())
+        matches = {self.first[i] for i, size in sizes.items() if size == largest}
+        return matches.pop() if len(matches) == 1 else None
+
+
+def _same(value: float, number: float) -> bool:
+    """Whether a number written in the text is a candidate's value (as written in the problem)."""
+    return abs(value - number) <= 1e-9 * max(1.0, abs(value))
+
+
+def _first_label(line: str, labels: str) -> int:
+    """Position of the first step label of `labels` in `line` (len(line) if none)."""
+    if not _ANY_LABEL_ANYWHERE[labels].search(line):
+        return len(line)
+    return min((match.start() for pattern in _SCALAR_PATTERNS[labels].values() for match in pattern.finditer(line)),
+               default=len(line))
+
+
+def _label_key(label: str) -> Optional[str]:
+    """What a label names besides its step: the value of `P(SGD|good)` or the dimension of `l_{lr}`, lowercased."""
+    match = LABEL_KEY_PATTERN.search(label)
+    if not match:
+        return None
+    return (match.group(1) or match.group(2) or '').strip().lower() or None
+
+
+def _label_at_end(segment: str, labels: str) -> Optional[Tuple[str, str]]:
+    """
+    Scalar step of `labels` whose label ends `segment` (allowing a trailing argument) and
+    starts a term, with the label text (including the argument).
+    """
+    if not _ANY_LABEL[labels].search(segment):
+        return None
+    best = None
+    for step, pattern in _SCALAR_PATTERNS[labels].items():
+        for match in pattern.finditer(segment):
+            if not _LABEL_TAIL_PATTERN.match(segment, match.end()):
+                continue
+            head = segment[:match.start()].rstrip()
+            if head and head[-1] in OPERATORS:
+                continue
+            if best is None or match.start() > best[0]:
+                best = (match.start(), step)
+    return (best[1], segment[best[0]:].strip()) if best else None
+
+
+def _argument(label: str) -> str:
+    """Trailing `(...)` / `[...]` argument of a label (`EI(0.2)` -> `0.2`)."""
+    match = re.search(r'[(\[]([^()\[\]]*)[)\]]\s*$', label)
+    return match.group(1) if match else ''
+
+
+def _clause_values(text: str, labels: str, locator: Optional[CandidateLocator] = None) -> Dict[str, List[tuple]]:
+    """
+    Scalar `label = value` assignments, clause by clause, as (value, candidate, key).
+
+    A clause is split at `=`, `≈` and `:`; a label ending one segment takes the
+    first later segment that starts with a plain number (so `z = (f*-μ)/σ = -0.538`
+    gives z = -0.538 and no value for μ or σ, which appear inside the formula).
+    The candidate is the one the label argument names, else the one named at the
+    start of the line (before its first label), else the last one named on an
+    earlier line of the same section (None without a locator or if none was named).
+    """
+    values = {}
+    current = None
+    for line in text.splitlines():
+        if line.lstrip().startswith('|'):
+            continue  # tables are read by _table_values
+        if locator is not None:
+            named = locator.find(line[:_first_label(line, labels)])
+            if named is not None or SECTION_PATTERN.match(line):
+                current = named
+        for clause in CLAUSE_SPLIT_PATTERN.split(line):
+            segments = SEGMENT_SPLIT_PATTERN.split(clause.strip().lstrip('-*•').strip())
+            for i, segment in enumerate(segments[:-1]):
+                labelled = _label_at_end(segment, labels)
+                if labelled is None:
+                    continue
+                step, label = labelled
+                for following in segments[i + 1:]:
+                    match = LEADING_NUMBER_PATTERN.match(following)
+                    rest = match.group(2).lstrip() if match else ''
+                    if match and not (rest and rest[0] in OPERATORS):
+                        argument = locator.find(_argument(label)) if locator is not None else None
+                        candidate = argument if argument is not None else current
+                        values.setdefault(step, []).append((float(match.group(1)), candidate, _label_key(label)))
+                        break
+    return values
+
+
+def _table_values(text: str, labels: str, locator: Optional[CandidateLocator] = None) -> Dict[str, List[tuple]]:
+    """
+    Numeric cells of markdown table columns whose header is a step label, as (value, candidate, key).
+
+    The candidate of a row is the one its other cells name (None if they name none).
+    """
+    values = {}
+    columns = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith('|'):
+            columns = None
+            continue
+        cells = [cell.strip() for cell in line.strip('|').split('|')]
+        if all(re.fullmatch(r':?-{2,}:?', cell) for cell in cells if cell):
+            continue
+        if columns is None:
+            columns = [_label_at_end(cell, labels) if cell else None for cell in cells]
+            continue
+        row = ' | '.join(cell for column, cell in zip(columns, cells) if column is None)
+        candidate = locator.find(row) if locator is not None else None
+        for column, cell in zip(columns, cells):
+            match = LEADING_NUMBER_PATTERN.match(cell)
+            if column and match:
+                step, label = column
+                values.setdefault(step, []).append((float(match.group(1)), candidate, _label_key(label)))
+    return values
+
+
+def _matrix_values(text: str, patterns: Dict[str, re.Pattern]) -> Dict[str, List[tuple]]:
+    """Entries of `K = [[...]]`, `α = [...]` and `K = \\begin{bmatrix}...\\end{bmatrix}`."""
+    values = {}
+    for step in MATRIX_STEPS:
+        if step not in patterns:
+            continue
+        label = patterns[step].pattern
+        matrix = re.compile(rf'(?:{label})[^=≈:\n]{{0,30}}[=≈:]\s*'
+                            rf'(\[[\[\]\d\s.,eE+\-]*\]|\\begin\{{[bpv]?matrix\}}.*?\\end\{{[bpv]?matrix\}})', re.DOTALL)
+        for match in matrix.finditer(text):
+            body = re.sub(r'\\(?:begin|end)\{[bpv]?matrix\}', ' ', match.group(1))
+            values.setdefault(step, []).extend((float(number), None, None) for number in NUMBER_PATTERN.findall(body))
+    return values
+
+
+def extract_values(response: str, problem: Dict[str, Any]) -> Dict[str, List[tuple]]:
+    """
+    Labelled numeric values of each step (plus kernel hyperparameters for GP) found in a response.
+
+    Returns:
+        dict: step -> list of (value, candidate index or None, label key or None) in order of appearance
+    """
+    surrogate = problem['surrogate']
+    locator = CandidateLocator(problem)
+    text = _normalize(response)
+    found = _matrix_values(text, _PATTERNS[surrogate])
+    for values in (_clause_values(text, surrogate, locator), _table_values(text, surrogate, locator)):
+        for step, numbers in values.items():
+            found.setdefault(step, []).extend(numbers)
+    if surrogate == reference_solver.GP:
+        for step, numbers in _clause_values(text, 'kernel').items():
+            found[step] = numbers
+    return found
+
+
+def reference_values(problem: Dict[str, Any], solutions: List[Dict[str, Any]]) -> Dict[tuple, np.ndarray]:
+    """
+    Accepted values per (step, candidate, key).
+
+    The candidate is an index for per-candidate values and None for values of the
+    whole problem or of any candidate; the key is a dimension or category value
+    (lowercased) for TPE probabilities and densities, else None.
+
+    Args:
+        problem: Parsed problem (see reference_solver.parse_problem)
+        solutions: Its solver results; for GP both σ conventions (with and without noise)
+    """
+    expected = {}
+
+    def add(step, numbers, candidate=None, key=None):
+        entry = (step, candidate, key)
+        expected[entry] = np.concatenate([expected.get(entry, np.empty(0)), np.ravel(np.asarray(numbers, dtype=float))])
+        if candidate is not None or key is not None:
+            add(step, numbers)
+
+    if problem['surrogate'] == reference_solver.GP:
+        kernel = problem['kernel']
+        add('lengthscale', [kernel['lengthscale']])
+        add('signal_var', [kernel['signal_var']])
+        add('noise', [kernel['noise'], kernel['noise'] ** 2])
+        for solution in solutions:
+            K = np.asarray(solution['K'])
+            add('K', K)
+            add('K', K - np.eye(len(K)) * kernel['noise'] ** 2)  # K without the noise diagonal
+            add('alpha', solution['alpha'])
+            for step in ORDERED_STEPS[:6]:
+                for i, value in enumerate(solution[step]):
+                    add(step, [value], i)
+        return expected
+
+    for solution in solutions:
+        for split in ('good', 'bad'):
+            for probs in solution['categoricals'][f'{split}_probs'].values():
+                for value, p in probs.items():
+                    add(f'p_{split}', [p], key=value.lower())
+        for i, candidate in enumerate(solution['candidates']):
+            for key, value in candidate.items():
+                probability = re.fullmatch(r'P\((.*)\|(good|bad)\)', key)
+                if probability:
+                    add(f'p_{probability.group(2)}', [value], i)
+                    add(f'p_{probability.group(2)}', [value], i, probability.group(1).lower())
+                elif key.startswith(('l_', 'g_')) and key not in ('l_x', 'g_x'):
+                    add(f'{key[0]}_dim', [value], i)
+                    add(f'{key[0]}_dim', [value], i, key[2:].lower())
+            for step in ('l_x', 'g_x', 'ratio'):
+                add(step, [candidate[step]], i)
+    return expected
+
+
+def _accepted(expected: Dict[tuple, np.ndarray], step: str, candidate: Optional[int], key: Optional[str]) -> np.ndarray:
+    """Most specific reference values for a value of `step` tied to `candidate` and `key`."""
+    for entry in ((step, candidate, key), (step, None, key), (step, candidate, None), (step, None, None)):
+        if entry in expected:
+            return expected[entry]
+    return np.empty(0)
+
+
+def _order_candidates(values: List[tuple], candidates: int) -> List[tuple]:
+    """Tie the values no candidate was named for to candidates by order, if each candidate gets as many."""
+    untied = [i for i, (_, candidate, _) in enumerate(values) if candidate is None]
+    if not untied or not candidates or len(untied) % candidates:
+        return values
+    values = list(values)
+    for position, i in enumerate(untied):
+        value, _, key = values[i]
+        values[i] = (value, position % candidates, key)
+    return values
+
+
+def verify_response(response: str, problem: Dict[str, Any], solutions: List[Dict[str, Any]],
+                    predicted: Optional[int] = None, expected: Optional[int] = None,
+                    rtol: float = DEFAULT_RTOL, atol: float = DEFAULT_ATOL) -> Dict[str, Any]:
+    """
+    Check a response's intermediate values step by step.
+
+    Args:
+        response: LLM response text
+        problem: Parsed problem (see reference_solver.parse_problem)
+        solutions: Solver results for the problem (see reference_values)
+        predicted: Candidate index extracted from the response (checked as the last step)
+        expected: Reference candidate index
+        rtol, atol: A value passes when |value - reference| <= max(atol, rtol * |reference|)
+            for some reference value of the step (of the value's candidate, see the module docstring)
+
+    Returns:
+        dict: steps (step -> values checked / passed) and first_error (step, value, closest
+        reference value, candidate the value was tied to) or None
+    """
+    surrogate = problem['surrogate']
+    found = extract_values(response, problem)
+    expected_values = reference_values(problem, solutions)
+    order = (list(KERNEL_LABELS) if surrogate == reference_solver.GP else []) + list(_PATTERNS[surrogate])
+
+    steps, first_error = {}, None
+    for step in order:
+        values = found.get(step, [])
+        if step in ORDERED_STEPS:
+            values = _order_candidates(values, len(problem['candidates']))
+        checked = passed = 0
+        for value, candidate, key in values:
+            reference = _accepted(expected_values, step, candidate, key)
+            if reference.size == 0:
+                continue
+            difference = np.abs(value - reference)
+            checked += 1
+            if (difference <= np.maximum(atol, rtol * np.abs(reference))).any():
+                passed += 1
+            elif first_error is None:
+                first_error = {'step': step, 'value': value, 'closest': float(reference[np.argmin(difference)]),
+                               'candidate': candidate}
+        if checked:
+            steps[step] = {'checked': checked, 'passed': passed}
+
+    if predicted is not None and expected is not None:
+        steps[CHOICE] = {'checked': 1, 'passed': int(predicted == expected)}
+        if first_error is None and predicted != expected:
+            first_error = {'step': CHOICE, 'value': predicted, 'closest': expected}
+    return {'steps': steps, 'first_error': first_error}
@@ -0,0 +1,56 @@
+import time
+from typing import Optional
+
+
+class StreamTimer:
+    def __init__(self):
+        """
+        Timestamps of the chunks of one streamed response.
+
+        Start it right before the request is sent and call mark() for every chunk
+        that carries output (answer text or reasoning).
+        """
+        self.start = time.perf_counter()
+        self.first = None
+        self.last = None
+        self.chunks = 0
+        self.max_gap = 0.0
+
+    def mark(self):
+        """Record the arrival of an output chunk."""
+        now = time.perf_counter()
+        if self.first is None:
+            self.first = now
+        else:
+            self.max_gap = max(self.max_gap, now - self.last)
+        self.last = now
+        self.chunks += 1
+
+    def stats(self, output_tokens: Optional[int]) -> dict:
+        """
+        Latency figures of the finished stream.
+
+        Args:
+            output_tokens: Output tokens reported by the provider (or an estimate)
+
+        Returns:
+            dict: ttft (time to first token), total_time, chunks, max_chunk_gap (longest
+                stall between chunks), inter_token_latency (mean time per output token after
+                the first) and output_tokens_per_sec (decode rate after the first token),
+                all times in seconds
+        """
+        end = time.perf_counter()
+        stats = {
+            'ttft': round(self.first - self.start, 4) if self.first is not None else None,
+            'total_time': round(end - self.start, 4),
+            'chunks': self.chunks,
+            'max_chunk_gap': round(self.max_gap, 4),
+            'inter_token_latency': None,
+            'output_tokens_per_sec': None,
+        }
+        if self.first is not None and output_tokens and output_tokens > 1:
+            decode_time = self.last - self.first
+            stats['inter_token_latency'] = round(decode_time / (output_tokens - 1), 6)
+            if decode_time > 0:
+                stats['output_tokens_per_sec'] = round((output_tokens - 1) / decode_time, 2)
+        return stats
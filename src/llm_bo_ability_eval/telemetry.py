@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Per-call telemetry and run-level summaries.
+
+LLMTester returns a CallResult for every request; main.py stores its telemetry in
+each journal record and writes `{prefix}_summary.yaml` (latency percentiles, token
+totals, cost) next to `all_results.yaml`. A summary can be rebuilt from any journal:
+
+    python telemetry.py results/<timestamp>/<prefix>_results.jsonl
+"""
+
+import argparse
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+from result_writer import JOURNAL_SUFFIX, iter_latest_results
+
+SUMMARY_SUFFIX = "_summary.yaml"
+PERCENTILES = (50, 95, 99)
+TOKEN_FIELDS = ('input_tokens', 'cached_input_tokens', 'cache_write_input_tokens', 'uncached_input_tokens',
+                'output_tokens', 'reasoning_tokens')
+
+
+class CallResult:
+    def __init__(self, text: Optional[str] = None, usage: dict = None, error: dict = None, timing: dict = None,
+                 latency: float = None, attempts: int = 0, finish_reason: str = None, request_id: str = None,
+                 response_id: str = None, model: str = None, cost: float = None, from_cache: bool = False):
+        """
+        Outcome of one LLMTester request.
+
+        Args:
+            text: Response text (None when the request failed)
+            usage: Input/cached/uncached/output/reasoning token counts
+            error: Error record (see retry_policy.error_record) or None on success
+            timing: Streaming figures (see StreamTimer.stats), empty when not streaming
+            latency: Seconds from the call until the result, including retries and rate-limit waits
+            attempts: Requests sent to the provider
+            finish_reason: Provider stop reason ("stop", "length", "end_turn", ...)
+            request_id: Provider request ID from the response headers, for support tickets
+            response_id: ID of the completion / message
+            model: Model that answered, as reported by the provider
+            cost: USD cost from the price table (None when unknown)
+            from_cache: Served from the response cache without a request
+        """
+        self.text = text
+        self.usage = usage or {}
+        self.error = error
+        self.timing = timing or {}
+        self.latency = latency
+        self.attempts = attempts
+        self.finish_reason = finish_reason
+        self.request_id = request_id
+        self.response_id = response_id
+        self.model = model
+        self.cost = cost
+        self.from_cache = from_cache
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def telemetry(self) -> Dict[str, Any]:
+        """Per-call figures stored under 'telemetry' in the result record."""
+        return {
+            'latency': round(self.latency, 4) if self.latency is not None else None,
+            'attempts': self.attempts,
+            'finish_reason': self.finish_reason,
+            'request_id': self.request_id,
+            'response_id': self.response_id,
+            'model': self.model,
+            'cost': self.cost,
+            'from_cache': self.from_cache,
+        }
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """q-th percentile (0-100) with linear interpolation between closest ranks."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def _distribution(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    stats = {f"p{q}": round(percentile(values, q), 4) for q in PERCENTILES}
+    stats['mean'] = round(sum(values) / len(values), 4)
+    stats['max'] = round(max(values), 4)
+    return stats
+
+
+def summarize_results(results: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Run-level figures over result records.
+
+    Latency and TTFT percentiles only count calls that reached the provider
+    (cache hits are excluded); cost is summed over calls with a known price.
+    """
+    count = failed = cached = priced = 0
+    latencies, ttfts, decode_rates = [], [], []
+    tokens = dict.fromkeys(TOKEN_FIELDS, 0)
+    cost = 0.0
+    finish_reasons, error_categories = Counter(), Counter()
+
+    for result in results:
+        count += 1
+        telemetry = result.get('telemetry') or {}
+        timing = result.get('timing') or {}
+        if result.get('error'):
+            failed += 1
+            error_categories[result['error'].get('category')] += 1
+        if telemetry.get('from_cache'):
+            cached += 1
+        elif telemetry.get('latency') is not None:
+            latencies.append(telemetry['latency'])
+        if timing.get('ttft') is not None:
+            ttfts.append(timing['ttft'])
+        if timing.get('output_tokens_per_sec'):
+            decode_rates.append(timing['output_tokens_per_sec'])
+        for field in TOKEN_FIELDS:
+            tokens[field] += (result.get('usage') or {}).get(field) or 0
+        if telemetry.get('cost') is not None:
+            cost += telemetry['cost']
+            priced += 1
+        if telemetry.get('finish_reason'):
+            finish_reasons[str(telemetry['finish_reason'])] += 1
+
+    return {
+        'problems': count,
+        'failed': failed,
+        'from_cache': cached,
+        'latency': _distribution(latencies),
+        'ttft': _distribution(ttfts),
+        'output_tokens_per_sec': _distribution(decode_rates),
+        'tokens': tokens,
+        'cost_usd': round(cost, 6) if priced else None,
+        'priced_calls': priced,
+        'finish_reasons': dict(finish_reasons),
+        'errors': dict(error_categories),
+    }
+
+
+def write_run_summary(journal_path: Path, output_dir: Path = None, prefix: str = None,
+                      extra: Dict[str, Any] = None) -> Tuple[Path, Dict[str, Any]]:
+    """
+    Write `{prefix}_summary.yaml` for a journal.
+
+    Args:
+        journal_path: The run's *_results.jsonl journal
+        output_dir: Directory to write to (defaults to the journal's directory)
+        prefix: Result file prefix (defaults to the journal's)
+        extra: Additional run-level fields (e.g. wall time, concurrency)
+
+    Returns:
+        tuple: (summary file, summary dict)
+    """
+    journal_path = Path(journal_path)
+    output_dir = Path(output_dir) if output_dir else journal_path.parent
+    if prefix is None:
+        prefix = journal_path.name[:-len(JOURNAL_SUFFIX)]
+
+    summary = summarize_results(result for _, result in iter_latest_results(journal_path))
+    if extra:
+        summary.update(extra)
+    summary_file = output_dir / f"{prefix}{SUMMARY_SUFFIX}"
+    with open(summary_file, 'w') as f:
+        yaml.dump(summary, f, default_flow_style=False, sort_keys=False)
+    return summary_file, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write the run summary (latency percentiles, tokens, cost) of a journal')
+    parser.add_argument('journal', help='Path to a *_results.jsonl journal')
+    args = parser.parse_args()
+
+    summary_file, _ = write_run_summary(args.journal)
+    print(f"Run summary written to: {summary_file}")
+
+
+if __name__ == "__main__":
+    main()
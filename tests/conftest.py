@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+# The package is a flat set of modules run from its own directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src' / 'llm_bo_ability_eval'))
+# llm_configs reads the key at import time; tests never reach a provider
+os.environ.setdefault('OPENAI_API_KEY', 'test')
@@ -0,0 +1,88 @@
+import os
+
+from corpus import build_corpus
+from problem_loader import ProblemSetLoader
+
+PROBLEM = "## Q{number}. GP (continuous)\n**Search space**: lr.\n"
+
+
+def write_problem_set(problem_dir, count=3):
+    (problem_dir / "set_introduction.md").write_text("Introduction\n", encoding='utf-8')
+    for number in range(1, count + 1):
+        (problem_dir / f"set_problem_{number:03d}.md").write_text(PROBLEM.format(number=number), encoding='utf-8')
+
+
+def age(path, seconds):
+    """Move the mtime of `path` back so later writes are unambiguously newer."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - int(seconds * 1e9)))
+
+
+def build_aged(problem_dir):
+    """Build the corpus of `problem_dir`, then date it and (further back) the set's files and directories."""
+    corpus_path = build_corpus(str(problem_dir))
+    age(corpus_path, 10)
+    for path in [problem_dir, *(path for path in problem_dir.rglob("*") if path != corpus_path)]:
+        age(path, 20)
+    return corpus_path
+
+
+def test_fresh_corpus_is_used(tmp_path):
+    write_problem_set(tmp_path)
+    build_corpus(str(tmp_path))
+
+    loader = ProblemSetLoader(str(tmp_path))
+    assert loader.corpus is not None
+    assert [problem['content'] for problem in loader.load_problem_files('100')] == \
+        [PROBLEM.format(number=number) for number in (1, 2, 3)]
+
+
+def test_problem_edited_in_place_is_read_from_disk(tmp_path):
+    write_problem_set(tmp_path)
+    build_aged(tmp_path)
+    directory_mtime = os.stat(tmp_path).st_mtime_ns
+
+    with open(tmp_path / "set_problem_002.md", 'w', encoding='utf-8') as f:
+        f.write("## Q2. TPE (categorical)\nedited\n")
+    assert os.stat(tmp_path).st_mtime_ns == directory_mtime  # in-place edit, directory untouched
+
+    assert ProblemSetLoader(str(tmp_path)).corpus is not None  # only the opt-in check stats every file
+    loader = ProblemSetLoader(str(tmp_path), check_stale=True)
+    assert loader.corpus is None
+    assert loader.load_problem_files('100')[1]['content'] == "## Q2. TPE (categorical)\nedited\n"
+
+
+def test_edited_introduction_and_removed_problem_make_corpus_stale(tmp_path):
+    (tmp_path / "nested").mkdir()
+    write_problem_set(tmp_path / "nested")
+    (tmp_path / "nested" / "set_introduction.md").rename(tmp_path / "set_introduction.md")
+    build_aged(tmp_path)
+    assert ProblemSetLoader(str(tmp_path)).corpus is not None
+
+    (tmp_path / "set_introduction.md").write_text("Edited introduction\n", encoding='utf-8')
+    assert ProblemSetLoader(str(tmp_path)).corpus is None
+
+    build_aged(tmp_path)
+    (tmp_path / "nested" / "set_problem_003.md").unlink()
+    assert ProblemSetLoader(str(tmp_path)).corpus is None
+
+
+def test_added_problem_makes_corpus_stale(tmp_path):
+    write_problem_set(tmp_path)
+    build_aged(tmp_path)
+    assert ProblemSetLoader(str(tmp_path)).corpus is not None
+
+    (tmp_path / "set_problem_004.md").write_text(PROBLEM.format(number=4), encoding='utf-8')
+    assert ProblemSetLoader(str(tmp_path)).corpus is None
+
+
+def test_corpus_shipped_on_its_own_is_used(tmp_path):
+    (tmp_path / "source").mkdir()
+    (tmp_path / "shipped").mkdir()
+    write_problem_set(tmp_path / "source")
+    corpus_path = build_corpus(str(tmp_path / "source"), str(tmp_path / "shipped" / "problems.corpus"))
+    age(corpus_path, 10)
+
+    for check_stale in (False, True):
+        loader = ProblemSetLoader(str(corpus_path), check_stale=check_stale)
+        assert len(loader.load_problem_files('100')) == 3
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+
+import llm_tester
+from llm_tester import LLMTester
+
+
+def make_gemini_tester(messages):
+    tester = LLMTester.__new__(LLMTester)
+    tester.current_config = {'model': 'gemini-test'}
+    tester.system_prompt = ''
+    tester.log = messages.append
+    tester._gemini_prefix_models = {}
+    tester._gemini_prefix_lock = threading.Lock()
+    tester._gemini_prefix_alock = asyncio.Lock()
+    return tester
+
+
+def test_gemini_context_cache_is_created_off_the_event_loop(monkeypatch):
+    created = []
+
+    def create(**kwargs):
+        created.append(kwargs['contents'])
+        time.sleep(0.2)
+        return 'cached'
+
+    monkeypatch.setattr(llm_tester.caching.CachedContent, 'create', create)
+    monkeypatch.setattr(llm_tester.genai.GenerativeModel, 'from_cached_content', lambda cached: f'model({cached})')
+    tester = make_gemini_tester([])
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        models = await asyncio.gather(*(tester._agemini_prefix_model('prefix') for _ in range(3)))
+        task.cancel()
+        return models, ticks
+
+    models, ticks = asyncio.run(run())
+    assert models == ['model(cached)'] * 3
+    assert created == [['prefix']]
+    assert ticks >= 5
+
+
+def test_gemini_context_cache_failure_is_logged(monkeypatch):
+    def create(**kwargs):
+        raise RuntimeError('prefix too short')
+
+    monkeypatch.setattr(llm_tester.caching.CachedContent, 'create', create)
+    messages = []
+    tester = make_gemini_tester(messages)
+    assert asyncio.run(tester._agemini_prefix_model('prefix')) is None
+    assert tester._gemini_prefix_model('prefix') is None
+    assert messages == ["Gemini context caching unavailable, sending the full prompt: prefix too short"]
@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+
+from llm_tester import LLMTester
+from pricing import compute_cost, get_price
+
+
+def claude_usage(input_tokens, read, written, output_tokens):
+    tester = LLMTester.__new__(LLMTester)
+    tester.current_config = {'model': 'claude-test'}
+    usage = SimpleNamespace(input_tokens=input_tokens, cache_read_input_tokens=read,
+                            cache_creation_input_tokens=written, output_tokens=output_tokens)
+    return tester._extract_usage(SimpleNamespace(usage=usage))
+
+
+def test_anthropic_cache_writes_are_reported_and_priced_separately():
+    usage = claude_usage(100, 0, 2000, 50)
+    assert usage['input_tokens'] == 2100
+    assert usage['cache_write_input_tokens'] == 2000
+    assert usage['uncached_input_tokens'] == 100
+    price = get_price({'model': 'claude-test', 'price': {'input': 3.0, 'cached_input': 0.3, 'output': 15.0}})
+    assert price['cache_write'] == 3.75
+    assert compute_cost(price, usage) == round((100 * 3.0 + 2000 * 3.75 + 50 * 15.0) / 1e6, 8)
+
+
+def test_other_providers_have_no_cache_write_price():
+    price = {'input': 1.0, 'output': 2.0}
+    assert get_price({'model': 'gpt-test', 'price': price}) == price
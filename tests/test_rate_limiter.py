@@ -0,0 +1,69 @@
+import asyncio
+
+from llm_tester import LLMTester
+from rate_limiter import RateLimiter
+from retry_policy import RetryPolicy
+
+
+class ThrottleError(Exception):
+    status_code = 429
+
+
+def make_tester(create):
+    """LLMTester without a provider client whose requests go to `create`."""
+    tester = LLMTester.__new__(LLMTester)
+    tester.current_config = {'model': 'gpt-test'}
+    tester.system_prompt = ''
+    tester.async_client = None
+    tester.rate_limiter = RateLimiter(initial_concurrency=2)
+    tester.retry_policy = RetryPolicy(max_attempts=2, base_delay=0.0)
+    tester.stream = False
+    tester._request_kwargs = lambda prompt, prompt_prefix='', prefix_cached=False: {}
+    tester._create = create
+    return tester
+
+
+async def cancel_after(coroutine, seconds=0.05):
+    task = asyncio.ensure_future(coroutine)
+    await asyncio.sleep(seconds)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        return
+    raise AssertionError("task finished before it was cancelled")
+
+
+def test_cancel_while_waiting_for_tokens_releases_slot():
+    limiter = RateLimiter(rpm=1)
+
+    async def run():
+        await limiter.aacquire()
+        limiter.release()
+        await cancel_after(limiter.aacquire())  # the rpm bucket is empty for a minute
+
+    asyncio.run(run())
+    assert limiter.in_flight == 0
+
+
+def test_cancel_mid_call_releases_slot():
+    async def create(client, request, use_async=False, timeout=None, stream=False):
+        await asyncio.sleep(60)
+
+    tester = make_tester(create)
+    asyncio.run(cancel_after(tester._acall('prompt')))
+    assert tester.rate_limiter.in_flight == 0
+    assert tester.rate_limiter.throttle_count == 0
+
+
+def test_throttled_call_is_released_as_throttle():
+    async def create(client, request, use_async=False, timeout=None, stream=False):
+        raise ThrottleError()
+
+    tester = make_tester(create)
+    try:
+        asyncio.run(tester._acall('prompt'))
+    except Exception:
+        pass
+    assert tester.rate_limiter.in_flight == 0
+    assert tester.rate_limiter.throttle_count == 2
@@ -0,0 +1,21 @@
+import math
+
+import numpy as np
+
+import reference_solver
+
+
+def test_erfc_approximation_error_bound():
+    x = np.linspace(-26, 26, 100001)
+    exact = np.array([math.erfc(value) for value in x])
+    assert np.max(np.abs(reference_solver._erfc_approx(x) - exact) / exact) < 1.2e-7
+
+
+def test_triangular_solve_matches_dense_solve():
+    rng = np.random.default_rng(0)
+    A = rng.standard_normal((4, 6, 6))
+    L = np.linalg.cholesky(A @ np.swapaxes(A, 1, 2) + 6 * np.eye(6))
+    B = rng.standard_normal((4, 6, 3))
+    assert np.allclose(reference_solver._triangular_solve(L, B), np.linalg.solve(L, B))
+    assert np.allclose(reference_solver._triangular_solve(L, B, transpose=True),
+                       np.linalg.solve(np.swapaxes(L, 1, 2), B))
@@ -0,0 +1,38 @@
+import asyncio
+
+from response_cache import ResponseCache
+
+
+def test_running_total_tracks_puts_replacements_and_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=100)
+    cache.put('a', 'x' * 40)
+    cache.put('b', 'x' * 40)
+    cache.put('a', 'x' * 10)  # replacing a row only counts the difference
+    assert cache._total == cache._stored_bytes() == 50
+    cache.put('c', 'x' * 60)  # over budget: least recently used rows go until it fits in 90%
+    assert cache._total == cache._stored_bytes() <= 90
+    cache.close()
+
+    reopened = ResponseCache(str(tmp_path), max_bytes=100)
+    assert reopened._total == reopened._stored_bytes()
+    reopened.close()
+
+
+def test_async_get_or_compute_shares_one_call(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'answer'
+
+    async def run():
+        return await asyncio.gather(*(cache.aget_or_compute('key', compute) for _ in range(3)))
+
+    assert asyncio.run(run()) == ['answer'] * 3
+    assert calls == [1]
+    cache._memory.clear()
+    assert asyncio.run(cache.aget_or_compute('key', compute)) == 'answer'  # read back from SQLite
+    assert calls == [1]
+    cache.close()
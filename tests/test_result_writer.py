@@ -0,0 +1,17 @@
+import os
+
+from result_writer import ResultJournal, iter_journal, iter_latest_results
+
+
+def test_journal_survives_a_record_torn_inside_a_multibyte_character(tmp_path):
+    path = tmp_path / 'run_results.jsonl'
+    with ResultJournal(path) as journal:
+        journal.append(1, {'response': 'σ=0.1'})
+        journal.append(2, {'response': 'ℓ=0.3, σ=0.2'})
+    data = path.read_bytes()
+    os.truncate(path, data.rindex('σ'.encode('utf-8')) + 1)  # cut between the two bytes of "σ"
+    with ResultJournal(path) as journal:
+        journal.append(3, {'response': 'μ=0.5'})
+
+    assert [index for index, _ in iter_journal(path)] == [1, 3]
+    assert [index for index, _ in iter_latest_results(path)] == [1, 3]
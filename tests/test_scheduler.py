@@ -0,0 +1,15 @@
+import argparse
+import shlex
+from pathlib import Path
+
+from scheduler import build_jobs, job_options, resume_command
+
+
+def test_resume_command_repeats_the_job_settings():
+    args = argparse.Namespace(max_files=2, concurrency=4, key_file='keys.txt', cache=True, cache_dir='.llm_cache',
+                              stream=False)
+    job = build_jobs(['gpt-r'], ['24'])[0]
+    argv = shlex.split(resume_command(job, Path('results/0101000000'), job_options(args)))
+    assert argv == ['python', 'main.py', '-l', 'gpt-r', '-e', '24', '-p', 'problem_set/24problems',
+                    '-r', 'results/0101000000', '-m', '2', '-c', '4', '--key-file', 'keys.txt',
+                    '--cache', '--cache-dir', '.llm_cache']
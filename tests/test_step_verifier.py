@@ -0,0 +1,81 @@
+from pathlib import Path
+
+import yaml
+
+import reference_solver
+import step_verifier
+
+PROBLEM_DIR = Path(__file__).resolve().parent.parent / 'src' / 'llm_bo_ability_eval' / 'problem_set' / '100problems'
+
+
+def load(number):
+    introduction = (PROBLEM_DIR / 'bo_hpo_llm_test_100_introduction.md').read_text(encoding='utf-8')
+    content = (PROBLEM_DIR / f'bo_hpo_llm_test_100_problem_{number:03d}.md').read_text(encoding='utf-8')
+    with open(PROBLEM_DIR / 'bo_hpo_llm_test_100_answers.yaml', encoding='utf-8') as f:
+        answer = yaml.safe_load(f)[f'Q{number}']
+    problem = reference_solver.parse_problem(content, introduction, answer)
+    solutions = [reference_solver.solve_problems([problem], predictive_noise)[0] for predictive_noise in (True, False)]
+    return problem, solutions, answer
+
+
+def verify(response, problem, solutions):
+    return step_verifier.verify_response(response, problem, solutions)['first_error']
+
+
+def gp_lines(solution, order):
+    """EI lines of the 100-set answer format with candidate i's values on the line of candidate order[i]."""
+    return [f"   - x={x:.2f}: μ={solution['mu'][i]:.3f}, σ={solution['sigma'][i]:.3f}, z={solution['z'][i]:.3f}, "
+            f"Φ(z)={solution['Phi'][i]:.3f}, φ(z)={solution['phi'][i]:.3f}, EI={solution['EI'][i]:.4f}"
+            for x, i in zip((0.2, 0.6, 0.8), order)]
+
+
+def test_answer_key_passes():
+    problem, solutions, answer = load(1)
+    assert verify(answer, problem, solutions) is None
+
+
+def test_values_swapped_between_candidates_fail():
+    problem, solutions, _ = load(1)
+    assert verify('\n'.join(gp_lines(solutions[0], (0, 1, 2))), problem, solutions) is None
+
+    first_error = verify('\n'.join(gp_lines(solutions[0], (1, 0, 2))), problem, solutions)
+    assert first_error['step'] == 'mu'
+    assert first_error['candidate'] == 0
+
+
+def test_unlabelled_values_follow_candidate_order():
+    problem, solutions, _ = load(1)
+    mu = solutions[0]['mu']
+    assert verify(f"μ = {mu[0]:.3f}\nμ = {mu[1]:.3f}\nμ = {mu[2]:.3f}", problem, solutions) is None
+    assert verify(f"μ = {mu[1]:.3f}\nμ = {mu[0]:.3f}\nμ = {mu[2]:.3f}", problem, solutions)['step'] == 'mu'
+
+
+def test_label_argument_and_table_rows_name_candidates():
+    problem, solutions, _ = load(1)
+    ei = solutions[0]['EI']
+    assert verify(f"EI(0.6) = {ei[1]:.4f}, EI(0.2) = {ei[0]:.4f}", problem, solutions) is None
+    assert verify(f"EI(0.6) = {ei[0]:.4f}", problem, solutions)['step'] == 'EI'
+
+    table = "| x | EI |\n|---|---|\n" + ''.join(f"| {x} | {ei[i]:.4f} |\n" for x, i in ((0.8, 2), (0.2, 0), (0.6, 1)))
+    assert verify(table, problem, solutions) is None
+    swapped = "| x | EI |\n|---|---|\n" + ''.join(f"| {x} | {ei[i]:.4f} |\n" for x, i in ((0.8, 0), (0.2, 2), (0.6, 1)))
+    assert verify(swapped, problem, solutions)['step'] == 'EI'
+
+
+def test_tpe_densities_are_checked_per_candidate():
+    problem, solutions, answer = load(100)
+    assert verify(answer, problem, solutions) is None
+
+    lines = answer.splitlines()
+    sgd = next(i for i, line in enumerate(lines) if line.strip().startswith('- (SGD, lr=0.20)'))
+    adam = next(i for i, line in enumerate(lines) if line.strip().startswith('- (Adam, lr=0.20)'))
+    head = lambda line: line[:line.index(':') + 1]
+    lines[sgd], lines[adam] = head(lines[sgd]) + lines[adam].split(':', 1)[1], head(lines[adam]) + lines[sgd].split(':', 1)[1]
+    assert verify('\n'.join(lines), problem, solutions)['step'] == 'p_good'
+
+
+def test_identical_candidates_are_one_candidate():
+    problem, _, _ = load(1)
+    problem = dict(problem, candidates=list(problem['candidates']) + [problem['candidates'][1]])
+    locator = step_verifier.CandidateLocator(problem)
+    assert locator.find('- x=0.60: μ=0.1') == 1